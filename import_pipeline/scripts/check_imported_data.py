@@ -9,6 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.db import DatabaseConnection
+from src.export import tombstone_column
 
 # Configure logging
 logging.basicConfig(
@@ -23,30 +24,35 @@ def check_imported_documents():
         # Create a database connection
         db = DatabaseConnection()
         
-        # Query to get all documents
-        query = """
+        # Query to get all documents, leaving out those deleted at the source
+        deleted = tombstone_column('documents')
+        where = f"WHERE {deleted} IS NULL" if deleted in db.get_table_columns('documents') else ''
+        query = f"""
         SELECT id, document_type, document_number, status, total_amount, paid_amount, balance_due
         FROM documents
+        {where}
         ORDER BY issue_date DESC;
         """
         
-        results = db.execute_query(query)
+        # Stream rows with a server-side cursor instead of fetching them all
+        count = 0
+        for row in db.stream_query(query):
+            if count == 0:
+                logger.info("\nImported Documents:")
+                logger.info("-" * 100)
+                logger.info(f"{'ID':<5} {'Type':<10} {'Number':<15} {'Status':<10} {'Total':>10} {'Paid':>10} {'Balance':>10}")
+                logger.info("-" * 100)
+            
+            doc_id, doc_type, doc_num, status, total, paid, balance = row
+            logger.info(f"{doc_id:<5} {doc_type:<10} {str(doc_num or ''):<15} {status:<10} {float(total or 0):>10.2f} {float(paid or 0):>10.2f} {float(balance or 0):>10.2f}")
+            count += 1
         
-        if not results:
+        if not count:
             logger.info("No documents found in the database.")
             return
         
-        logger.info("\nImported Documents:")
-        logger.info("-" * 100)
-        logger.info(f"{'ID':<5} {'Type':<10} {'Number':<15} {'Status':<10} {'Total':>10} {'Paid':>10} {'Balance':>10}")
-        logger.info("-" * 100)
-        
-        for row in results:
-            doc_id, doc_type, doc_num, status, total, paid, balance = row
-            logger.info(f"{doc_id:<5} {doc_type:<10} {str(doc_num or ''):<15} {status:<10} {float(total or 0):>10.2f} {float(paid or 0):>10.2f} {float(balance or 0):>10.2f}")
-        
         logger.info("-" * 100)
-        logger.info(f"Total documents: {len(results)}")
+        logger.info(f"Total documents: {count}")
         
     except Exception as e:
         logger.error(f"Error checking imported documents: {e}")
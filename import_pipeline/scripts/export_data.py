@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Script to export imported data to CSV."""
+import argparse
+import sys
+import logging
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.export import EXPORTS, export_table
+from run_imports import setup_logging
+
+logger = logging.getLogger(__name__)
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Export documents, line items or customers to CSV.')
+    
+    parser.add_argument(
+        '--table',
+        choices=EXPORTS.keys(),
+        required=True,
+        help='Data to export'
+    )
+    
+    parser.add_argument(
+        '--output',
+        required=True,
+        help='Output file (use a .gz suffix for compressed CSV, or - for stdout)'
+    )
+    
+    parser.add_argument(
+        '--gzip',
+        action='store_true',
+        default=None,
+        help='Compress the output with gzip (default: based on the --output suffix)'
+    )
+    
+    parser.add_argument(
+        '--include-deleted',
+        action='store_true',
+        help='Also export rows tombstoned by snapshot sync (snapshot_sync.column set, deleted_at by default)'
+    )
+    
+    return parser.parse_args()
+
+def main():
+    """Run the export."""
+    args = parse_arguments()
+    setup_logging(log_file=None)
+    
+    try:
+        export_table(args.table, args.output, compress=args.gzip, include_deleted=args.include_deleted)
+        return 0
+    except Exception as e:
+        logger.error(f"Error during export: {e}", exc_info=True)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
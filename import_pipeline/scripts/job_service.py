@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Service that runs queued import jobs and serves their progress over HTTP."""
+import argparse
+import os
+import signal
+import sys
+import logging
+import threading
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from run_imports import IMPORTERS, setup_logging
+
+logger = logging.getLogger(__name__)
+
+def parse_arguments():
+    """Parse command line arguments."""
+    from src.db import load_env
+    
+    # The defaults below may come from .env
+    load_env()
+    parser = argparse.ArgumentParser(description='Run import jobs from a persistent queue and serve their progress.')
+    
+    parser.add_argument(
+        '--host',
+        default=os.getenv('JOB_SERVICE_HOST', '127.0.0.1'),
+        help='Address to listen on (default: 127.0.0.1)'
+    )
+    
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=int(os.getenv('JOB_SERVICE_PORT', 8765)),
+        help='Port to listen on (default: 8765)'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=int(os.getenv('IMPORT_WORKERS', 2)),
+        help='Number of jobs run at the same time, at most one per table (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--queue-file',
+        default=os.getenv('JOB_QUEUE_FILE', 'jobs/import_jobs.db'),
+        help='SQLite file holding the job queue (default: jobs/import_jobs.db)'
+    )
+    
+    parser.add_argument(
+        '--import-dir',
+        default=os.getenv('IMPORT_DIR'),
+        help='Only accept files inside this directory (required unless bound to loopback or JOB_SERVICE_TOKEN is set)'
+    )
+    
+    return parser.parse_args()
+
+def main():
+    """Run the job service until interrupted."""
+    args = parse_arguments()
+    setup_logging()
+    
+    if args.workers < 1:
+        logger.error("--workers must be at least 1")
+        return 1
+    
+    from src.jobs import JobQueue, JobService, make_server
+    
+    service = JobService(
+        JobQueue(args.queue_file),
+        IMPORTERS,
+        workers=args.workers,
+        import_dir=args.import_dir
+    )
+    try:
+        server = make_server(service, args.host, args.port, token=os.getenv('JOB_SERVICE_TOKEN'))
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    
+    def shutdown(*_):
+        logger.info("Stopping job service after the running jobs")
+        # shutdown() blocks until serve_forever() returns, so call it from another thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    
+    service.start()
+    logger.info(f"Job service listening on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
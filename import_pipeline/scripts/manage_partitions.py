@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Script to create, migrate, list and detach the partitions of a partitioned table."""
+import argparse
+import sys
+import logging
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.db import get_db
+from src.partitioning import RangePartitioning
+from run_imports import IMPORTERS, setup_logging
+
+logger = logging.getLogger(__name__)
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Manage the partitions of a partitioned import table.')
+    
+    parser.add_argument(
+        '--type',
+        choices=IMPORTERS.keys(),
+        required=True,
+        help='Import type whose table to manage'
+    )
+    
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument(
+        '--create',
+        action='store_true',
+        help='Create the partitioned table, its default partition and the partitions from "from" onwards'
+    )
+    action.add_argument(
+        '--migrate',
+        action='store_true',
+        help='Convert the existing plain table into a partitioned one, copying its rows; '
+             'the original is kept as the --legacy-table'
+    )
+    action.add_argument(
+        '--list',
+        action='store_true',
+        help='List the partitions with their row estimates and sizes'
+    )
+    action.add_argument(
+        '--detach',
+        metavar='KEY',
+        help='Detach the partition for KEY (e.g. 2015 or 2015-03); the data stays in a standalone table'
+    )
+    
+    parser.add_argument(
+        '--concurrently',
+        action='store_true',
+        help='Detach without blocking queries on the parent table (PostgreSQL 14+)'
+    )
+    
+    parser.add_argument(
+        '--legacy-table',
+        default=None,
+        help='Name the original table is renamed to by --migrate (default: <table>_unpartitioned)'
+    )
+    
+    return parser.parse_args()
+
+def main():
+    """Run the requested partition action."""
+    args = parse_arguments()
+    setup_logging(log_file=None)
+    importer_class = IMPORTERS[args.type]
+    config = importer_class.load_config()
+    if not config.get('partitioning'):
+        logger.error(f"No partitioning declared in {importer_class.CONFIG_FILE}")
+        return 1
+    
+    table = importer_class.TABLE_NAME
+    scheme = RangePartitioning(table, config['partitioning'], config.get('id_field', 'id'))
+    db = get_db()
+    
+    try:
+        if args.create:
+            db.create_table_from_mapping(table, config)
+            logger.info(f"Created partitioned table {table}")
+        elif args.migrate:
+            legacy_table = args.legacy_table or f"{table}_unpartitioned"
+            # One transaction: any failure leaves the original table untouched
+            with db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    copied = scheme.migrate(cursor, legacy_table)
+            logger.info(
+                f"Migrated {table} to a partitioned table ({copied} rows copied); "
+                f"the original is kept as {legacy_table} and can be dropped once checked"
+            )
+        elif args.list:
+            rows = db.execute_query(
+                """
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint,
+                       pg_size_pretty(pg_total_relation_size(c.oid))
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = %s::regclass
+                ORDER BY c.relname
+                """,
+                (table,)
+            )
+            for name, bounds, estimate, size in rows or []:
+                print(f"{name}\t{bounds}\t~{estimate} rows\t{size}")
+        else:
+            # DETACH ... CONCURRENTLY cannot run inside a transaction block
+            conn = db.connect()
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(scheme.detach_sql(scheme.key_for(args.detach), args.concurrently))
+            finally:
+                conn.close()
+            logger.info(f"Detached {scheme.partition_name(scheme.key_for(args.detach))} from {table}")
+        return 0
+    except Exception as e:
+        logger.error(f"Error managing partitions: {e}", exc_info=True)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
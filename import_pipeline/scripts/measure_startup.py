@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Script to measure cold-start time of the import entry points."""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).parent
+
+
+def time_command(command, runs: int, env: dict) -> list:
+    """Run a command several times and return wall-clock durations in seconds."""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            command,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False
+        )
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def slowest_imports(command, env: dict, limit: int) -> list:
+    """Return the slowest module imports reported by ``python -X importtime``."""
+    result = subprocess.run(
+        [command[0], '-X', 'importtime'] + command[1:],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # Format: "import time: <self us> | <cumulative us> | <module>"
+        _, cumulative_us, module = [part.strip() for part in line.replace('import time:', '').split('|')]
+        rows.append((int(cumulative_us), module))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    """Measure and print startup timings."""
+    parser = argparse.ArgumentParser(description='Measure cold-start time of run_imports.py --help.')
+    parser.add_argument('--runs', type=int, default=10, help='Number of runs (default: 10)')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to show (default: 10)')
+    args = parser.parse_args()
+
+    command = [sys.executable, str(SCRIPTS_DIR / 'run_imports.py'), '--help']
+    env = dict(os.environ)
+    # --help must work without a database configured
+    env.pop('DATABASE_URL', None)
+
+    durations = time_command(command, args.runs, env)
+    print(f"run_imports.py --help over {args.runs} runs:")
+    print(f"  min:    {min(durations) * 1000:8.1f} ms")
+    print(f"  median: {statistics.median(durations) * 1000:8.1f} ms")
+    print(f"  max:    {max(durations) * 1000:8.1f} ms")
+
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, module in slowest_imports(command, env, args.top):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
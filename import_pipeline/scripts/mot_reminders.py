@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Script to read the MOT reminders due this week, or rebuild the reminder queue."""
+import argparse
+import csv
+import sys
+import logging
+from datetime import date
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.db import get_db
+from src.reminders import DEFAULT_LEAD_DAYS, MotReminderStage, due_reminders, mark_reminded
+from run_imports import IMPORTERS, setup_logging
+
+logger = logging.getLogger(__name__)
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Read or rebuild the week-bucketed MOT reminder queue.')
+    
+    parser.add_argument(
+        '--type',
+        choices=IMPORTERS.keys(),
+        default='documents',
+        help='Import type whose mot_reminders config to use (default: documents)'
+    )
+    
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument(
+        '--due',
+        action='store_true',
+        help='Write the vehicles not yet reminded that are due from this week (or --since) up to the week --lead-days from today, as CSV'
+    )
+    action.add_argument(
+        '--rebuild',
+        action='store_true',
+        help='Recompute the queue for every vehicle in the imported table'
+    )
+    
+    parser.add_argument(
+        '--lead-days',
+        type=int,
+        default=DEFAULT_LEAD_DAYS,
+        help=f'Days ahead of the MOT due date to remind (default: {DEFAULT_LEAD_DAYS})'
+    )
+    
+    parser.add_argument(
+        '--since',
+        type=date.fromisoformat,
+        default=None,
+        help='With --due, also include vehicles due from the week of this date (YYYY-MM-DD; default: this week)'
+    )
+    
+    parser.add_argument(
+        '--output',
+        default='-',
+        help='CSV file for --due (default: stdout)'
+    )
+    
+    parser.add_argument(
+        '--mark-reminded',
+        action='store_true',
+        help='With --due, record the listed vehicles as reminded'
+    )
+    
+    return parser.parse_args()
+
+def main():
+    """Run the requested action."""
+    args = parse_arguments()
+    setup_logging(log_file=None)
+    importer_class = IMPORTERS[args.type]
+    config = importer_class.load_config().get('mot_reminders')
+    if not config:
+        logger.error(f"No mot_reminders section in {importer_class.CONFIG_FILE}")
+        return 1
+    
+    stage = MotReminderStage(config)
+    db = get_db()
+    
+    if args.rebuild:
+        moved = stage.rebuild(db, importer_class.TABLE_NAME)
+        logger.info(f"Rebuilt the MOT reminder queue: {moved} vehicles written")
+        return 0
+    
+    rows = due_reminders(db, stage.table, lead_days=args.lead_days, since=args.since)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        writer = csv.writer(out)
+        writer.writerow(['registration', 'vehicle_id', 'customer_id', 'due_date'])
+        writer.writerows(row[:4] for row in rows)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    logger.info(f"{len(rows)} vehicles due for an MOT reminder")
+    
+    if args.mark_reminded and rows:
+        mark_reminded(db, [row[0] for row in rows], stage.table)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
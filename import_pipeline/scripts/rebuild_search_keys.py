@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Script to rebuild the search keys of already imported rows."""
+import argparse
+import sys
+import logging
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.db import get_db
+from src.search_keys import SearchKeyStage
+from run_imports import IMPORTERS, setup_logging
+
+logger = logging.getLogger(__name__)
+
+def rebuild_search_keys(import_type: str):
+    """Recompute the search keys declared for an import type from its table."""
+    importer_class = IMPORTERS[import_type]
+    config = importer_class.load_config()
+    if not config.get('search_keys'):
+        logger.info(f"No search keys declared in {importer_class.CONFIG_FILE}")
+        return
+    
+    stage = SearchKeyStage(
+        config['search_keys'],
+        importer_class.TABLE_NAME,
+        config.get('id_field', 'id'),
+        importer_class.tombstone_column_for(config)
+    )
+    stage.rebuild(get_db())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild search keys from their source tables.')
+    parser.add_argument('--type', choices=IMPORTERS.keys(), required=True, help='Import type whose search keys to rebuild')
+    args = parser.parse_args()
+    setup_logging(log_file=None)
+    rebuild_search_keys(args.type)
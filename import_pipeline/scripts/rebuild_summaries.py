@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Script to rebuild summary tables from their source tables."""
+import argparse
+import sys
+import logging
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.db import get_db
+from src.summaries import SummaryStage
+from run_imports import IMPORTERS, setup_logging
+
+logger = logging.getLogger(__name__)
+
+def rebuild_summaries(import_type: str):
+    """Truncate and recompute the summary tables declared for an import type."""
+    importer_class = IMPORTERS[import_type]
+    config = importer_class.load_config()
+    if not config.get('summaries'):
+        logger.info(f"No summaries declared in {importer_class.CONFIG_FILE}")
+        return
+    
+    stage = SummaryStage(
+        config['summaries'],
+        importer_class.TABLE_NAME,
+        config.get('id_field', 'id'),
+        importer_class.tombstone_column_for(config)
+    )
+    with get_db().get_connection() as conn:
+        with conn.cursor() as cursor:
+            stage.rebuild(cursor)
+    logger.info(f"Rebuilt {len(stage.summaries)} summary table(s) for {import_type}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild summary tables from their source tables.')
+    parser.add_argument('--type', choices=IMPORTERS.keys(), required=True, help='Import type whose summaries to rebuild')
+    args = parser.parse_args()
+    setup_logging(log_file=None)
+    rebuild_summaries(args.type)
@@ -5,6 +5,7 @@ import os
 import sys
 import logging
 from pathlib import Path
+from typing import Optional
 
 # Add the project root to the Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -14,11 +15,6 @@ from src.importers.line_item_importer import LineItemImporter
 from src.importers.document_extra_importer import DocumentExtraImporter
 from src.importers.test_document_importer import TestDocumentImporter
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # Map import types to their respective importer classes
@@ -29,6 +25,37 @@ IMPORTERS = {
     'test_documents': TestDocumentImporter,
 }
 
+def setup_logging(log_file: Optional[str] = 'import.log'):
+    """Configure logging to the console (stderr) and, unless ``log_file`` is None, a log file.
+    
+    Records are put on a queue and written by a background thread, so the
+    import never waits on console or file I/O.
+    """
+    import atexit
+    import queue
+    from logging.handlers import QueueHandler, QueueListener
+    from src.db import load_env
+    
+    # LOG_LEVEL may come from .env, which is otherwise only read on first database use
+    load_env()
+    
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Flush the queued records on exit
+    atexit.register(listener.stop)
+    
+    root = logging.getLogger()
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    root.addHandler(QueueHandler(log_queue))
+
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description='Import data from CSV files into the database.')
@@ -52,11 +79,36 @@ def parse_arguments():
         help='Directory containing the configuration files (default: config/column_maps/)'
     )
     
+    parser.add_argument(
+        '--snapshot-sync',
+        action='store_true',
+        help='Treat the file as a full snapshot and tombstone or report rows missing from it (see snapshot_sync in the column map)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile each import stage with cProfile'
+    )
+    
+    parser.add_argument(
+        '--profile-memory',
+        action='store_true',
+        help='With --profile, also trace allocation sites per stage with tracemalloc (slow)'
+    )
+    
+    parser.add_argument(
+        '--profile-dir',
+        default='profiles',
+        help='Directory for .pstats and collapsed-stack profile output (default: profiles/)'
+    )
+    
     return parser.parse_args()
 
 def main():
     """Run the import process."""
     args = parse_arguments()
+    setup_logging()
     
     # Check if the file exists
     if not os.path.isfile(args.file):
@@ -69,9 +121,14 @@ def main():
         logger.error(f"No importer found for type: {args.type}")
         return 1
     
+    profiler = None
+    if args.profile:
+        from src.profiling import StageProfiler
+        profiler = StageProfiler(args.profile_dir, memory=args.profile_memory)
+    
     try:
         # Create and run the importer
-        importer = importer_class(args.file)
+        importer = importer_class(args.file, profiler=profiler, snapshot_sync=args.snapshot_sync)
         stats = importer.run()
         
         # Log summary
@@ -79,7 +136,38 @@ def main():
         logger.info(f"  Total records: {stats['total']}")
         logger.info(f"  Imported: {stats['imported']}")
         logger.info(f"  Skipped: {stats['skipped']}")
+        for reason, count in (stats.get('skip_reasons') or {}).items():
+            logger.info(f"    {reason}: {count}")
         logger.info(f"  Errors: {stats['errors']}")
+        if stats.get('sanitized_bytes'):
+            logger.info(f"  Sanitized bytes: {stats['sanitized_bytes']}")
+        if 'reconciliation_mismatches' in stats:
+            logger.info(f"  Reconciliation mismatches: {stats['reconciliation_mismatches']}")
+        if stats.get('mot_reminders_checked'):
+            logger.info(
+                f"  MOT reminders: {stats['mot_reminders_moved']} of {stats['mot_reminders_checked']} vehicles moved to a new due week"
+            )
+        if 'snapshot_vanished' in stats:
+            logger.info(
+                f"  Snapshot: {stats['snapshot_vanished']} rows missing from the file "
+                f"({stats['snapshot_tombstoned']} tombstoned, {stats['snapshot_restored']} restored)"
+            )
+        if 'staged_rows' in stats:
+            logger.info(
+                f"  Staged rows: {stats['staged_rows']} "
+                f"({stats['staging_duplicates']} duplicates merged, {stats['staging_dropped']} dropped by checks)"
+            )
+        if 'enriched_vehicles' in stats:
+            logger.info(
+                f"  Enriched vehicles: {stats['enriched_vehicles']} "
+                f"({stats['enrichment_requests']} API requests, {stats['enrichment_cache_hits']} cached)"
+            )
+        
+        if profiler:
+            profiler.stop()
+            for path in profiler.dump():
+                logger.info(f"Wrote profile: {path}")
+            profiler.report()
         
         return 0 if stats['errors'] == 0 else 1
         
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Script to verify an imported file against the database with range checksums."""
+import argparse
+import os
+import sys
+import logging
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from run_imports import IMPORTERS, setup_logging
+
+logger = logging.getLogger(__name__)
+
+# IDs of each kind listed in the log before referring to the report
+LOGGED_IDS = 10
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Verify that the database matches a source CSV file.')
+    
+    parser.add_argument(
+        '--type',
+        choices=IMPORTERS.keys(),
+        required=True,
+        help='Type of data the file was imported as'
+    )
+    
+    parser.add_argument(
+        '--file',
+        required=True,
+        help='Path to the source CSV file'
+    )
+    
+    parser.add_argument(
+        '--columns',
+        default=None,
+        help='Comma-separated DB columns to compare (default: every imported column)'
+    )
+    
+    parser.add_argument(
+        '--range-column',
+        default=None,
+        help='Only compare rows (in the file and in the table) whose date or numeric column is in --from/--to (e.g. issue_date)'
+    )
+    
+    parser.add_argument(
+        '--from',
+        dest='range_from',
+        default=None,
+        help='Inclusive lower bound for --range-column (e.g. 2024-01-01)'
+    )
+    
+    parser.add_argument(
+        '--to',
+        dest='range_to',
+        default=None,
+        help='Exclusive upper bound for --range-column (e.g. 2025-01-01)'
+    )
+    
+    return parser.parse_args()
+
+def main():
+    """Run the verification."""
+    args = parse_arguments()
+    setup_logging()
+    
+    if not os.path.isfile(args.file):
+        logger.error(f"File not found: {args.file}")
+        return 1
+    
+    from src.verify import RangeVerifier
+    
+    try:
+        importer = IMPORTERS[args.type](args.file)
+        columns = [c.strip() for c in args.columns.split(',')] if args.columns else None
+        verifier = RangeVerifier(
+            importer,
+            columns=columns,
+            range_column=args.range_column,
+            lower=args.range_from,
+            upper=args.range_to
+        )
+        verifier.load_source()
+        result = verifier.compare()
+    except Exception as e:
+        logger.error(f"Error during verification: {e}", exc_info=True)
+        return 1
+    
+    logger.info("\nVerification Summary:")
+    logger.info(f"  Source rows: {result['source_rows']}")
+    logger.info(f"  Table rows: {result['db_rows']}")
+    logger.info(f"  Mismatching ranges: {result['mismatched_ranges']} of {result['ranges']}")
+    logger.info(f"  Queries: {result['queries']}")
+    for problem in ('missing', 'extra', 'changed'):
+        ids = result[problem]
+        if ids:
+            more = f" (+{len(ids) - LOGGED_IDS} more)" if len(ids) > LOGGED_IDS else ''
+            logger.info(f"  {problem.capitalize()}: {len(ids)}: {', '.join(ids[:LOGGED_IDS])}{more}")
+    
+    report = verifier.write_report(result)
+    if report:
+        logger.warning(f"Differing IDs written to {report}")
+        return 1
+    logger.info("Table matches the source file")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Long-running service that imports new and appended files from a folder."""
+import argparse
+import signal
+import sys
+import logging
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from run_imports import IMPORTERS, setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Default file name globs (case-insensitive) for the garage software exports
+DEFAULT_ROUTES = {
+    'documents*.csv': 'documents',
+    'lineitems*.csv': 'line_items',
+    'document_extras*.csv': 'document_extras',
+}
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Watch a folder and import new or appended CSV files.')
+    
+    parser.add_argument(
+        '--dir',
+        required=True,
+        help='Directory to watch'
+    )
+    
+    parser.add_argument(
+        '--route',
+        action='append',
+        default=[],
+        metavar='GLOB=TYPE',
+        help=f"Route files matching GLOB to an import type (repeatable; default: {', '.join(f'{g}={t}' for g, t in DEFAULT_ROUTES.items())})"
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=5.0,
+        help='Seconds between directory scans (default: 5)'
+    )
+    
+    parser.add_argument(
+        '--state-file',
+        default=None,
+        help='File storing per-file offsets (default: <dir>/.import_offsets.json)'
+    )
+    
+    parser.add_argument(
+        '--max-attempts',
+        type=int,
+        default=5,
+        help='Failed attempts at a range before it is quarantined and skipped (default: 5)'
+    )
+    
+    parser.add_argument(
+        '--idle-flush',
+        type=float,
+        default=60.0,
+        help='Seconds a file must be unchanged before a final record without a newline is imported (0 to disable; default: 60)'
+    )
+    
+    parser.add_argument(
+        '--quarantine-dir',
+        default=None,
+        help='Directory for ranges skipped after repeated failures (default: <dir>/.quarantine)'
+    )
+    
+    parser.add_argument(
+        '--once',
+        action='store_true',
+        help='Scan the directory once and exit (e.g. from cron)'
+    )
+    
+    return parser.parse_args()
+
+def parse_routes(values):
+    """Parse GLOB=TYPE route arguments into a glob -> importer class mapping."""
+    routes = {}
+    for value in values or [f'{g}={t}' for g, t in DEFAULT_ROUTES.items()]:
+        pattern, _, import_type = value.partition('=')
+        if import_type not in IMPORTERS:
+            raise ValueError(f"Invalid route {value!r}: type must be one of {', '.join(IMPORTERS)}")
+        routes[pattern] = IMPORTERS[import_type]
+    return routes
+
+def main():
+    """Run the folder watcher."""
+    args = parse_arguments()
+    setup_logging()
+    
+    from src.watcher import FolderWatcher
+    
+    try:
+        watcher = FolderWatcher(
+            args.dir,
+            parse_routes(args.route),
+            state_path=args.state_file,
+            interval=args.interval,
+            max_attempts=args.max_attempts,
+            idle_flush=args.idle_flush,
+            quarantine_dir=args.quarantine_dir
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    
+    if args.once:
+        watcher.poll()
+        return 0
+    
+    signal.signal(signal.SIGTERM, watcher.stop)
+    signal.signal(signal.SIGINT, watcher.stop)
+    watcher.run()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
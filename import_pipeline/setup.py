@@ -14,12 +14,17 @@ setup(
     packages=find_packages(where='src'),
     package_dir={'': 'src'},
     install_requires=[
+        'numpy>=1.20.0',
         'pandas>=1.3.0',
         'psycopg2-binary>=2.9.0',
         'pyyaml>=6.0',
         'python-dotenv>=0.19.0',
         'tqdm>=4.62.0',
     ],
+    extras_require={
+        'pyarrow': ['pyarrow>=10.0.0'],
+        'duckdb': ['duckdb>=0.9.0'],
+    },
     python_requires='>=3.8',
     entry_points={
         'console_scripts': [
@@ -0,0 +1,360 @@
+"""Declarative computed columns evaluated column-wise per chunk.
+
+Computed fields are declared in a column-map YAML under ``computed_fields``,
+mapping a DB column to an expression over other (mapped, defaulted or
+previously computed) DB columns::
+
+    computed_fields:
+      balance_due: "total_amount - paid_amount"
+      customer_name: "concat(customer_first_name, customer_last_name, sep=' ')"
+      total_amount: "coalesce(total_amount, quantity * unit_price)"
+      payment_status: "'paid' if balance_due <= 0 else 'unpaid'"
+
+Supported syntax:
+
+- arithmetic: ``+ - * /`` and unary minus
+- comparisons: ``== != < <= > >=``, ``is None`` and ``is not None``
+- boolean logic: ``and``, ``or``, ``not``
+- conditionals: ``<value> if <condition> else <value>``
+- functions: ``concat(a, b, ..., sep='')``, ``coalesce(a, b, ...)``,
+  ``round(x, digits)``, ``upper(x)``, ``lower(x)``, ``strip(x)``
+
+Nulls propagate like SQL: arithmetic with a null operand yields null,
+comparisons against null are false, ``concat`` skips nulls (like
+``CONCAT_WS``) and division by zero yields null.
+
+Expressions are parsed and compiled once when the importer is created; each
+chunk is then evaluated as whole pandas Series rather than row by row.
+"""
+import ast
+import operator
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class ComputedFieldError(ValueError):
+    """Raised when a computed field expression is invalid."""
+    def __init__(self, field: str, message: str, expression: str = None):
+        self.field = field
+        self.message = message
+        self.expression = expression
+        super().__init__(f"{field}: {message} (expression: {expression})")
+
+
+class EvaluationContext:
+    """Column access for one chunk of processed records."""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records = records
+        self.index = pd.RangeIndex(len(records))
+        self._columns: Dict[str, pd.Series] = {}
+
+    def column(self, name: str) -> pd.Series:
+        """Return a column as an object Series, building it on first access."""
+        if name not in self._columns:
+            self._columns[name] = pd.Series(
+                [record.get(name) for record in self.records],
+                index=self.index,
+                dtype=object
+            )
+        return self._columns[name]
+
+    def set_column(self, name: str, values: pd.Series):
+        """Store a computed column so later expressions can reference it."""
+        self._columns[name] = values
+
+    def constant(self, value: Any) -> pd.Series:
+        """Broadcast a literal to a Series of the chunk's length."""
+        return pd.Series([value] * len(self.index), index=self.index, dtype=object)
+
+
+Evaluator = Callable[[EvaluationContext], pd.Series]
+
+
+def _as_decimal(value: Any) -> Any:
+    """Convert floats to Decimal so they can be combined with Decimal values."""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    return value
+
+
+def _null_series(index: pd.Index) -> pd.Series:
+    return pd.Series(None, index=index, dtype=object)
+
+
+def _apply_binary(op: Callable, left: pd.Series, right: pd.Series, valid: pd.Series) -> pd.Series:
+    """Apply ``op`` to the rows where ``valid`` is true, leaving the rest null."""
+    result = _null_series(left.index)
+    if valid.any():
+        lhs, rhs = left[valid], right[valid]
+        try:
+            values = op(lhs, rhs)
+        except TypeError:
+            # Mixed Decimal/float operands (e.g. a float YAML default)
+            values = op(lhs.map(_as_decimal), rhs.map(_as_decimal))
+        result[valid] = values
+    return result
+
+
+def _arithmetic(op: Callable) -> Callable[[pd.Series, pd.Series], pd.Series]:
+    def apply(left: pd.Series, right: pd.Series) -> pd.Series:
+        valid = left.notna() & right.notna()
+        if op is operator.truediv:
+            valid &= (right != 0)
+        return _apply_binary(op, left, right, valid)
+    return apply
+
+
+def _comparison(op: Callable) -> Callable[[pd.Series, pd.Series], pd.Series]:
+    def apply(left: pd.Series, right: pd.Series) -> pd.Series:
+        valid = left.notna() & right.notna()
+        return _apply_binary(op, left, right, valid).fillna(False).astype(bool)
+    return apply
+
+
+def _as_bool(values: pd.Series) -> pd.Series:
+    if values.dtype == bool:
+        return values
+    return values.where(values.notna(), False).astype(bool)
+
+
+def _concat(args: List[pd.Series], sep: str = '') -> pd.Series:
+    parts = [arg.where(arg.notna(), '').astype(str).str.strip() for arg in args]
+    result = parts[0]
+    for part in parts[1:]:
+        joiner = np.where((result != '') & (part != ''), sep, '')
+        result = result + joiner + part
+    return result.where(result != '', None).astype(object)
+
+
+def _coalesce(args: List[pd.Series]) -> pd.Series:
+    result = args[0]
+    for arg in args[1:]:
+        result = result.where(result.notna(), arg)
+    return result
+
+
+def _round(args: List[pd.Series]) -> pd.Series:
+    values = args[0]
+    digits = args[1] if len(args) > 1 else None
+    places = int(digits.iloc[0]) if digits is not None and len(digits) else 0
+    result = _null_series(values.index)
+    valid = values.notna()
+    if valid.any():
+        result[valid] = values[valid].map(lambda v: round(_as_decimal(v), places))
+    return result
+
+
+def _string_method(method: str) -> Callable[[List[pd.Series]], pd.Series]:
+    def apply(args: List[pd.Series]) -> pd.Series:
+        values = args[0]
+        valid = values.notna()
+        result = _null_series(values.index)
+        if valid.any():
+            result[valid] = getattr(values[valid].astype(str).str, method)()
+        return result
+    return apply
+
+
+BINARY_OPERATORS = {
+    ast.Add: _arithmetic(operator.add),
+    ast.Sub: _arithmetic(operator.sub),
+    ast.Mult: _arithmetic(operator.mul),
+    ast.Div: _arithmetic(operator.truediv),
+}
+
+COMPARISON_OPERATORS = {
+    ast.Eq: _comparison(operator.eq),
+    ast.NotEq: _comparison(operator.ne),
+    ast.Lt: _comparison(operator.lt),
+    ast.LtE: _comparison(operator.le),
+    ast.Gt: _comparison(operator.gt),
+    ast.GtE: _comparison(operator.ge),
+}
+
+FUNCTIONS = {
+    'coalesce': _coalesce,
+    'round': _round,
+    'upper': _string_method('upper'),
+    'lower': _string_method('lower'),
+    'strip': _string_method('strip'),
+}
+
+
+class ComputedField:
+    """A single compiled computed field."""
+
+    def __init__(self, name: str, expression: str):
+        self.name = name
+        self.expression = expression
+        self.columns: List[str] = []
+        try:
+            tree = ast.parse(str(expression).strip(), mode='eval')
+        except SyntaxError as e:
+            raise ComputedFieldError(name, f"invalid syntax: {e.msg}", expression)
+        self._evaluate = self._compile(tree.body)
+
+    def _error(self, message: str) -> ComputedFieldError:
+        return ComputedFieldError(self.name, message, self.expression)
+
+    def _compile(self, node: ast.AST) -> Evaluator:
+        """Compile an AST node into a function of the evaluation context."""
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name not in self.columns:
+                self.columns.append(name)
+            return lambda ctx: ctx.column(name)
+
+        if isinstance(node, ast.Constant):
+            value = node.value
+            if isinstance(value, float):
+                value = Decimal(str(value))
+            return lambda ctx: ctx.constant(value)
+
+        if isinstance(node, ast.BinOp):
+            op = BINARY_OPERATORS.get(type(node.op))
+            if op is None:
+                raise self._error(f"unsupported operator {type(node.op).__name__}")
+            left, right = self._compile(node.left), self._compile(node.right)
+            return lambda ctx: op(left(ctx), right(ctx))
+
+        if isinstance(node, ast.UnaryOp):
+            operand = self._compile(node.operand)
+            if isinstance(node.op, ast.USub):
+                negate = BINARY_OPERATORS[ast.Sub]
+                return lambda ctx: negate(ctx.constant(0), operand(ctx))
+            if isinstance(node.op, ast.Not):
+                return lambda ctx: ~_as_bool(operand(ctx))
+            raise self._error(f"unsupported operator {type(node.op).__name__}")
+
+        if isinstance(node, ast.BoolOp):
+            values = [self._compile(value) for value in node.values]
+            combine = operator.and_ if isinstance(node.op, ast.And) else operator.or_
+
+            def evaluate_bool(ctx):
+                result = _as_bool(values[0](ctx))
+                for value in values[1:]:
+                    result = combine(result, _as_bool(value(ctx)))
+                return result
+            return evaluate_bool
+
+        if isinstance(node, ast.Compare):
+            return self._compile_compare(node)
+
+        if isinstance(node, ast.IfExp):
+            test, body, orelse = (
+                self._compile(node.test), self._compile(node.body), self._compile(node.orelse)
+            )
+            return lambda ctx: body(ctx).where(_as_bool(test(ctx)), orelse(ctx))
+
+        if isinstance(node, ast.Call):
+            return self._compile_call(node)
+
+        raise self._error(f"unsupported expression {type(node).__name__}")
+
+    def _compile_compare(self, node: ast.Compare) -> Evaluator:
+        """Compile a (possibly chained) comparison such as ``0 < x <= 10``."""
+        steps = []
+        left_node = node.left
+        for op, right_node in zip(node.ops, node.comparators):
+            left = self._compile(left_node)
+            if isinstance(op, (ast.Is, ast.IsNot)):
+                if not (isinstance(right_node, ast.Constant) and right_node.value is None):
+                    raise self._error("'is' comparisons are only supported against None")
+                if isinstance(op, ast.Is):
+                    steps.append(lambda ctx, left=left: left(ctx).isna())
+                else:
+                    steps.append(lambda ctx, left=left: left(ctx).notna())
+            else:
+                compare = COMPARISON_OPERATORS.get(type(op))
+                if compare is None:
+                    raise self._error(f"unsupported comparison {type(op).__name__}")
+                right = self._compile(right_node)
+                steps.append(
+                    lambda ctx, left=left, right=right, compare=compare: compare(left(ctx), right(ctx))
+                )
+            left_node = right_node
+
+        def evaluate_compare(ctx):
+            result = steps[0](ctx)
+            for step in steps[1:]:
+                result = result & step(ctx)
+            return result
+        return evaluate_compare
+
+    def _compile_call(self, node: ast.Call) -> Evaluator:
+        """Compile a call to one of the supported functions."""
+        if not isinstance(node.func, ast.Name):
+            raise self._error("only plain function calls are supported")
+        name = node.func.id
+        if not node.args:
+            raise self._error(f"{name}() needs at least one argument")
+        args = [self._compile(arg) for arg in node.args]
+
+        if name == 'concat':
+            sep = ''
+            for keyword in node.keywords:
+                if keyword.arg != 'sep' or not isinstance(keyword.value, ast.Constant):
+                    raise self._error("concat() only accepts a literal 'sep' keyword")
+                sep = str(keyword.value.value)
+            return lambda ctx: _concat([arg(ctx) for arg in args], sep)
+
+        function = FUNCTIONS.get(name)
+        if function is None:
+            raise self._error(f"unknown function {name}()")
+        if node.keywords:
+            raise self._error(f"{name}() does not accept keyword arguments")
+        return lambda ctx: function([arg(ctx) for arg in args])
+
+    def evaluate(self, ctx: EvaluationContext) -> pd.Series:
+        """Evaluate the field for a whole chunk."""
+        return self._evaluate(ctx)
+
+
+def compile_computed_fields(
+    config: Optional[Dict[str, str]],
+    known_fields: Iterable[str] = None
+) -> List[ComputedField]:
+    """Compile the ``computed_fields`` section of a column map.
+
+    Args:
+        config: Mapping of DB column name to expression.
+        known_fields: DB columns available before computed fields are applied.
+                      If given, expressions referencing anything else are rejected.
+
+    Returns:
+        Compiled fields in declaration order.
+    """
+    fields = []
+    available = set(known_fields) if known_fields is not None else None
+    for name, expression in (config or {}).items():
+        field = ComputedField(name, expression)
+        if available is not None:
+            unknown = [column for column in field.columns if column not in available]
+            if unknown:
+                raise ComputedFieldError(name, f"unknown fields {unknown}", expression)
+            available.add(name)
+        fields.append(field)
+    return fields
+
+
+def _to_python(values: pd.Series) -> List[Any]:
+    """Convert a Series to plain Python values with None for nulls."""
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def apply_computed_fields(records: List[Dict[str, Any]], fields: List[ComputedField]) -> List[Dict[str, Any]]:
+    """Evaluate computed fields over a chunk and write them into the records in place."""
+    if not records or not fields:
+        return records
+
+    ctx = EvaluationContext(records)
+    for field in fields:
+        values = field.evaluate(ctx)
+        ctx.set_column(field.name, values)
+        for record, value in zip(records, _to_python(values)):
+            record[field.name] = value
+    return records
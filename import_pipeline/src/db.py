@@ -1,29 +1,71 @@
-"""Database connection and utility functions."""
+"""Database connection and utility functions.
+
+psycopg2 and python-dotenv are imported on first use so that importing this
+module (and every importer that depends on it) stays cheap.
+"""
 import os
-from typing import Any, Dict, List, Optional
-import psycopg2
-from psycopg2 import sql
-from psycopg2.extras import DictCursor
-from dotenv import load_dotenv
+import uuid
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+_env_loaded = False
+
+# Postgres column types for the type_casting names in the column maps
+PG_TYPES = {
+    'integer': 'INTEGER',
+    'decimal': 'DECIMAL(10,2)',
+    'date': 'DATE',
+    'text': 'TEXT',
+    'boolean': 'BOOLEAN'
+}
 
-# Load environment variables
-load_dotenv()
+def load_env():
+    """Load environment variables from .env once."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
 
 class DatabaseConnection:
     """Handles database connections and operations."""
     
-    def __init__(self, dsn: str = None):
-        """Initialize with a connection string or use DATABASE_URL from environment."""
+    def __init__(self, dsn: str = None, persistent: bool = False):
+        """Initialize with a connection string or use DATABASE_URL from environment.
+        
+        With ``persistent=True``, ``get_connection()`` keeps returning the same
+        open connection instead of opening a new one for every call, which
+        long-running processes use to avoid reconnecting for each batch.
+        """
+        if not dsn:
+            load_env()
         self.dsn = dsn or os.getenv('DATABASE_URL')
         if not self.dsn:
             raise ValueError("Database connection string not provided and DATABASE_URL not found in environment")
+        self.persistent = persistent
+        self._connection = None
     
-    def get_connection(self):
-        """Get a new database connection."""
+    def connect(self):
+        """Open a new database connection."""
+        import psycopg2
         return psycopg2.connect(self.dsn)
     
+    def get_connection(self):
+        """Get a database connection, reusing the open one in persistent mode."""
+        if not self.persistent:
+            return self.connect()
+        if self._connection is None or self._connection.closed:
+            self._connection = self.connect()
+        return self._connection
+    
+    def close(self):
+        """Close the persistent connection, if any."""
+        if self._connection is not None and not self._connection.closed:
+            self._connection.close()
+        self._connection = None
+    
     def execute_query(self, query: str, params: tuple = None, fetch: bool = True):
         """Execute a query and return results."""
+        from psycopg2.extras import DictCursor
         with self.get_connection() as conn:
             with conn.cursor(cursor_factory=DictCursor) as cursor:
                 cursor.execute(query, params or ())
@@ -31,6 +73,46 @@ class DatabaseConnection:
                     return cursor.fetchall()
                 return None
     
+    def stream_query(self, query: str, params: tuple = None, batch_size: int = 2000) -> Iterator[Any]:
+        """Execute a query and yield rows without loading the full result set.
+        
+        Uses a named (server-side) cursor, so only ``batch_size`` rows are held
+        in memory at a time. The connection stays open until the iterator is
+        exhausted or closed.
+        """
+        from psycopg2.extras import DictCursor
+        conn = self.connect()
+        try:
+            # Named cursors only live inside a transaction
+            with conn:
+                with conn.cursor(name=f"stream_{uuid.uuid4().hex}", cursor_factory=DictCursor) as cursor:
+                    cursor.itersize = batch_size
+                    cursor.execute(query, params or ())
+                    for row in cursor:
+                        yield row
+        finally:
+            conn.close()
+    
+    def copy_to(self, query: str, file: IO, params: tuple = None, header: bool = True) -> int:
+        """Stream the result of a query to a file object as CSV using COPY ... TO STDOUT.
+        
+        The file receives bytes if opened in binary mode, text otherwise.
+        Returns the number of rows copied.
+        """
+        conn = self.connect()
+        try:
+            with conn.cursor() as cursor:
+                if params:
+                    query = cursor.mogrify(query, params).decode()
+                query = query.strip().rstrip(';')
+                cursor.copy_expert(
+                    f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER {'true' if header else 'false'})",
+                    file
+                )
+                return cursor.rowcount
+        finally:
+            conn.close()
+    
     def execute_many(self, query: str, params_list: List[tuple]):
         """Execute a query multiple times with different parameters."""
         with self.get_connection() as conn:
@@ -64,22 +146,37 @@ class DatabaseConnection:
         return [row[0] for row in results] if results else []
     
     def create_table_from_mapping(self, table_name: str, mapping: Dict[str, Any]):
-        """Create a table based on a mapping configuration."""
+        """Create a table based on a mapping configuration.
+        
+        With a ``partitioning`` section the table is created range-partitioned,
+        with its default partition and the partitions from ``from`` onwards.
+        """
         # This is a simplified version - you'd want to expand this to handle different field types
         fields = []
         for field, field_type in mapping.get('type_casting', {}).items():
-            pg_type = {
-                'integer': 'INTEGER',
-                'decimal': 'DECIMAL(10,2)',
-                'date': 'DATE',
-                'text': 'TEXT',
-                'boolean': 'BOOLEAN'
-            }.get(field_type, 'TEXT')
+            pg_type = PG_TYPES.get(field_type, 'TEXT')
             
             fields.append(f"{field} {pg_type}")
         
         # Add ID field if not specified
         id_field = mapping.get('id_field', 'id')
+        partitioning = mapping.get('partitioning')
+        if partitioning:
+            from .partitioning import RangePartitioning
+            scheme = RangePartitioning(table_name, partitioning, id_field)
+            # The ID is unique per partition rather than a table-wide primary key
+            if id_field not in [f.split()[0] for f in fields]:
+                fields.insert(0, f"{id_field} TEXT NOT NULL")
+            if scheme.column not in [f.split()[0] for f in fields]:
+                fields.append(f"{scheme.column} DATE")
+            
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(scheme.parent_sql(fields))
+                    for key in [None] + scheme.initial_keys():
+                        cursor.execute(scheme.partition_sql(key))
+            return
+        
         if id_field not in [f.split()[0] for f in fields]:
             fields.insert(0, f"{id_field} TEXT PRIMARY KEY")
         
@@ -93,9 +190,12 @@ class DatabaseConnection:
             with conn.cursor() as cursor:
                 cursor.execute(create_sql)
 
-# Singleton instance
-db = DatabaseConnection()
+# Singleton instance, created on first use
+_db: Optional[DatabaseConnection] = None
 
 def get_db() -> DatabaseConnection:
-    """Get the database connection instance."""
-    return db
+    """Get the database connection instance, creating it on first call."""
+    global _db
+    if _db is None:
+        _db = DatabaseConnection()
+    return _db
@@ -0,0 +1,560 @@
+"""DVLA and MOT history enrichment for imported vehicle registrations.
+
+A column map can enable enrichment with an ``enrichment`` section::
+
+    enrichment:
+      registration_field: vehicle_registration
+      sources: [dvla, mot]
+      table: vehicle_enrichment
+
+Registrations are collected from each processed chunk and looked up while
+the rest of the file is still being imported:
+
+- responses (including "not found") are kept in an on-disk SQLite cache and
+  reused until they are older than the TTL,
+- duplicate registrations, within a file or across concurrent imports, share
+  one in-flight request,
+- requests run on a bounded thread pool and each source has its own
+  token-bucket rate limiter,
+- rate-limited (429) and server errors are retried with backoff.
+
+The HTTP client is any callable ``client(method, url, headers, body, timeout)``
+returning ``(status, body, headers)``, so tests can substitute their own or
+point the API URLs at a local stub server.
+
+Configuration comes from the environment, using the same variables as the
+web app (``DVLA_API_KEY``, ``DVSA_API_KEY``, ``DVSA_CLIENT_ID``,
+``DVSA_CLIENT_SECRET``, ``DVSA_TENANT_ID``, ``DVSA_SCOPE``,
+``DVSA_API_BASE_URL``) plus ``DVLA_API_URL`` and ``DVSA_TOKEN_URL`` overrides,
+``ENRICHMENT_CACHE`` (cache file), ``ENRICHMENT_TTL_DAYS``,
+``ENRICHMENT_WORKERS``, ``ENRICHMENT_RATE`` and ``ENRICHMENT_BURST``. Sources
+without credentials are skipped.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DVLA_API_URL = 'https://driver-vehicle-licensing.api.gov.uk/vehicle-enquiry/v1/vehicles'
+DVSA_API_BASE_URL = 'https://history.mot.api.gov.uk/v1/trade/vehicles'
+DVSA_SCOPE = 'https://tapi.dvsa.gov.uk/.default'
+
+DEFAULT_CACHE_PATH = os.path.join('.cache', 'enrichment.sqlite')
+# Vehicle and MOT data changes rarely; refetching it every run costs hours of API calls
+DEFAULT_TTL_DAYS = 14
+DEFAULT_WORKERS = 4
+# Requests per second and burst size per source (matches the web app's DVSA limits)
+DEFAULT_RATE = 15
+DEFAULT_BURST = 10
+
+# Statuses worth retrying, and statuses whose responses are cached
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CACHED_STATUSES = (200, 404)
+
+HttpClient = Callable[[str, str, Dict[str, str], Optional[bytes], float], Tuple[int, bytes, Dict[str, str]]]
+
+
+class EnrichmentError(Exception):
+    """Raised when a lookup fails after all retries."""
+
+
+def normalize_registration(value: Any) -> Optional[str]:
+    """Return a registration in upper case without spaces, or None if empty."""
+    if value is None:
+        return None
+    registration = ''.join(str(value).split()).upper()
+    return registration or None
+
+
+def urllib_client(method: str, url: str, headers: Dict[str, str], body: Optional[bytes], timeout: float):
+    """Default HTTP client built on ``urllib.request``."""
+    request = urllib.request.Request(url, data=body, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read(), dict(response.headers)
+    except urllib.error.HTTPError as e:
+        return e.code, e.read(), dict(e.headers or {})
+
+
+class TokenBucket:
+    """Thread-safe token-bucket rate limiter."""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """Allow ``rate`` acquisitions per second on average and up to ``burst`` at once."""
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self._sleep((1 - self._tokens) / self.rate)
+
+
+class ResponseCache:
+    """Persistent response cache keyed by source and registration."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL_DAYS * 86400):
+        """Open (creating if needed) the SQLite cache file.
+
+        Args:
+            path: Cache file path.
+            ttl: Seconds a cached response stays valid.
+        """
+        self.path = path
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    source TEXT NOT NULL,
+                    registration TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    body TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (source, registration)
+                )
+            """)
+
+    def get_many(self, source: str, registrations: List[str]) -> Dict[str, Tuple[int, Optional[str]]]:
+        """Return unexpired ``registration -> (status, body)`` entries."""
+        found = {}
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(registrations), 500):
+                batch = registrations[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT registration, status, body FROM responses "
+                    f"WHERE source = ? AND fetched_at >= ? AND registration IN ({', '.join('?' * len(batch))})",
+                    [source, cutoff, *batch]
+                ).fetchall()
+                found.update((registration, (status, body)) for registration, status, body in rows)
+        return found
+
+    def put(self, source: str, registration: str, status: int, body: Optional[str]):
+        """Store a response."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (source, registration, status, body, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (source, registration, status, body, time.time())
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DvlaSource:
+    """DVLA Vehicle Enquiry Service lookups."""
+
+    name = 'dvla'
+
+    def __init__(self, api_key: str, url: str = DVLA_API_URL):
+        self.api_key = api_key
+        self.url = url
+
+    @classmethod
+    def from_env(cls) -> Optional['DvlaSource']:
+        api_key = os.getenv('DVLA_API_KEY')
+        if not api_key:
+            return None
+        return cls(api_key, os.getenv('DVLA_API_URL', DVLA_API_URL))
+
+    def request(self, registration: str, client: HttpClient, timeout: float):
+        """Return ``(method, url, headers, body)`` for one lookup."""
+        headers = {'Content-Type': 'application/json', 'x-api-key': self.api_key}
+        body = json.dumps({'registrationNumber': registration}).encode('utf-8')
+        return 'POST', self.url, headers, body
+
+
+class MotHistorySource:
+    """DVSA MOT history API lookups, authenticated with OAuth client credentials."""
+
+    name = 'mot'
+
+    def __init__(self, api_key: str, client_id: str, client_secret: str, token_url: str,
+                 base_url: str = DVSA_API_BASE_URL, scope: str = DVSA_SCOPE):
+        self.api_key = api_key
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.base_url = base_url.rstrip('/')
+        self.scope = scope
+        self._token: Optional[str] = None
+        self._token_expires = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional['MotHistorySource']:
+        api_key = os.getenv('DVSA_API_KEY')
+        client_id = os.getenv('DVSA_CLIENT_ID')
+        client_secret = os.getenv('DVSA_CLIENT_SECRET')
+        tenant_id = os.getenv('DVSA_TENANT_ID')
+        token_url = os.getenv('DVSA_TOKEN_URL') or (
+            tenant_id and f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
+        )
+        if not (api_key and client_id and client_secret and token_url):
+            return None
+        return cls(
+            api_key, client_id, client_secret, token_url,
+            base_url=os.getenv('DVSA_API_BASE_URL', DVSA_API_BASE_URL),
+            scope=os.getenv('DVSA_SCOPE', DVSA_SCOPE)
+        )
+
+    def _access_token(self, client: HttpClient, timeout: float) -> str:
+        """Return a cached access token, fetching a new one shortly before expiry."""
+        with self._lock:
+            if self._token and time.time() < self._token_expires:
+                return self._token
+            body = urllib.parse.urlencode({
+                'grant_type': 'client_credentials',
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'scope': self.scope,
+            }).encode('utf-8')
+            status, data, _ = client(
+                'POST', self.token_url,
+                {'Content-Type': 'application/x-www-form-urlencoded'}, body, timeout
+            )
+            if status != 200:
+                raise EnrichmentError(f"DVSA token request failed with HTTP {status}")
+            token = json.loads(data)
+            self._token = token['access_token']
+            self._token_expires = time.time() + int(token.get('expires_in', 3600)) - 60
+            return self._token
+
+    def request(self, registration: str, client: HttpClient, timeout: float):
+        """Return ``(method, url, headers, body)`` for one lookup."""
+        headers = {
+            'Accept': 'application/json',
+            'Authorization': f"Bearer {self._access_token(client, timeout)}",
+            'X-API-Key': self.api_key,
+        }
+        url = f"{self.base_url}/registration/{urllib.parse.quote(registration)}"
+        return 'GET', url, headers, None
+
+
+SOURCES = {
+    'dvla': DvlaSource,
+    'mot': MotHistorySource,
+}
+
+
+class Enricher:
+    """Looks up registrations against one or more sources with caching and rate limiting."""
+
+    def __init__(
+        self,
+        sources: List[Any],
+        client: Optional[HttpClient] = None,
+        cache: Optional[ResponseCache] = None,
+        max_workers: int = DEFAULT_WORKERS,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        max_retries: int = 3,
+        timeout: float = 10.0,
+        backoff: float = 1.0
+    ):
+        """Initialize the enricher.
+
+        Args:
+            sources: Source objects (e.g. :class:`DvlaSource`).
+            client: HTTP client callable (default: :func:`urllib_client`).
+            cache: Response cache, or None to always fetch.
+            max_workers: Maximum number of concurrent requests.
+            rate: Requests per second allowed per source.
+            burst: Requests per source allowed at once before rate limiting.
+            max_retries: Retries for 429 and 5xx responses and network errors.
+            timeout: Per-request timeout in seconds.
+            backoff: Base delay in seconds, doubled after each retry.
+        """
+        self.sources = sources
+        self.client = client or urllib_client
+        self.cache = cache
+        self.max_workers = max_workers
+        self.limiters = {source.name: TokenBucket(rate, burst) for source in sources}
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'not_found': 0, 'errors': 0}
+
+    @classmethod
+    def from_env(cls, source_names: Iterable[str], client: Optional[HttpClient] = None) -> 'Enricher':
+        """Build an enricher for the named sources that have credentials configured."""
+        sources = []
+        for name in source_names:
+            if name not in SOURCES:
+                raise ValueError(f"Unknown enrichment source: {name} (expected one of {', '.join(SOURCES)})")
+            source = SOURCES[name].from_env()
+            if source is None:
+                logger.warning(f"No credentials configured for {name} enrichment; skipping it")
+            else:
+                sources.append(source)
+        if not sources:
+            return cls(sources, client=client)
+        ttl_days = float(os.getenv('ENRICHMENT_TTL_DAYS', DEFAULT_TTL_DAYS))
+        return cls(
+            sources,
+            client=client,
+            cache=ResponseCache(os.getenv('ENRICHMENT_CACHE', DEFAULT_CACHE_PATH), ttl_days * 86400),
+            max_workers=int(os.getenv('ENRICHMENT_WORKERS', DEFAULT_WORKERS)),
+            rate=float(os.getenv('ENRICHMENT_RATE', DEFAULT_RATE)),
+            burst=int(os.getenv('ENRICHMENT_BURST', DEFAULT_BURST))
+        )
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def reset_stats(self) -> Dict[str, int]:
+        """Return the counters since the last reset and zero them."""
+        with self._lock:
+            stats, self.stats = self.stats, dict.fromkeys(self.stats, 0)
+        return stats
+
+    def _completed(self, result: Any) -> Future:
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def submit(self, registrations: Iterable[Any]) -> Dict[Tuple[str, str], Future]:
+        """Start lookups without waiting for them.
+
+        Returns:
+            Futures keyed by ``(source, registration)`` that resolve to the
+            decoded response, or None if the vehicle was not found.
+        """
+        wanted = list(dict.fromkeys(filter(None, map(normalize_registration, registrations))))
+        futures: Dict[Tuple[str, str], Future] = {}
+        if not wanted:
+            return futures
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='enrichment')
+
+        for source in self.sources:
+            cached = self.cache.get_many(source.name, wanted) if self.cache else {}
+            for registration in wanted:
+                key = (source.name, registration)
+                if registration in cached:
+                    self._count('cache_hits')
+                    futures[key] = self._completed(self._decode(*cached[registration]))
+                    continue
+                with self._lock:
+                    future = self._inflight.get(key)
+                    started = future is None
+                    if started:
+                        future = self._executor.submit(self._fetch, source, registration)
+                        self._inflight[key] = future
+                    else:
+                        self.stats['coalesced'] += 1
+                if started:
+                    # Outside the lock: runs immediately if the fetch already finished
+                    future.add_done_callback(lambda _, key=key: self._forget(key))
+                futures[key] = future
+        return futures
+
+    def lookup(self, registrations: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """Look up registrations and wait for the results.
+
+        Returns:
+            ``registration -> {source: data}`` for every registration found.
+        """
+        return self.collect(self.submit(registrations))
+
+    def collect(self, futures: Dict[Tuple[str, str], Future]) -> Dict[str, Dict[str, Any]]:
+        """Wait for submitted lookups and group the results by registration."""
+        results: Dict[str, Dict[str, Any]] = {}
+        for (source, registration), future in futures.items():
+            try:
+                data = future.result()
+            except Exception as e:
+                self._count('errors')
+                logger.warning(f"{source} lookup for {registration} failed: {e}")
+                continue
+            if data is not None:
+                results.setdefault(registration, {})[source] = data
+        return results
+
+    def _forget(self, key: Tuple[str, str]):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _decode(status: int, body: Optional[str]) -> Any:
+        return json.loads(body) if status == 200 and body else None
+
+    def _fetch(self, source: Any, registration: str) -> Any:
+        """Fetch one registration from one source, retrying transient failures."""
+        for attempt in range(self.max_retries + 1):
+            self.limiters[source.name].acquire()
+            delay = self.backoff * 2 ** attempt
+            try:
+                method, url, headers, body = source.request(registration, self.client, self.timeout)
+                self._count('requests')
+                status, data, response_headers = self.client(method, url, headers, body, self.timeout)
+            except (OSError, EnrichmentError) as e:
+                if attempt == self.max_retries:
+                    raise EnrichmentError(str(e)) from e
+                time.sleep(delay)
+                continue
+
+            if status in RETRY_STATUSES and attempt < self.max_retries:
+                retry_after = (response_headers or {}).get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    delay = int(retry_after)
+                logger.debug(f"{source.name} returned HTTP {status} for {registration}; retrying in {delay}s")
+                time.sleep(delay)
+                continue
+            break
+
+        if status not in CACHED_STATUSES:
+            raise EnrichmentError(f"HTTP {status}")
+        text = data.decode('utf-8') if status == 200 else None
+        if status == 404:
+            self._count('not_found')
+        if self.cache:
+            self.cache.put(source.name, registration, status, text)
+        return self._decode(status, text)
+
+    def close(self):
+        """Shut down the worker threads and close the cache."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.cache:
+            self.cache.close()
+
+
+class EnrichmentStage:
+    """Chunk stage that enriches imported registrations and stores the results."""
+
+    def __init__(self, config: Dict[str, Any], enricher: Optional[Enricher] = None):
+        self.field = config.get('registration_field', 'vehicle_registration')
+        self.table = config.get('table', 'vehicle_enrichment')
+        self.source_names = list(config.get('sources') or SOURCES)
+        self.enricher = enricher
+        # An enricher built here is closed (threads and cache) at the end of each import
+        self._owns_enricher = enricher is None
+        self._futures: Dict[Tuple[str, str], Future] = {}
+        self._seen = set()
+
+    def _get_enricher(self) -> Enricher:
+        if self.enricher is None:
+            self.enricher = Enricher.from_env(self.source_names)
+        return self.enricher
+
+    def apply(self, chunk, records: List[Dict[str, Any]]):
+        """Start lookups for the chunk's registrations while the import continues."""
+        enricher = self._get_enricher()
+        if not enricher.sources:
+            return
+        new = set()
+        for record in records:
+            registration = normalize_registration(record.get(self.field))
+            if registration is not None and registration not in self._seen:
+                new.add(registration)
+        self._seen.update(new)
+        self._futures.update(enricher.submit(sorted(new)))
+
+    def _create_table_sql(self) -> str:
+        # One column per known source, so credentials added later need no migration
+        columns = ', '.join(f"{name} JSONB" for name in SOURCES)
+        return f"""
+        CREATE TABLE IF NOT EXISTS {self.table} (
+            registration VARCHAR(20) PRIMARY KEY,
+            {columns},
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        """
+
+    def _ensure_table(self, cursor):
+        """Create the table, adding source columns missing from one created earlier."""
+        cursor.execute(self._create_table_sql())
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = 'public' AND table_name = %s",
+            (self.table,)
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        for source in self.enricher.sources:
+            # Only ALTER when needed: it takes an exclusive lock even as a no-op
+            if source.name not in existing:
+                cursor.execute(f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS {source.name} JSONB")
+
+    def _store(self, db, results: Dict[str, Dict[str, Any]]):
+        """Upsert the looked-up data, one column per source."""
+        with db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                self._ensure_table(cursor)
+                for source in self.enricher.sources:
+                    rows = [
+                        (registration, json.dumps(data[source.name]))
+                        for registration, data in results.items()
+                        if source.name in data
+                    ]
+                    if rows:
+                        cursor.executemany(
+                            f"INSERT INTO {self.table} (registration, {source.name}, updated_at) "
+                            f"VALUES (%s, %s, NOW()) "
+                            f"ON CONFLICT (registration) DO UPDATE SET "
+                            f"{source.name} = EXCLUDED.{source.name}, updated_at = NOW()",
+                            rows
+                        )
+
+    def finish(self, importer) -> Dict[str, Any]:
+        """Wait for outstanding lookups, store the results and return stats."""
+        try:
+            if not self._futures:
+                return {}
+            results = self.enricher.collect(self._futures)
+            self._store(importer.db, results)
+
+            counts = self.enricher.reset_stats()
+            logger.info(
+                f"Enrichment: {len(results)} vehicles stored in {self.table} "
+                f"({counts['requests']} requests, {counts['cache_hits']} cache hits, "
+                f"{counts['coalesced']} coalesced, {counts['not_found']} not found, {counts['errors']} errors)"
+            )
+            return {
+                'enriched_vehicles': len(results),
+                'enrichment_requests': counts['requests'],
+                'enrichment_cache_hits': counts['cache_hits'],
+                'enrichment_errors': counts['errors'],
+            }
+        finally:
+            self._futures = {}
+            self._seen = set()
+            if self._owns_enricher and self.enricher is not None:
+                self.enricher.close()
+                self.enricher = None
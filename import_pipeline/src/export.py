@@ -0,0 +1,89 @@
+"""Streaming CSV exports of imported data."""
+import gzip
+import logging
+import sys
+from typing import Optional
+
+from .db import DatabaseConnection, get_db
+from .importers.document_importer import DocumentImporter
+from .importers.line_item_importer import LineItemImporter
+
+logger = logging.getLogger(__name__)
+
+# Export name -> (table, sort order, importer whose column map configures the table).
+# Rows are streamed by the server with COPY, so ORDER BY is sorted in Postgres
+# rather than in client memory.
+EXPORTS = {
+    'documents': ('documents', 'issue_date, id', DocumentImporter),
+    'line_items': ('line_items', 'document_id, id', LineItemImporter),
+    'customers': ('customers', 'id', None),
+}
+
+# Column marking rows deleted at the source unless snapshot_sync.column says otherwise
+DEFAULT_TOMBSTONE_COLUMN = 'deleted_at'
+
+
+def tombstone_column(name: str) -> str:
+    """Return the column that marks tombstoned rows of one of ``EXPORTS`` (see snapshot.py)."""
+    importer_class = EXPORTS[name][2]
+    if importer_class is None:
+        return DEFAULT_TOMBSTONE_COLUMN
+    sync = importer_class.load_config().get('snapshot_sync') or {}
+    return sync.get('column', DEFAULT_TOMBSTONE_COLUMN)
+
+
+def export_query(name: str, db: DatabaseConnection, include_deleted: bool = False) -> str:
+    """Return the query for one of ``EXPORTS``, leaving out tombstoned rows unless asked not to."""
+    table, order_by, _ = EXPORTS[name]
+    where = ''
+    if not include_deleted:
+        column = tombstone_column(name)
+        if column in db.get_table_columns(table):
+            where = f" WHERE {column} IS NULL"
+    return f"SELECT * FROM {table}{where} ORDER BY {order_by}"
+
+
+def export_table(
+    name: str,
+    output_path: str,
+    compress: Optional[bool] = None,
+    db: Optional[DatabaseConnection] = None,
+    include_deleted: bool = False
+) -> int:
+    """Export one of ``EXPORTS`` to a CSV file with constant memory.
+    
+    Args:
+        name: Key of ``EXPORTS`` to export.
+        output_path: Destination file, or ``-`` for stdout.
+        compress: Gzip the output. Defaults to True when ``output_path`` ends in ``.gz``.
+        db: Database connection to use (defaults to the shared instance).
+        include_deleted: Also export rows tombstoned by snapshot sync.
+    
+    Returns:
+        The number of rows exported.
+    """
+    if name not in EXPORTS:
+        raise ValueError(f"Unknown export: {name}")
+    
+    db = db or get_db()
+    if compress is None:
+        compress = output_path.endswith('.gz')
+    
+    query = export_query(name, db, include_deleted)
+    logger.info(f"Exporting {name} to {output_path}{' (gzip)' if compress else ''}")
+    
+    if output_path == '-':
+        target = sys.stdout.buffer
+        if compress:
+            with gzip.GzipFile(fileobj=target, mode='wb') as f:
+                rows = db.copy_to(query, f)
+        else:
+            rows = db.copy_to(query, target)
+        target.flush()
+    else:
+        opener = gzip.open if compress else open
+        with opener(output_path, 'wb') as f:
+            rows = db.copy_to(query, f)
+    
+    logger.info(f"Exported {rows} {name} rows")
+    return rows
@@ -1,23 +1,22 @@
-"""Base importer class for all data importers."""
+"""Base importer class for all data importers.
+
+pandas, tqdm and yaml are imported on first use rather than at module load,
+so that listing or selecting importers (e.g. ``run_imports.py --help``) does
+not pay their import cost. Logging is configured by the entry point.
+"""
 import os
-import yaml
-from typing import Dict, List, Any, Optional, Tuple
-import pandas as pd
-from tqdm import tqdm
+from contextlib import closing, contextmanager, nullcontext
+from typing import TYPE_CHECKING, Dict, Iterator, List, Any, Optional, Tuple
 import logging
 
-from ..db import get_db
+from ..db import PG_TYPES, get_db
 from ..parsers import parse_value
+from ..skips import DEFAULT_SAMPLES, SkipCounter
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from ..profiling import StageProfiler
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('import.log')
-    ]
-)
 logger = logging.getLogger(__name__)
 
 class BaseImporter:
@@ -27,30 +26,52 @@ class BaseImporter:
     CONFIG_FILE = None
     TABLE_NAME = None
     
-    def __init__(self, file_path: str):
-        """Initialize the importer with a file path."""
+    def __init__(self, file_path: str, profiler: Optional['StageProfiler'] = None, snapshot_sync: bool = False):
+        """Initialize the importer with a file path and optional stage profiler.
+        
+        With ``snapshot_sync=True`` the file is treated as a full snapshot and
+        rows missing from it are handled as configured under ``snapshot_sync``.
+        """
         self.file_path = file_path
+        self.profiler = profiler
+        self.snapshot_sync = snapshot_sync
         self.db = get_db()
         self.config = self._load_config()
+        self.tombstone_column = self.tombstone_column_for(self.config)
+        self.computed_fields = self._compile_computed_fields()
+        self.batch_stages = self._build_batch_stages()
+        self.chunk_stages = self._build_chunk_stages()
+        self.staging = self._build_staging()
+        self.partitioning = self._build_partitioning()
+        self._native_casts: Dict[str, str] = {}
+        self._prepared = False
+        self.required_fields = self._required_db_fields()
+        self.skips = SkipCounter(int(os.getenv('SKIP_SAMPLES', DEFAULT_SAMPLES)))
+        self._skip_reason: Optional[str] = None
+        
+        # Optional callable(stats, total_rows) called after every chunk
+        self.on_progress = None
         
         # Track stats
-        self.stats = {
-            'total': 0,
-            'imported': 0,
-            'skipped': 0,
-            'errors': 0
-        }
+        self._reset_stats()
     
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from YAML file."""
-        if not self.CONFIG_FILE:
+        return self.load_config()
+    
+    @classmethod
+    def load_config(cls) -> Dict[str, Any]:
+        """Load this importer's column-map configuration from its YAML file."""
+        import yaml
+        
+        if not cls.CONFIG_FILE:
             raise ValueError("CONFIG_FILE must be set in the subclass")
             
         config_path = os.path.join(
             os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
             'config',
             'column_maps',
-            self.CONFIG_FILE
+            cls.CONFIG_FILE
         )
         
         try:
@@ -63,33 +84,195 @@ class BaseImporter:
             logger.error(f"Error parsing YAML config: {e}")
             raise
     
+    def _required_db_fields(self) -> List[Tuple[str, str]]:
+        """Return ``(db field, configured name)`` for each required field.
+        
+        ``required_fields`` may name the CSV column or the DB column; records
+        are checked after mapping, so CSV names are translated here.
+        """
+        mappings = self.config.get('field_mappings') or {}
+        return [(mappings.get(field, field), field) for field in (self.config.get('required_fields') or [])]
+    
+    @staticmethod
+    def tombstone_column_for(config: Dict[str, Any]) -> Optional[str]:
+        """Return the column marking rows deleted at the source, if snapshot sync tombstones them."""
+        sync = config.get('snapshot_sync') or {}
+        if sync.get('action', 'report') != 'tombstone':
+            return None
+        return sync.get('column', 'deleted_at')
+    
+    def _compile_computed_fields(self) -> list:
+        """Compile the ``computed_fields`` section of the config, if any."""
+        if not self.config.get('computed_fields'):
+            return []
+        
+        from ..computed import compile_computed_fields
+        
+        known_fields = set((self.config.get('field_mappings') or {}).values())
+        known_fields.update(self.config.get('defaults') or {})
+        known_fields.update(self.config.get('type_casting') or {})
+        return compile_computed_fields(self.config['computed_fields'], known_fields)
+    
+    def _build_batch_stages(self) -> list:
+        """Build the stages that run inside each batch's transaction.
+        
+        Each stage has a ``prepare(cursor)`` method, run once per import
+        before the first batch, and an ``apply(cursor, batch)`` method that
+        is called with the batch's cursor before the upsert, so its writes
+        commit or roll back together with the batch.
+        """
+        stages = []
+        if self.config.get('summaries'):
+            from ..summaries import SummaryStage
+            stages.append(SummaryStage(
+                self.config['summaries'],
+                self.TABLE_NAME,
+                self.config.get('id_field', 'id'),
+                self.tombstone_column
+            ))
+        if self.config.get('search_keys'):
+            from ..search_keys import SearchKeyStage
+            stages.append(SearchKeyStage(
+                self.config['search_keys'],
+                self.TABLE_NAME,
+                self.config.get('id_field', 'id'),
+                self.tombstone_column
+            ))
+        return stages
+    
+    def _build_chunk_stages(self) -> list:
+        """Build the stages that inspect each chunk after processing.
+        
+        Each stage has an ``apply(chunk, records)`` method, called with the raw
+        CSV chunk and its processed records, and a ``finish(importer)`` method
+        called at the end of the import that returns stats to merge into
+        ``self.stats``.
+        """
+        stages = []
+        if self.config.get('reconciliation'):
+            from ..reconciliation import ReconciliationStage
+            stages.append(ReconciliationStage(
+                self.config['reconciliation'],
+                self.config.get('field_mappings') or {},
+                self.TABLE_NAME,
+                self.config.get('id_field', 'id')
+            ))
+        enrichment = self.config.get('enrichment') and os.getenv('ENRICHMENT_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+        if enrichment:
+            from ..enrichment import EnrichmentStage
+            stages.append(EnrichmentStage(self.config['enrichment']))
+        if self.config.get('mot_reminders'):
+            if enrichment:
+                # After enrichment, whose stored results give the MOT due dates
+                from ..reminders import MotReminderStage
+                stages.append(MotReminderStage(self.config['mot_reminders']))
+            else:
+                logger.info(f"{self.TABLE_NAME}: MOT reminder queue not updated; it needs ENRICHMENT_ENABLED for due dates")
+        if self.snapshot_sync:
+            if not self.config.get('snapshot_sync'):
+                raise ValueError(f"Snapshot sync requested but {self.CONFIG_FILE} has no snapshot_sync section")
+            from ..snapshot import SnapshotSyncStage
+            stages.append(SnapshotSyncStage(
+                self.config['snapshot_sync'],
+                self.config.get('field_mappings') or {},
+                self.TABLE_NAME,
+                self.config.get('id_field', 'id')
+            ))
+        return stages
+    
+    def _build_partitioning(self):
+        """Build the range partitioning scheme from the ``partitioning`` section, if any."""
+        if not self.config.get('partitioning'):
+            return None
+        
+        from ..partitioning import RangePartitioning
+        
+        return RangePartitioning(self.TABLE_NAME, self.config['partitioning'], self.config.get('id_field', 'id'))
+    
+    def _build_staging(self):
+        """Build the local staging area from the ``staging`` section, if any."""
+        if not self.config.get('staging'):
+            return None
+        
+        from ..staging import StagingArea
+        
+        return StagingArea(
+            self.config['staging'],
+            self.TABLE_NAME,
+            self.config.get('id_field', 'id'),
+            self.config.get('type_casting') or {}
+        )
+    
     def _process_record(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Process a single record before import."""
         processed = {}
         
         # Map fields according to config
-        for csv_field, db_field in self.config.get('field_mappings', {}).items():
+        for csv_field, db_field in (self.config.get('field_mappings') or {}).items():
             if csv_field in record:
                 processed[db_field] = record[csv_field]
         
         # Apply type casting
-        for field, type_name in self.config.get('type_casting', {}).items():
+        for field, type_name in (self.config.get('type_casting') or {}).items():
             if field in processed:
                 processed[field] = parse_value(processed[field], type_name)
         
         # Apply defaults for missing fields
-        for field, default in self.config.get('defaults', {}).items():
+        for field, default in (self.config.get('defaults') or {}).items():
             if field not in processed or processed[field] is None:
                 processed[field] = default
         
         # Check required fields
-        for field in self.config.get('required_fields', []):
-            if field not in processed or processed[field] is None:
-                logger.warning(f"Skipping record - missing required field: {field}")
-                return None
+        for field, name in self.required_fields:
+            if processed.get(field) is None:
+                return self._skip(f"missing required field: {name}")
         
         return processed
     
+    def _skip(self, reason: str) -> None:
+        """Mark the record being processed as skipped for ``reason``.
+        
+        Returns None so ``_process_record`` implementations can
+        ``return self._skip(...)``. Skips are counted per reason instead of
+        being logged one by one.
+        """
+        self._skip_reason = reason
+        return None
+    
+    def _process_chunk(self, chunk: 'pd.DataFrame') -> List[Dict[str, Any]]:
+        """Process a chunk of raw CSV rows into records ready for import."""
+        import pandas as pd
+        
+        # Parse typed columns a whole column at a time where possible
+        if self._native_casts:
+            from ..reader import convert_columns
+            chunk = convert_columns(chunk, self._native_casts)
+        
+        # Convert chunk to list of dicts
+        records = chunk.replace({pd.NA: None}).to_dict('records')
+        
+        # Process records
+        processed_records = []
+        for record in records:
+            self.stats['total'] += 1
+            processed = self._process_record(record)
+            if processed:
+                processed_records.append(processed)
+            else:
+                self.stats['skipped'] += 1
+                self.skips.add(self._skip_reason or 'rejected by importer', self.stats['total'], record)
+                self._skip_reason = None
+        
+        # Derive computed columns for the whole chunk at once
+        if self.computed_fields:
+            from ..computed import apply_computed_fields
+            apply_computed_fields(processed_records, self.computed_fields)
+        
+        for stage in self.chunk_stages:
+            stage.apply(chunk, processed_records)
+        
+        return processed_records
+    
     def _import_batch(self, batch: List[Dict[str, Any]]) -> Tuple[int, int]:
         """Import a batch of records."""
         if not batch:
@@ -98,25 +281,135 @@ class BaseImporter:
         # Get column names from the first record
         columns = list(batch[0].keys())
         
+        try:
+            # Route rows to their partitions, creating new ones in a separate transaction
+            if self.partitioning is not None:
+                groups = self.partitioning.route(batch)
+                with self.db.get_connection() as conn:
+                    with conn.cursor() as cursor:
+                        self.partitioning.ensure(cursor, groups)
+            else:
+                groups = {None: batch}
+            
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    for stage in self.batch_stages:
+                        stage.apply(cursor, batch)
+                    for key, records in groups.items():
+                        if self.partitioning is None:
+                            table = self.TABLE_NAME
+                        else:
+                            # A changed date moves the row: remove it from its old partition
+                            table = self.partitioning.partition_name(key)
+                            ids = [r.get(self.partitioning.id_field) for r in records]
+                            cursor.execute(self.partitioning.move_sql(key), (ids,))
+                        cursor.executemany(self._upsert_sql(table, columns), records)
+            return len(batch), 0
+        except Exception as e:
+            logger.error(f"Error importing batch: {e}")
+            return 0, len(batch)
+    
+    def _upsert_sql(self, table: str, columns: List[str]) -> str:
+        """Build the upsert statement for a table or partition."""
         # Generate placeholders for the query
         placeholders = [f'%({col})s' for col in columns]
         
-        # Build the query
-        query = f"""
-        INSERT INTO {self.TABLE_NAME} ({', '.join(columns)})
+        return f"""
+        INSERT INTO {table} ({', '.join(columns)})
         VALUES ({', '.join(placeholders)})
         ON CONFLICT (id) DO UPDATE SET
             {', '.join(f"{col} = EXCLUDED.{col}" for col in columns if col != 'id')}
         """
+    
+    def _stage(self, name: str):
+        """Return a context manager that profiles stage ``name`` when profiling is on."""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.stage(name)
+    
+    @contextmanager
+    def table_lock(self):
+        """Hold a Postgres advisory lock on the target table for the body of the ``with`` block.
         
-        try:
+        The job service only keeps its own jobs apart, so ``run_imports.py``,
+        the watcher and the service take this lock to make sure two imports
+        into the same table never overlap. The lock lives on its own
+        connection and is released when that connection closes.
+        """
+        with closing(self.db.connect()) as conn:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_lock(hashtext(%s))', (self.TABLE_NAME,))
+                if not cursor.fetchone()[0]:
+                    logger.info(f"Waiting for another import into {self.TABLE_NAME} to finish")
+                    cursor.execute('SELECT pg_advisory_lock(hashtext(%s))', (self.TABLE_NAME,))
+            yield
+    
+    def _reset_stats(self):
+        """Reset the import statistics."""
+        self.stats = {
+            'total': 0,
+            'imported': 0,
+            'skipped': 0,
+            'errors': 0,
+            'sanitized_bytes': 0
+        }
+        self.skips.reset()
+    
+    def prepare(self):
+        """Run one-off setup (e.g. creating stage tables) before importing batches."""
+        if self._prepared:
+            return
+        added_columns = self._added_columns()
+        if self.batch_stages or self.partitioning is not None or self.tombstone_column or added_columns:
             with self.db.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.executemany(query, batch)
-            return len(batch), 0
-        except Exception as e:
-            logger.error(f"Error importing batch: {e}")
-            return 0, len(batch)
+                    if added_columns:
+                        self._ensure_columns(cursor, added_columns)
+                    if self.tombstone_column:
+                        # Readers filter on it, so it must exist before the first tombstone
+                        from ..snapshot import ensure_tombstone_column
+                        ensure_tombstone_column(cursor, self.TABLE_NAME, self.tombstone_column)
+                    for stage in self.batch_stages:
+                        stage.prepare(cursor)
+                    if self.partitioning is not None:
+                        self.partitioning.load_existing(cursor)
+        self._prepared = True
+    
+    def _added_columns(self) -> List[str]:
+        """DB columns the import may need to add to a table created before they were declared.
+        
+        Computed columns, plus mapped columns that batch stages (summaries,
+        search keys) read back from the table, such as ``balance_due`` once
+        a summary sums it.
+        """
+        mapped = set((self.config.get('field_mappings') or {}).values())
+        columns = [field.name for field in self.computed_fields]
+        for stage in self.batch_stages:
+            columns += [field for field in getattr(stage, 'source_fields', []) if field in mapped]
+        return list(dict.fromkeys(columns))
+    
+    def _ensure_columns(self, cursor, columns: List[str]):
+        """Add columns missing from a table created before they were declared.
+        
+        Typed from ``type_casting`` like ``create_table_from_mapping``. Only
+        missing columns are altered, since ALTER TABLE locks the table.
+        """
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = 'public' AND table_name = %s",
+            (self.TABLE_NAME,)
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if not existing:
+            # No table yet; the upsert will report that
+            return
+        type_casting = self.config.get('type_casting') or {}
+        for column in columns:
+            if column not in existing:
+                pg_type = PG_TYPES.get(type_casting.get(column), 'TEXT')
+                logger.info(f"Adding column {column} {pg_type} to {self.TABLE_NAME}")
+                cursor.execute(f"ALTER TABLE {self.TABLE_NAME} ADD COLUMN IF NOT EXISTS {column} {pg_type}")
     
     def run(self) -> Dict[str, int]:
         """Run the import process."""
@@ -126,56 +419,22 @@ class BaseImporter:
         logger.info(f"Loaded configuration from {self.CONFIG_FILE}")
         
         # Initialize statistics
-        self.stats = {
-            'total': 0,
-            'imported': 0,
-            'skipped': 0,
-            'errors': 0
-        }
+        self._reset_stats()
         
         if not os.path.exists(self.file_path):
             raise FileNotFoundError(f"File not found: {self.file_path}")
         
         logger.info(f"Starting import from {self.file_path}")
         
-        # Read the CSV in chunks
-        chunk_size = int(os.getenv('BATCH_SIZE', 1000))
-        logger.info(f"Processing CSV file in chunks of {chunk_size} records")
-        
-        total_rows = sum(1 for _ in open(self.file_path, 'r', encoding='utf-8')) - 1  # Subtract header
+        with self._stage('count'):
+            # Count newlines in binary so badly encoded files do not fail here
+            with open(self.file_path, 'rb') as f:
+                total_rows = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b'')) - 1  # Subtract header
         logger.info(f"Total rows to process: {total_rows}")
         
-        with pd.read_csv(
-            self.file_path, 
-            chunksize=chunk_size,
-            dtype=str,
-            keep_default_na=False,
-            na_values=['', 'NA', 'N/A', 'NULL', 'None']
-        ) as reader:
-            with tqdm(total=total_rows, desc=f"Importing {self.TABLE_NAME}") as pbar:
-                for chunk in reader:
-                    # Convert chunk to list of dicts
-                    records = chunk.replace({pd.NA: None}).to_dict('records')
-                    
-                    # Process records
-                    processed_records = []
-                    for record in records:
-                        self.stats['total'] += 1
-                        processed = self._process_record(record)
-                        if processed:
-                            processed_records.append(processed)
-                        else:
-                            self.stats['skipped'] += 1
-                            logger.debug(f"Skipped record {self.stats['total']}: {record}")
-                    
-                    # Import the batch
-                    if processed_records:
-                        imported, errors = self._import_batch(processed_records)
-                        self.stats['imported'] += imported
-                        self.stats['errors'] += errors
-                        logger.info(f"Processed {self.stats['total']} records (imported: {self.stats['imported']}, skipped: {self.stats['skipped']}, errors: {self.stats['errors']})")
-                    
-                    pbar.update(len(records))
+        with self.table_lock():
+            self.import_csv(self.file_path, total_rows=total_rows)
+            self.finish()
         
         # Log summary
         logger.info(
@@ -184,3 +443,111 @@ class BaseImporter:
         )
         
         return self.stats
+    
+    def finish(self) -> Dict[str, Any]:
+        """Run end-of-import checks of the chunk stages and merge their stats and the skip summary."""
+        for stage in self.chunk_stages:
+            self.stats.update(stage.finish(self) or {})
+        self.stats.update(self.skips.stats())
+        self.skips.log_summary(self.TABLE_NAME)
+        return self.stats
+    
+    def import_csv(self, source: Any, total_rows: Optional[int] = None, progress: bool = True) -> Dict[str, int]:
+        """Import CSV data from a path or binary file object, adding to ``self.stats``.
+        
+        Args:
+            source: File path or file-like object positioned at the CSV header.
+            total_rows: Expected number of rows, for the progress bar.
+            progress: Show a progress bar.
+        """
+        from tqdm import tqdm
+        
+        self.prepare()
+        
+        if self.staging is not None:
+            self.staging.begin()
+        
+        with tqdm(total=total_rows, desc=f"Importing {self.TABLE_NAME}", disable=not progress) as pbar:
+            for rows, processed_records in self.processed_chunks(source):
+                # Import the batch, or stage it locally until the whole file is read
+                if processed_records:
+                    if self.staging is not None:
+                        with self._stage('stage'):
+                            self.staging.load(processed_records)
+                    else:
+                        self._load_batch(processed_records)
+                
+                pbar.update(rows)
+                if self.on_progress is not None:
+                    self.on_progress(self.stats, total_rows)
+        
+        if self.staging is not None:
+            self._load_staged(int(os.getenv('BATCH_SIZE', 1000)))
+        
+        return self.stats
+    
+    def processed_chunks(self, source: Any) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Read and process a CSV path or binary file object, yielding ``(rows read, records)`` per chunk.
+        
+        The raw bytes pass through :func:`sanitize.sanitized` first, so stray
+        control characters and non-UTF-8 bytes never reach the CSV parser.
+        The source encoding can be pinned with ``encoding`` in the column map.
+        Only mapped columns are parsed, with the engine chosen by
+        :func:`reader.reader_settings`. Nothing is written to the database.
+        """
+        from ..reader import native_casts, read_chunks, reader_settings
+        from ..sanitize import sanitize_stats, sanitized
+        
+        # Read the CSV in chunks
+        chunk_size = int(os.getenv('BATCH_SIZE', 1000))
+        settings = reader_settings(self.config)
+        self._native_casts = native_casts(self.config)
+        logger.info(f"Processing CSV file in chunks of {chunk_size} records with the {settings['engine']} engine")
+        
+        opened = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else nullcontext(source)
+        with opened as raw:
+            stream = sanitized(raw, self.config.get('encoding'))
+            with closing(read_chunks(stream, chunk_size, **settings)) as chunks:
+                while True:
+                    with self._stage('read'):
+                        chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    
+                    with self._stage('process'):
+                        processed_records = self._process_chunk(chunk)
+                    
+                    yield len(chunk), processed_records
+        
+        cleaned = sanitize_stats(stream)
+        self.stats['sanitized_bytes'] += stream.raw.changed
+        if stream.raw.changed:
+            logger.warning(
+                f"Sanitized {stream.raw.changed} bytes of {cleaned['encoding']} input "
+                f"({cleaned['bytes_transcoded']} transcoded, {cleaned['bytes_replaced']} replaced, "
+                f"{cleaned['control_chars_removed']} control characters removed)"
+            )
+    
+    def _load_batch(self, records: List[Dict[str, Any]]):
+        """Import one batch of records and update the stats."""
+        with self._stage('load'):
+            imported, errors = self._import_batch(records)
+        self.stats['imported'] += imported
+        self.stats['errors'] += errors
+        logger.info(f"Processed {self.stats['total']} records (imported: {self.stats['imported']}, skipped: {self.stats['skipped']}, errors: {self.stats['errors']})")
+    
+    def _load_staged(self, batch_size: int):
+        """Check the staged rows locally, then load the surviving rows in batches."""
+        try:
+            with self._stage('stage'):
+                staging_stats = self.staging.run(self.db)
+            self.stats.update(staging_stats)
+            self.stats['skipped'] += staging_stats['staging_dropped']
+            for check, count in self.staging.dropped.items():
+                self.skips.add_count(f"dropped by staging check: {check}", count)
+            for batch in self.staging.rows(batch_size):
+                self._load_batch(batch)
+                if self.on_progress is not None:
+                    self.on_progress(self.stats, None)
+        finally:
+            self.staging.close()
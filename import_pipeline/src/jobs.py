@@ -0,0 +1,512 @@
+"""Import job service: a persistent queue, a worker pool and an HTTP API.
+
+Imports are submitted as jobs (an import type and a file path) and run by a
+fixed number of worker threads, so heavy imports happen in one controlled
+process instead of inside web request handlers. Jobs are stored in a SQLite
+file, so queued jobs survive a restart, and a worker only claims a job when
+no other job for the same table is running. Two imports into the same table
+therefore never overlap, while imports into different tables run in parallel.
+
+The HTTP API (standard library only) lets the web app submit and watch jobs::
+
+    POST /jobs                {"type": "documents", "file": "/data/Documents.csv"}
+    GET  /jobs                recent jobs (optionally ?status=queued)
+    GET  /jobs/<id>           one job with its progress and final stats
+    GET  /jobs/<id>/events    server-sent events with progress until the job ends
+    POST /jobs/<id>/cancel    cancel a job that has not started yet
+    GET  /metrics             queue depth, running jobs and throughput
+
+Set ``JOB_SERVICE_TOKEN`` to require ``Authorization: Bearer <token>`` and
+``IMPORT_DIR`` to only accept files inside that directory. Without a token
+or an import directory the server refuses to listen on anything but the
+loopback interface.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Type
+from urllib.parse import parse_qs, urlparse
+
+from .importers.base_importer import BaseImporter
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED = ('succeeded', 'failed', 'cancelled')
+
+# Minimum seconds between progress writes for a running job
+PROGRESS_INTERVAL = 1.0
+
+# Seconds between checks for new progress on an event stream
+EVENTS_POLL_INTERVAL = 1.0
+
+# Seconds after which an idle event stream gets a keep-alive comment
+EVENTS_KEEPALIVE = 15.0
+
+# Window of finished jobs used for the throughput metrics
+METRICS_WINDOW = 24 * 3600
+
+# Largest request body accepted by the API
+MAX_BODY_SIZE = 64 * 1024
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """Jobs stored in a SQLite file shared by the workers (and service processes)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                import_type TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                worker TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                updated_at REAL NOT NULL,
+                progress TEXT,
+                stats TEXT,
+                error TEXT
+            )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, id)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call: sqlite3 connections are per thread
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for key in ('progress', 'stats'):
+            job[key] = json.loads(job[key]) if job[key] else None
+        for key in ('created_at', 'started_at', 'finished_at', 'updated_at'):
+            job[key] = _timestamp(job[key])
+        return job
+
+    def submit(self, import_type: str, table_name: str, file_path: str) -> Dict[str, Any]:
+        """Queue a job and return it."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (import_type, table_name, file_path, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (import_type, table_name, file_path, now, now)
+            )
+            job_id = cursor.lastrowid
+        logger.info(f"Queued job {job_id}: {import_type} from {file_path}")
+        return self.get(job_id)
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Return the most recent jobs, newest first."""
+        with self._connect() as conn:
+            if status:
+                rows = conn.execute(
+                    'SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?', (status, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Mark the oldest queued job whose table is idle as running and return it.
+
+        The check and the update happen in one write transaction, so two
+        workers (or two service processes on the same queue file) can never
+        start jobs for the same table at the same time.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("""
+            SELECT id FROM jobs
+            WHERE status = 'queued'
+              AND table_name NOT IN (SELECT table_name FROM jobs WHERE status = 'running')
+            ORDER BY id
+            LIMIT 1
+            """).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, updated_at = ? WHERE id = ?",
+                (worker, now, now, row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return self.get(row['id'])
+
+    def update_progress(self, job_id: int, progress: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?',
+                (json.dumps(progress), time.time(), job_id)
+            )
+
+    def finish(self, job_id: int, status: str, stats: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, stats = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?',
+                (status, json.dumps(stats, default=str) if stats is not None else None, error, now, now, job_id)
+            )
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued job. Returns False if it has already started."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (now, now, job_id)
+            )
+            return cursor.rowcount > 0
+
+    def requeue_abandoned(self, host: str) -> int:
+        """Requeue jobs left running by a dead service process on this host."""
+        requeued = 0
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, worker FROM jobs WHERE status = 'running' AND worker LIKE ?", (f"{host}:%",)
+            ).fetchall()
+            for row in rows:
+                pid = int(row['worker'].split(':')[1])
+                if pid == os.getpid() or not _pid_alive(pid):
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL, "
+                        "progress = NULL, updated_at = ? WHERE id = ?",
+                        (time.time(), row['id'])
+                    )
+                    requeued += 1
+        if requeued:
+            logger.warning(f"Requeued {requeued} jobs left running by a previous service process")
+        return requeued
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, running jobs per table and recent throughput."""
+        since = time.time() - METRICS_WINDOW
+        with self._connect() as conn:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            running = [
+                {'id': row['id'], 'table': row['table_name'], 'type': row['import_type'],
+                 'progress': json.loads(row['progress']) if row['progress'] else None}
+                for row in conn.execute(
+                    "SELECT id, table_name, import_type, progress FROM jobs WHERE status = 'running' ORDER BY id"
+                )
+            ]
+            recent = conn.execute("""
+            SELECT COUNT(*), SUM(finished_at - started_at), SUM(json_extract(stats, '$.total'))
+            FROM jobs
+            WHERE status = 'succeeded' AND finished_at >= ?
+            """, (since,)).fetchone()
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+        finished, seconds, rows = recent[0], recent[1] or 0.0, recent[2] or 0
+        return {
+            'jobs': {status: counts.get(status, 0) for status in STATUSES},
+            'running': running,
+            'oldest_queued_seconds': round(time.time() - oldest, 1) if oldest else None,
+            'last_24h': {
+                'succeeded': finished,
+                'rows': rows,
+                'average_seconds': round(seconds / finished, 1) if finished else None,
+                'rows_per_second': round(rows / seconds, 1) if seconds else None,
+            },
+        }
+
+
+class JobService:
+    """Runs queued import jobs on a pool of worker threads."""
+
+    def __init__(self, queue: JobQueue, importers: Dict[str, Type[BaseImporter]],
+                 workers: int = 2, poll_interval: float = 1.0, import_dir: Optional[str] = None):
+        """Initialize the service.
+
+        Args:
+            queue: Job queue to take jobs from.
+            importers: Mapping of import type to importer class.
+            workers: Number of jobs run at the same time (at most one per table).
+            poll_interval: Seconds an idle worker waits before looking for work again.
+            import_dir: If set, only files inside this directory are accepted.
+        """
+        self.queue = queue
+        self.importers = importers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.import_dir = os.path.realpath(import_dir) if import_dir else None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = threading.Event()
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, import_type: str, file_path: str) -> Dict[str, Any]:
+        """Validate and queue an import job.
+
+        Raises:
+            ValueError: If the import type is unknown or the file is not allowed.
+        """
+        if import_type not in self.importers:
+            raise ValueError(f"Unknown import type: {import_type} (expected one of {', '.join(self.importers)})")
+        if not file_path:
+            raise ValueError("A file path is required")
+        path = os.path.realpath(file_path)
+        if self.import_dir and os.path.commonpath([self.import_dir, path]) != self.import_dir:
+            raise ValueError(f"File must be inside {self.import_dir}")
+        if not os.path.isfile(path):
+            raise ValueError(f"File not found: {file_path}")
+        job = self.queue.submit(import_type, self.importers[import_type].TABLE_NAME, path)
+        self._wake.set()
+        return job
+
+    def start(self):
+        """Requeue abandoned jobs and start the worker threads."""
+        self.queue.requeue_abandoned(socket.gethostname())
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"import-worker-{index + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} import workers")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop claiming jobs and wait for the running ones to finish."""
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self.run_job(job)
+            # A finished job may unblock a queued job for the same table
+            self._wake.set()
+
+    def run_job(self, job: Dict[str, Any]):
+        """Run one claimed job and record its outcome."""
+        job_id = job['id']
+        logger.info(f"Job {job_id}: importing {job['file_path']} as {job['import_type']}")
+        started = time.monotonic()
+        last_write = [0.0]
+
+        def report(stats: Dict[str, Any], total_rows: Optional[int]):
+            now = time.monotonic()
+            if now - last_write[0] < PROGRESS_INTERVAL:
+                return
+            last_write[0] = now
+            elapsed = now - started
+            self.queue.update_progress(job_id, {
+                'total_rows': total_rows,
+                'processed': stats['total'],
+                'imported': stats['imported'],
+                'skipped': stats['skipped'],
+                'errors': stats['errors'],
+                'percent': round(100.0 * stats['total'] / total_rows, 1) if total_rows else None,
+                'rows_per_second': round(stats['total'] / elapsed, 1) if elapsed else None,
+                'elapsed_seconds': round(elapsed, 1),
+            })
+
+        try:
+            importer = self.importers[job['import_type']](job['file_path'])
+            importer.on_progress = report
+            stats = importer.run()
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            self.queue.finish(job_id, 'failed', error=str(e))
+            return
+
+        last_write[0] = 0.0
+        report(stats, stats['total'])
+        status = 'succeeded' if stats['errors'] == 0 else 'failed'
+        error = f"{stats['errors']} records failed" if stats['errors'] else None
+        self.queue.finish(job_id, status, stats=stats, error=error)
+        logger.info(f"Job {job_id} {status} in {time.monotonic() - started:.1f}s")
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON and server-sent events API over a :class:`JobService`."""
+
+    service: JobService = None
+    token: Optional[str] = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status: int, body: Any):
+        data = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self) -> bool:
+        if not self.token or self.headers.get('Authorization') == f"Bearer {self.token}":
+            return True
+        self._send_json(HTTPStatus.UNAUTHORIZED, {'error': 'Unauthorized'})
+        return False
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        job_id = None
+        if len(parts) >= 2 and parts[0] == 'jobs':
+            if not parts[1].isdigit():
+                return url, parts, -1
+            job_id = int(parts[1])
+        return url, parts, job_id
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        url, parts, job_id = self._route()
+        queue = self.service.queue
+        if parts == ['metrics']:
+            body = queue.metrics()
+            body['workers'] = self.service.workers
+            return self._send_json(HTTPStatus.OK, body)
+        if parts == ['jobs']:
+            params = parse_qs(url.query)
+            status = params.get('status', [None])[0]
+            try:
+                limit = int(params.get('limit', ['50'])[0])
+            except ValueError:
+                return self._send_json(HTTPStatus.BAD_REQUEST, {'error': 'limit must be an integer'})
+            return self._send_json(HTTPStatus.OK, {'jobs': queue.list(status, min(limit, 500))})
+        if job_id is not None and job_id >= 0 and len(parts) == 2:
+            job = queue.get(job_id)
+            if job is None:
+                return self._send_json(HTTPStatus.NOT_FOUND, {'error': f"Job {job_id} not found"})
+            return self._send_json(HTTPStatus.OK, job)
+        if job_id is not None and job_id >= 0 and parts[2:] == ['events']:
+            return self._stream_events(job_id)
+        self._send_json(HTTPStatus.NOT_FOUND, {'error': 'Not found'})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        _, parts, job_id = self._route()
+        if parts == ['jobs']:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY_SIZE:
+                return self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': 'Request body too large'})
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+                job = self.service.submit(body.get('type'), body.get('file'))
+            except (ValueError, AttributeError) as e:
+                return self._send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+            return self._send_json(HTTPStatus.ACCEPTED, job)
+        if job_id is not None and job_id >= 0 and parts[2:] == ['cancel']:
+            if self.service.queue.get(job_id) is None:
+                return self._send_json(HTTPStatus.NOT_FOUND, {'error': f"Job {job_id} not found"})
+            if not self.service.queue.cancel(job_id):
+                return self._send_json(HTTPStatus.CONFLICT, {'error': f"Job {job_id} has already started"})
+            return self._send_json(HTTPStatus.OK, self.service.queue.get(job_id))
+        self._send_json(HTTPStatus.NOT_FOUND, {'error': 'Not found'})
+
+    def _stream_events(self, job_id: int):
+        """Send a ``progress`` event whenever the job changes, then a final ``done`` event."""
+        job = self.service.queue.get(job_id)
+        if job is None:
+            return self._send_json(HTTPStatus.NOT_FOUND, {'error': f"Job {job_id} not found"})
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        last_update = None
+        last_sent = time.monotonic()
+        try:
+            while True:
+                if job['updated_at'] != last_update:
+                    last_update = job['updated_at']
+                    event = 'done' if job['status'] in FINISHED else 'progress'
+                    self.wfile.write(f"event: {event}\ndata: {json.dumps(job, default=str)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    last_sent = time.monotonic()
+                    if event == 'done':
+                        return
+                elif time.monotonic() - last_sent >= EVENTS_KEEPALIVE:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    last_sent = time.monotonic()
+                time.sleep(EVENTS_POLL_INTERVAL)
+                job = self.service.queue.get(job_id)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug(f"Event stream for job {job_id} closed by the client")
+
+
+def _is_loopback(host: str) -> bool:
+    """Whether every address ``host`` resolves to is a loopback address."""
+    import ipaddress
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror:
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(a.split('%')[0]).is_loopback for a in addresses)
+
+
+def make_server(service: JobService, host: str = '127.0.0.1', port: int = 8765,
+                token: Optional[str] = None) -> ThreadingHTTPServer:
+    """Create the HTTP server for a job service (call ``serve_forever()`` to run it).
+
+    Raises:
+        ValueError: If the service would accept any file path from any host,
+            i.e. it has neither a token nor an import directory and ``host`` is
+            not a loopback address.
+    """
+    if not token and not service.import_dir and not _is_loopback(host):
+        raise ValueError(
+            f"Refusing to listen on {host} without JOB_SERVICE_TOKEN or IMPORT_DIR; "
+            "set one of them or bind to 127.0.0.1"
+        )
+    handler = type('BoundJobRequestHandler', (JobRequestHandler,), {'service': service, 'token': token})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -1,5 +1,5 @@
 """Data parsing and type conversion utilities."""
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
 from typing import Any, Callable, Optional, Union
 import re
@@ -28,6 +28,14 @@ def parse_date(value: Any, format: str = '%d/%m/%Y') -> Optional[str]:
     if hasattr(value, 'strftime'):
         return value.strftime('%Y-%m-%d')
     
+    # Fast path for ISO dates (e.g. converted per chunk by the reader)
+    text = str(value).strip()
+    if len(text) == 10 and text[4] == '-' and text[7] == '-':
+        try:
+            return date.fromisoformat(text).isoformat()
+        except ValueError:
+            pass
+    
     # Try parsing with the specified format
     try:
         date_obj = datetime.strptime(str(value).strip(), format)
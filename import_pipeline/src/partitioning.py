@@ -0,0 +1,233 @@
+"""Range partitioning of imported tables by a date column.
+
+Declared in the column map::
+
+    partitioning:
+      column: issue_date
+      interval: year          # or month
+      from: 2015              # partitions created up front (others on demand)
+
+``create_table_from_mapping`` creates the parent as ``PARTITION BY RANGE``
+with a ``<table>_default`` partition for rows without a date. The importer
+routes each batch's rows to their partition (``<table>_p2024``,
+``<table>_p2024_03``), creating partitions as new years or months appear, and
+upserts into the partition directly so each upsert only touches that
+partition's indexes.
+
+Postgres only allows a unique constraint on a partitioned table if it
+includes the partition column, so the ID is unique per partition (a unique
+index on each partition) and the importer keeps it unique across partitions
+by deleting a row from its old partition when its date moves it to another.
+"""
+import logging
+import re
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+INTERVALS = {
+    'year': 4,   # length of the ISO date prefix that identifies a partition
+    'month': 7,
+}
+
+_KEY = {
+    'year': re.compile(r'^\d{4}$'),
+    'month': re.compile(r'^\d{4}-\d{2}$'),
+}
+
+
+class RangePartitioning:
+    """Partition layout of one table."""
+
+    def __init__(self, table: str, config: Dict[str, Any], id_field: str = 'id'):
+        self.table = table
+        self.id_field = id_field
+        self.column = config.get('column')
+        if not self.column:
+            raise ValueError(f"Partitioning for {table} needs a column")
+        self.interval = config.get('interval', 'year')
+        if self.interval not in INTERVALS:
+            raise ValueError(f"Partitioning for {table}: interval must be one of {', '.join(INTERVALS)}")
+        self.start = config.get('from')
+        self.default_partition = f"{table}_default"
+        self._known: Set[str] = set()
+
+    def key_for(self, value: Any) -> Optional[str]:
+        """Return the partition key (``'2024'`` or ``'2024-03'``) of a date value, or None."""
+        if value is None:
+            return None
+        if hasattr(value, 'strftime'):
+            value = value.strftime('%Y-%m-%d')
+        key = str(value)[:INTERVALS[self.interval]]
+        return key if _KEY[self.interval].match(key) else None
+
+    def partition_name(self, key: Optional[str]) -> str:
+        if key is None:
+            return self.default_partition
+        return f"{self.table}_p{key.replace('-', '_')}"
+
+    def bounds(self, key: str):
+        """Return the ``[lower, upper)`` ISO dates of a partition key."""
+        if self.interval == 'year':
+            year = int(key)
+            return date(year, 1, 1).isoformat(), date(year + 1, 1, 1).isoformat()
+        year, month = map(int, key.split('-'))
+        upper = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        return date(year, month, 1).isoformat(), upper.isoformat()
+
+    def parent_sql(self, columns: List[str]) -> str:
+        return f"""
+        CREATE TABLE IF NOT EXISTS {self.table} (
+            {', '.join(columns)}
+        ) PARTITION BY RANGE ({self.column});
+        """
+
+    def partition_sql(self, key: Optional[str]) -> str:
+        """SQL creating one partition (or the default partition) and its ID index."""
+        name = self.partition_name(key)
+        if key is None:
+            values = 'DEFAULT'
+        else:
+            lower, upper = self.bounds(key)
+            values = f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        return f"""
+        CREATE TABLE IF NOT EXISTS {name} PARTITION OF {self.table} {values};
+        CREATE UNIQUE INDEX IF NOT EXISTS {name}_{self.id_field}_key ON {name} ({self.id_field});
+        """
+
+    def initial_keys(self, until: Optional[date] = None) -> List[str]:
+        """Keys of the partitions created with the table: ``from`` up to the current period."""
+        if self.start is None:
+            return []
+        until = until or date.today()
+        keys = []
+        if self.interval == 'year':
+            keys = [str(year) for year in range(int(self.start), until.year + 1)]
+        else:
+            year, month = int(str(self.start)[:4]), int(str(self.start)[5:7] or 1)
+            while (year, month) <= (until.year, until.month):
+                keys.append(f"{year:04d}-{month:02d}")
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return keys
+
+    def is_partitioned(self, cursor) -> bool:
+        """Return whether the parent table exists and is partitioned."""
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            (self.table,)
+        )
+        return cursor.fetchone()[0]
+
+    def load_existing(self, cursor):
+        """Remember which partitions already exist.
+
+        Raises ValueError if the table is missing or is a plain table, which
+        ``manage_partitions.py --migrate`` converts.
+        """
+        if not self.is_partitioned(cursor):
+            raise ValueError(
+                f"Table {self.table} is not partitioned; run "
+                f"scripts/manage_partitions.py --type {self.table} --migrate to convert it, "
+                f"or remove the partitioning section from its column map"
+            )
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            (self.table,)
+        )
+        self._known = {row[0] for row in cursor.fetchall()}
+
+    def ensure(self, cursor, keys: Iterable[Optional[str]]) -> List[str]:
+        """Create the partitions for ``keys`` that do not exist yet. Returns the new names."""
+        created = []
+        for key in keys:
+            name = self.partition_name(key)
+            if name in self._known:
+                continue
+            cursor.execute(self.partition_sql(key))
+            self._known.add(name)
+            created.append(name)
+        if created:
+            logger.info(f"Created partitions {', '.join(created)}")
+        return created
+
+    def route(self, batch: List[Dict[str, Any]]) -> Dict[Optional[str], List[Dict[str, Any]]]:
+        """Group a batch's records by partition key."""
+        groups: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for record in batch:
+            groups.setdefault(self.key_for(record.get(self.column)), []).append(record)
+        return groups
+
+    def move_sql(self, key: Optional[str]) -> str:
+        """SQL deleting rows with the given IDs from every partition except ``key``'s."""
+        return (
+            f"DELETE FROM {self.table} WHERE {self.id_field} = ANY(%s) "
+            f"AND tableoid <> '{self.partition_name(key)}'::regclass"
+        )
+
+    def migrate(self, cursor, legacy_table: str) -> int:
+        """Convert the existing plain table into a partitioned one.
+
+        The table is renamed to ``legacy_table``, a partitioned parent with the
+        same columns is created under the original name with its default
+        partition and one partition per period present in the data (plus the
+        ones from ``from`` onwards), and the rows are copied across. Run it in
+        one transaction so a failure leaves the original table in place.
+        Returns the number of rows copied.
+        """
+        if self.is_partitioned(cursor):
+            raise ValueError(f"Table {self.table} is already partitioned")
+        cursor.execute("SELECT to_regclass(%s), to_regclass(%s)", (self.table, legacy_table))
+        existing, legacy = cursor.fetchone()
+        if existing is None:
+            raise ValueError(f"Table {self.table} does not exist; create it with --create instead")
+        if legacy is not None:
+            raise ValueError(f"Table {legacy_table} already exists; drop or rename it first")
+        cursor.execute(
+            "SELECT conrelid::regclass::text FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = %s::regclass",
+            (self.table,)
+        )
+        referencing = [row[0] for row in cursor.fetchall()]
+        if referencing:
+            # They would keep pointing at the renamed legacy table
+            raise ValueError(
+                f"Foreign keys from {', '.join(referencing)} reference {self.table}; drop them before migrating"
+            )
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = 'public' AND table_name = %s ORDER BY ordinal_position",
+            (self.table,)
+        )
+        columns = [row[0] for row in cursor.fetchall()]
+        if self.column not in columns:
+            raise ValueError(f"Table {self.table} has no {self.column} column to partition by")
+
+        cursor.execute(f"LOCK TABLE {self.table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"ALTER TABLE {self.table} RENAME TO {legacy_table}")
+        # LIKE copies columns, types, defaults and NOT NULL but not the primary key
+        cursor.execute(
+            f"CREATE TABLE {self.table} (LIKE {legacy_table} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({self.column})"
+        )
+        cursor.execute(
+            f"SELECT DISTINCT left({self.column}::text, {INTERVALS[self.interval]}) "
+            f"FROM {legacy_table} WHERE {self.column} IS NOT NULL"
+        )
+        keys = {self.key_for(row[0]) for row in cursor.fetchall()}
+        keys.update(self.initial_keys())
+        self._known = set()
+        self.ensure(cursor, [None] + sorted(k for k in keys if k is not None))
+
+        column_list = ', '.join(columns)
+        cursor.execute(
+            f"INSERT INTO {self.table} ({column_list}) SELECT {column_list} FROM {legacy_table}"
+        )
+        return cursor.rowcount
+
+    def detach_sql(self, key: Optional[str], concurrently: bool = False) -> str:
+        return (
+            f"ALTER TABLE {self.table} DETACH PARTITION {self.partition_name(key)}"
+            f"{' CONCURRENTLY' if concurrently else ''}"
+        )
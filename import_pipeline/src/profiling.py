@@ -0,0 +1,188 @@
+"""Per-stage CPU and memory profiling for import runs."""
+import cProfile
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Maximum call depth followed when building collapsed stacks
+MAX_STACK_DEPTH = 64
+
+
+class StageProfiler:
+    """Profiles named importer stages with cProfile and tracemalloc.
+
+    Each stage (e.g. ``read``, ``process``, ``load``) gets its own cProfile
+    profile that is enabled only while the stage runs, so time spent in
+    pandas, the parsers, logging and psycopg2 can be told apart. With
+    ``memory=True``, allocations are also traced with tracemalloc by diffing
+    snapshots taken around each stage; this is slow, so it is off by default.
+    """
+
+    def __init__(self, output_dir: str = 'profiles', top_n: int = 20, trace_frames: int = 10,
+                 memory: bool = False):
+        """Initialize the profiler.
+
+        Args:
+            output_dir: Directory where ``.pstats`` and ``.collapsed`` files are written.
+            top_n: Number of hot functions and allocation sites to report.
+            trace_frames: Number of frames tracemalloc stores per allocation.
+            memory: Trace allocation sites per stage with tracemalloc.
+        """
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.trace_frames = trace_frames
+        self.memory = memory
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self.wall_times: Dict[str, float] = {}
+        self.allocations: Dict[str, Dict[str, Tuple[int, int]]] = {}
+
+    def start(self):
+        """Start memory tracing if requested. Safe to call more than once."""
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+
+    def stop(self):
+        """Stop memory tracing."""
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Profile the body of the ``with`` block as part of stage ``name``."""
+        self.start()
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        before = tracemalloc.take_snapshot() if self.memory else None
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.wall_times[name] = self.wall_times.get(name, 0.0) + time.perf_counter() - started
+            if before is not None:
+                after = tracemalloc.take_snapshot()
+                self._record_allocations(name, after.compare_to(before, 'lineno'))
+
+    def _record_allocations(self, name: str, diffs: List[tracemalloc.StatisticDiff]):
+        """Accumulate positive allocation deltas per source line for a stage."""
+        sites = self.allocations.setdefault(name, {})
+        for diff in diffs:
+            if diff.size_diff <= 0:
+                continue
+            frame = diff.traceback[0]
+            if frame.filename == tracemalloc.__file__:
+                continue
+            key = f"{frame.filename}:{frame.lineno}"
+            size, count = sites.get(key, (0, 0))
+            sites[key] = (size + diff.size_diff, count + max(diff.count_diff, 0))
+
+    def dump(self) -> List[str]:
+        """Write ``.pstats`` and collapsed-stack files for every stage.
+
+        Returns:
+            The list of files written.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        written = []
+        for name, profile in self.profiles.items():
+            pstats_path = os.path.join(self.output_dir, f"{name}.pstats")
+            profile.dump_stats(pstats_path)
+            written.append(pstats_path)
+
+            collapsed_path = os.path.join(self.output_dir, f"{name}.collapsed")
+            with open(collapsed_path, 'w', encoding='utf-8') as f:
+                for stack, weight in collapsed_stacks(pstats.Stats(profile), prefix=name):
+                    f.write(f"{stack} {weight}\n")
+            written.append(collapsed_path)
+        return written
+
+    def report(self):
+        """Log the hottest functions and largest allocation sites per stage."""
+        for name, profile in self.profiles.items():
+            logger.info(f"\nStage '{name}': {self.wall_times.get(name, 0.0):.2f}s wall time")
+
+            stats = pstats.Stats(profile).stats
+            hot = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top_n]
+            logger.info(f"  {'Self (s)':>10} {'Cum (s)':>10} {'Calls':>10}  Function")
+            for func, (_, calls, self_time, cum_time, _) in hot:
+                logger.info(f"  {self_time:>10.3f} {cum_time:>10.3f} {calls:>10}  {format_func(func)}")
+
+            sites = sorted(
+                self.allocations.get(name, {}).items(),
+                key=lambda item: item[1][0],
+                reverse=True
+            )[:self.top_n]
+            if sites:
+                logger.info(f"  {'Alloc (KiB)':>11} {'Blocks':>10}  Site")
+                for site, (size, count) in sites:
+                    logger.info(f"  {size / 1024:>11.1f} {count:>10}  {site}")
+
+
+def format_func(func: Tuple[str, int, str]) -> str:
+    """Format a pstats function key as ``module:line(name)``."""
+    filename, lineno, name = func
+    if filename == '~':
+        # Built-in functions have no source location
+        return name
+    return f"{os.path.basename(filename)}:{lineno}({name})"
+
+
+def collapsed_stacks(stats: pstats.Stats, prefix: Optional[str] = None) -> List[Tuple[str, int]]:
+    """Convert cProfile call-graph data to collapsed stacks for flamegraphs.
+
+    cProfile only records caller/callee edges, not full stacks, so self time
+    is apportioned down each edge in proportion to the cumulative time of the
+    edge. Enumerating every caller path is exponential in the call graph's
+    fan-in, so paths are merged per ``(function, depth)``: the time reaching
+    a function at a given depth is summed over all callers and drawn under
+    its heaviest caller. This keeps the work bounded by functions x depth x
+    edges while preserving the total time. The result is the usual
+    ``a;b;c <weight>`` format, weighted in microseconds, accepted by
+    flamegraph.pl and speedscope.
+    """
+    raw = stats.stats
+    callees: Dict[tuple, Dict[tuple, float]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+
+    base = [prefix] if prefix else []
+    lines: Dict[str, float] = {}
+    # Functions at the current depth -> (share of their time, stack frames)
+    level = {func: (1.0, base + [format_func(func)]) for func, entry in raw.items() if not entry[4]}
+    for depth in range(1, MAX_STACK_DEPTH + 1):
+        # Child -> [summed share, heaviest incoming share, frames of the heaviest caller]
+        incoming: Dict[tuple, list] = {}
+        for func, (share, frames) in level.items():
+            _, _, self_time, cum_time, _ = raw[func]
+            stack = ';'.join(frames)
+            lines[stack] = lines.get(stack, 0.0) + self_time * share
+            if depth == MAX_STACK_DEPTH or cum_time <= 0:
+                continue
+            for child, edge_time in callees.get(func, {}).items():
+                if child not in raw or raw[child][3] <= 0 or format_func(child) in frames[len(base):]:
+                    # Skip recursion back into a function already on the stack
+                    continue
+                child_share = share * edge_time / raw[child][3]
+                entry = incoming.setdefault(child, [0.0, -1.0, frames])
+                entry[0] += child_share
+                if child_share > entry[1]:
+                    entry[1], entry[2] = child_share, frames
+        level = {
+            child: (share, frames + [format_func(child)])
+            for child, (share, _, frames) in incoming.items()
+        }
+        if not level:
+            break
+
+    return [
+        (stack, int(seconds * 1_000_000))
+        for stack, seconds in lines.items()
+        if seconds * 1_000_000 >= 1
+    ]
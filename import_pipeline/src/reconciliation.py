@@ -0,0 +1,162 @@
+"""VAT and document-total reconciliation on imported money columns.
+
+Configured per column map under ``reconciliation``::
+
+    reconciliation:
+      tolerance_pence: 1
+      vat:                        # per row: gross == net + tax
+        gross: total_gross
+        net: total_net
+        tax: total_tax
+      document_totals:            # per document: sum(lines) == document total
+        document_id: document_id
+        amount: total_amount
+        document_table: documents
+        document_amount: total_gross
+
+Field names are DB columns; the raw CSV columns they are mapped from are
+parsed a chunk at a time with :func:`money.parse_money_column`. Row checks run
+per chunk; line sums are accumulated per document across the run and compared
+with the stored document totals once at the end. Mismatches are written to a
+CSV report instead of failing the import.
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .money import parse_money_column, pence_to_pounds
+
+logger = logging.getLogger(__name__)
+
+REPORT_COLUMNS = ['check', 'id', 'expected', 'actual', 'difference']
+
+# Number of document IDs looked up per query when comparing totals
+LOOKUP_BATCH_SIZE = 5000
+
+
+class ReconciliationStage:
+    """Chunk stage that reconciles money columns and reports mismatches."""
+
+    def __init__(self, config: Dict[str, Any], field_mappings: Dict[str, str], table: str, id_field: str = 'id'):
+        self.table = table
+        self.tolerance = int(config.get('tolerance_pence', 1))
+        self.vat = config.get('vat')
+        self.document_totals = config.get('document_totals')
+        # DB column -> CSV column
+        self.columns = {db_field: csv_field for csv_field, db_field in field_mappings.items()}
+        self.id_column = self.columns.get(id_field)
+        self.report_dir = os.getenv('REPORT_DIR', 'reports')
+        self._reset()
+
+    def _reset(self):
+        self.mismatches: List[pd.DataFrame] = []
+        self.line_sums: List[pd.Series] = []
+        self.rows_checked = 0
+
+    def _column(self, chunk: pd.DataFrame, field: str) -> Optional[pd.Series]:
+        csv_field = self.columns.get(field)
+        if csv_field is None or csv_field not in chunk.columns:
+            return None
+        return chunk[csv_field]
+
+    def _ids(self, chunk: pd.DataFrame) -> pd.Series:
+        if self.id_column and self.id_column in chunk.columns:
+            return chunk[self.id_column].reset_index(drop=True)
+        return pd.Series(chunk.index, dtype=object).astype(str)
+
+    def _add_mismatches(self, check: str, ids, expected: np.ndarray, actual: np.ndarray):
+        difference = actual - expected
+        self.mismatches.append(pd.DataFrame({
+            'check': check,
+            'id': np.asarray(ids, dtype=object),
+            'expected': pence_to_pounds(expected),
+            'actual': pence_to_pounds(actual),
+            'difference': pence_to_pounds(difference),
+        }))
+
+    def apply(self, chunk: pd.DataFrame, records: List[Dict[str, Any]]):
+        """Check a raw chunk and accumulate per-document line sums."""
+        self.rows_checked += len(chunk)
+
+        if self.vat:
+            columns = [self._column(chunk, self.vat[key]) for key in ('gross', 'net', 'tax')]
+            if all(column is not None for column in columns):
+                (gross, gross_ok), (net, net_ok), (tax, tax_ok) = [parse_money_column(c) for c in columns]
+                checked = gross_ok & net_ok & tax_ok
+                bad = checked & (np.abs(gross - (net + tax)) > self.tolerance)
+                if bad.any():
+                    ids = self._ids(chunk)[bad]
+                    self._add_mismatches('vat', ids, (net + tax)[bad], gross[bad])
+
+        if self.document_totals:
+            document_ids = self._column(chunk, self.document_totals['document_id'])
+            amounts = self._column(chunk, self.document_totals['amount'])
+            if document_ids is not None and amounts is not None:
+                pence, valid = parse_money_column(amounts)
+                keep = valid & document_ids.notna().to_numpy()
+                if keep.any():
+                    sums = pd.Series(pence[keep], index=document_ids.to_numpy()[keep]).groupby(level=0).sum()
+                    self.line_sums.append(sums)
+
+    def _compare_document_totals(self, db):
+        """Compare accumulated line sums against stored document totals."""
+        if not self.line_sums:
+            return
+        line_totals = pd.concat(self.line_sums).groupby(level=0).sum()
+        table = self.document_totals.get('document_table', 'documents')
+        amount = self.document_totals.get('document_amount', 'total_gross')
+
+        stored = {}
+        ids = [str(i) for i in line_totals.index]
+        with db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+                    cursor.execute(
+                        f"SELECT id, {amount} FROM {table} WHERE id = ANY(%s)",
+                        (ids[start:start + LOOKUP_BATCH_SIZE],)
+                    )
+                    stored.update((str(row[0]), row[1]) for row in cursor.fetchall())
+
+        document_pence, document_ok = parse_money_column(
+            pd.Series([stored.get(i) for i in ids], dtype=object)
+        )
+        line_pence = line_totals.to_numpy(dtype=np.int64)
+        index = np.asarray(ids, dtype=object)
+
+        missing = np.array([i not in stored for i in ids], dtype=bool)
+        if missing.any():
+            self._add_mismatches('document_missing', index[missing], np.zeros(missing.sum(), dtype=np.int64), line_pence[missing])
+
+        bad = document_ok & (np.abs(line_pence - document_pence) > self.tolerance)
+        if bad.any():
+            self._add_mismatches('document_totals', index[bad], document_pence[bad], line_pence[bad])
+
+    def _write_report(self, report: pd.DataFrame) -> str:
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(
+            self.report_dir,
+            f"reconciliation_{self.table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        )
+        report.to_csv(path, index=False)
+        return path
+
+    def finish(self, importer) -> Dict[str, Any]:
+        """Run end-of-import checks, write the mismatch report and return stats."""
+        if self.document_totals:
+            self._compare_document_totals(importer.db)
+
+        mismatches = pd.concat(self.mismatches) if self.mismatches else pd.DataFrame(columns=REPORT_COLUMNS)
+        stats = {'reconciliation_mismatches': len(mismatches)}
+        if len(mismatches):
+            path = self._write_report(mismatches)
+            counts = mismatches['check'].value_counts().to_dict()
+            logger.warning(f"Reconciliation found {len(mismatches)} mismatches {counts}; report written to {path}")
+            stats['reconciliation_report'] = path
+        else:
+            logger.info(f"Reconciliation: {self.rows_checked} rows checked, no mismatches")
+        self._reset()
+        return stats
@@ -0,0 +1,235 @@
+"""MOT reminder queue bucketed by the week a vehicle's MOT is due.
+
+Configured per column map under ``mot_reminders``::
+
+    mot_reminders:
+      table: mot_reminders
+      registration_field: vehicle_registration
+      vehicle_field: vehicle_id
+      customer_field: customer_id
+      date_field: issue_date            # the latest document decides the vehicle's owner
+      enrichment_table: vehicle_enrichment
+
+While a file is imported the stage remembers each registration it sees, with
+the vehicle and customer of its latest document. At the end of the import
+(after vehicle enrichment has stored its results) the next MOT due date of
+those vehicles is derived from the DVLA and MOT history data in the
+enrichment table, in one set-based upsert into the queue. Only vehicles whose
+due date, vehicle or customer changed are written, and a changed due date
+clears ``reminded_at``.
+The importer only adds this stage when enrichment is enabled, since
+without it there are no due dates.
+
+Rows carry ``due_week`` (the Monday of the due date's week), so the daily
+reminder job reads a few buckets with an index range scan instead of
+scanning every vehicle. It reads every bucket from the current week up to
+the target week rather than just the target week, so a missed run does not
+lose that week's reminders::
+
+    SELECT * FROM mot_reminders
+    WHERE due_week BETWEEN '2026-10-19' AND '2026-11-16' AND reminded_at IS NULL;
+"""
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from .enrichment import normalize_registration
+
+logger = logging.getLogger(__name__)
+
+# Default days between the reminder and the MOT due date
+DEFAULT_LEAD_DAYS = 28
+
+
+def week_start(day: date) -> date:
+    """Return the Monday of ``day``'s week (the bucket key)."""
+    return day - timedelta(days=day.weekday())
+
+
+def _date_sql(expression: str) -> str:
+    """SQL turning a JSON text date (``2024-03-14`` or ``2024.03.14``) into a date, or NULL."""
+    return (
+        f"CASE WHEN {expression} ~ '^\\d{{4}}[-.]\\d{{2}}[-.]\\d{{2}}' "
+        f"THEN replace(left({expression}, 10), '.', '-')::date END"
+    )
+
+
+_TEST_EXPIRY = _date_sql("test->>'expiryDate'")
+
+# Due date candidates per enrichment source column; the latest known date wins
+DUE_DATE_SQL = {
+    'dvla': [_date_sql("e.dvla->>'motExpiryDate'")],
+    'mot': [
+        _date_sql("e.mot->>'motTestDueDate'"),
+        f"""(SELECT max({_TEST_EXPIRY})
+             FROM jsonb_array_elements(
+                 CASE WHEN jsonb_typeof(e.mot->'motTests') = 'array' THEN e.mot->'motTests' ELSE '[]'::jsonb END
+             ) AS test)""",
+    ],
+}
+
+
+class MotReminderStage:
+    """Chunk stage that keeps the MOT reminder queue in step with imported vehicles."""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.table = config.get('table', 'mot_reminders')
+        self.registration_field = config.get('registration_field', 'vehicle_registration')
+        self.vehicle_field = config.get('vehicle_field', 'vehicle_id')
+        self.customer_field = config.get('customer_field', 'customer_id')
+        self.date_field = config.get('date_field', 'issue_date')
+        self.enrichment_table = config.get('enrichment_table', 'vehicle_enrichment')
+        # registration -> (document date, vehicle ID, customer ID)
+        self._vehicles: Dict[str, Tuple[str, Optional[str], Optional[str]]] = {}
+
+    def apply(self, chunk, records: List[Dict[str, Any]]):
+        """Remember the vehicle and customer of each registration's latest document."""
+        for record in records:
+            registration = normalize_registration(record.get(self.registration_field))
+            if registration is None:
+                continue
+            issued = str(record.get(self.date_field) or '')
+            current = self._vehicles.get(registration)
+            if current is None or issued >= current[0]:
+                vehicle_id = record.get(self.vehicle_field)
+                customer_id = record.get(self.customer_field)
+                self._vehicles[registration] = (
+                    issued,
+                    None if vehicle_id is None else str(vehicle_id),
+                    None if customer_id is None else str(customer_id),
+                )
+
+    def _create_table_sql(self) -> str:
+        return f"""
+        CREATE TABLE IF NOT EXISTS {self.table} (
+            registration TEXT PRIMARY KEY,
+            vehicle_id TEXT,
+            customer_id TEXT,
+            due_date DATE NOT NULL,
+            due_week DATE NOT NULL,
+            reminded_at TIMESTAMPTZ,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS {self.table}_due_week_idx ON {self.table} (due_week, due_date);
+        """
+
+    def _due_date_sql(self, cursor) -> Optional[str]:
+        """SQL for the due date from the enrichment columns that exist, or None if there are none."""
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = 'public' AND table_name = %s",
+            (self.enrichment_table,)
+        )
+        columns = {row[0] for row in cursor.fetchall()}
+        candidates = [sql for source, sqls in DUE_DATE_SQL.items() if source in columns for sql in sqls]
+        if not candidates:
+            return None
+        return candidates[0] if len(candidates) == 1 else f"GREATEST({', '.join(candidates)})"
+
+    def _upsert(self, cursor, due_date: str, registrations: List[str],
+                vehicle_ids: List[Optional[str]], customer_ids: List[Optional[str]]) -> int:
+        """Queue the given vehicles in their due week, touching only changed rows. Returns the rows written."""
+        cursor.execute(f"""
+        WITH vehicles AS (
+            SELECT * FROM unnest(%s::text[], %s::text[], %s::text[]) AS v(registration, vehicle_id, customer_id)
+        ), due AS (
+            SELECT v.registration, v.vehicle_id, v.customer_id, {due_date} AS due_date
+            FROM vehicles v
+            JOIN {self.enrichment_table} e ON e.registration = v.registration
+        )
+        INSERT INTO {self.table} AS r (registration, vehicle_id, customer_id, due_date, due_week, updated_at)
+        SELECT registration, vehicle_id, customer_id, due_date, date_trunc('week', due_date)::date, NOW()
+        FROM due
+        WHERE due_date IS NOT NULL
+        ON CONFLICT (registration) DO UPDATE SET
+            vehicle_id = EXCLUDED.vehicle_id,
+            customer_id = EXCLUDED.customer_id,
+            due_date = EXCLUDED.due_date,
+            due_week = EXCLUDED.due_week,
+            reminded_at = CASE WHEN r.due_date = EXCLUDED.due_date THEN r.reminded_at END,
+            updated_at = NOW()
+        WHERE r.due_date IS DISTINCT FROM EXCLUDED.due_date
+           OR r.vehicle_id IS DISTINCT FROM EXCLUDED.vehicle_id
+           OR r.customer_id IS DISTINCT FROM EXCLUDED.customer_id
+        """, (registrations, vehicle_ids, customer_ids))
+        return cursor.rowcount
+
+    def finish(self, importer) -> Dict[str, int]:
+        """Move the imported vehicles whose due date changed into their week's bucket."""
+        return self.flush(importer.db)
+
+    def flush(self, db) -> Dict[str, int]:
+        """Queue the remembered vehicles and forget them."""
+        vehicles, self._vehicles = self._vehicles, {}
+        if not vehicles:
+            return {}
+        with db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(self._create_table_sql())
+                due_date = self._due_date_sql(cursor)
+                if due_date is None:
+                    logger.warning(f"MOT reminders: no enrichment data in {self.enrichment_table}; queue not updated")
+                    return {'mot_reminders_checked': len(vehicles), 'mot_reminders_moved': 0}
+                registrations = sorted(vehicles)
+                moved = self._upsert(
+                    cursor,
+                    due_date,
+                    registrations,
+                    [vehicles[r][1] for r in registrations],
+                    [vehicles[r][2] for r in registrations]
+                )
+        logger.info(f"MOT reminders: {moved} of {len(vehicles)} vehicles moved to a new due week in {self.table}")
+        return {'mot_reminders_checked': len(vehicles), 'mot_reminders_moved': moved}
+
+    def rebuild(self, db, source_table: str, batch_size: int = 5000) -> int:
+        """Recompute the queue for every vehicle in ``source_table``. Returns the rows written."""
+        fields = [self.registration_field, self.vehicle_field, self.customer_field, self.date_field]
+        batch: List[Dict[str, Any]] = []
+        for row in db.stream_query(f"SELECT {', '.join(fields)} FROM {source_table}", batch_size=batch_size):
+            batch.append(dict(zip(fields, row)))
+            if len(batch) >= batch_size:
+                self.apply(None, batch)
+                batch = []
+        self.apply(None, batch)
+        return self.flush(db).get('mot_reminders_moved', 0)
+
+
+def due_weeks(lead_days: int = DEFAULT_LEAD_DAYS, today: Optional[date] = None,
+              since: Optional[date] = None) -> Tuple[date, date]:
+    """Return the first and last ``due_week`` buckets to read.
+
+    The last is the week ``lead_days`` from ``today``. The first is the week
+    of ``since``, by default the current week: reminders left unsent by a
+    missed run are still picked up while the MOT is not yet overdue.
+    """
+    today = today or date.today()
+    target = week_start(today + timedelta(days=lead_days))
+    return min(week_start(since or today), target), target
+
+
+def due_reminders(db, table: str = 'mot_reminders', lead_days: int = DEFAULT_LEAD_DAYS,
+                  today: Optional[date] = None, include_reminded: bool = False,
+                  since: Optional[date] = None) -> list:
+    """Return the queued vehicles due from ``since`` up to the week ``lead_days`` from ``today``.
+
+    Reads a range of ``due_week`` buckets through its index (see :func:`due_weeks`).
+    """
+    first, last = due_weeks(lead_days, today, since)
+    query = f"""
+    SELECT registration, vehicle_id, customer_id, due_date, reminded_at
+    FROM {table}
+    WHERE due_week BETWEEN %s AND %s
+    """
+    if not include_reminded:
+        query += " AND reminded_at IS NULL"
+    return db.execute_query(query + " ORDER BY due_date, registration", (first, last)) or []
+
+
+def mark_reminded(db, registrations: List[str], table: str = 'mot_reminders') -> int:
+    """Record that reminders were sent for these registrations. Returns the number of rows updated."""
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET reminded_at = NOW() WHERE registration = ANY(%s)",
+                (registrations,)
+            )
+            return cursor.rowcount
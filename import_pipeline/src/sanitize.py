@@ -0,0 +1,186 @@
+"""Byte-level sanitization of raw CSV input.
+
+Legacy exports contain stray control characters and bytes that are not valid
+UTF-8 (typically Windows-1252 text). :class:`SanitizingReader` wraps a binary
+stream and, block by block before the CSV parser sees the data:
+
+- detects the encoding from a BOM or the first block (UTF-8, UTF-16, or
+  Windows-1252 when no non-ASCII bytes form valid UTF-8) unless one is
+  configured,
+- transcodes to UTF-8; in UTF-8 input, stray invalid bytes are decoded as
+  Windows-1252 (so a lone ``\xa3`` still becomes ``£``), and bytes that are
+  undecodable even then are replaced with U+FFFD,
+- deletes ASCII control characters other than tab, CR and LF with a single
+  ``bytes.translate`` call per block,
+
+and counts what it changed.
+"""
+import codecs
+import io
+import logging
+import threading
+from typing import IO, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 1 << 20
+
+# Control bytes removed from the stream (everything below 0x20 except \t \n \r, and DEL)
+CONTROL_BYTES = bytes(b for b in range(0x20) if b not in (0x09, 0x0A, 0x0D)) + b'\x7f'
+
+# Encoding used when the data is not valid UTF-8
+FALLBACK_ENCODING = 'cp1252'
+
+_REPLACEMENT_UTF8 = '\ufffd'.encode('utf-8')
+
+_fallback_counter = threading.local()
+
+
+def _decode_with_fallback(error: UnicodeDecodeError):
+    """Codec error handler decoding invalid UTF-8 bytes with the fallback encoding."""
+    bad = error.object[error.start:error.end]
+    _fallback_counter.count = getattr(_fallback_counter, 'count', 0) + len(bad)
+    return bad.decode(FALLBACK_ENCODING, errors='replace'), error.end
+
+
+codecs.register_error('import_fallback', _decode_with_fallback)
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Guess the encoding of a sample from the start of a file."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    sample = split_incomplete_utf8(sample)[0]
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    # Mixed files: if some non-ASCII bytes form valid UTF-8, keep UTF-8 and
+    # let the error handler transcode the stray ones
+    _fallback_counter.count = 0
+    sample.decode('utf-8', errors='import_fallback')
+    non_ascii = len(sample) - len(sample.translate(None, bytes(range(0x80, 0x100))))
+    return 'utf-8' if _fallback_counter.count < non_ascii else FALLBACK_ENCODING
+
+
+def split_incomplete_utf8(data: bytes):
+    """Split off a multi-byte UTF-8 sequence cut short at the end of ``data``.
+
+    Returns ``(complete, tail)`` where ``tail`` holds at most 3 bytes.
+    """
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte < 0x80:
+            break
+        if byte >= 0xC0:
+            needed = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            if needed > back:
+                return data[:-back], data[-back:]
+            break
+    return data, b''
+
+
+class SanitizingReader(io.RawIOBase):
+    """Binary stream wrapper that yields sanitized UTF-8."""
+
+    def __init__(self, raw: IO[bytes], encoding: Optional[str] = None, block_size: int = BLOCK_SIZE):
+        """Initialize the reader.
+
+        Args:
+            raw: Binary stream to read from.
+            encoding: Source encoding, or None to detect it from the first block.
+            block_size: Number of bytes read from ``raw`` at a time.
+        """
+        self._raw = raw
+        self._block_size = block_size
+        self.encoding = encoding
+        self._decoder = None
+        self._carry = b''
+        self._pending = b''
+        self._offset = 0
+        self._eof = False
+        self.stats = {
+            'bytes_read': 0,
+            'bytes_transcoded': 0,
+            'bytes_replaced': 0,
+            'control_chars_removed': 0,
+        }
+
+    def readable(self) -> bool:
+        return True
+
+    def _transcode(self, block: bytes, final: bool) -> bytes:
+        """Return a block of source bytes as valid UTF-8."""
+        if self.encoding is None:
+            self.encoding = detect_encoding(block)
+            if self.encoding != 'utf-8':
+                logger.info(f"Input does not look like UTF-8; decoding as {self.encoding}")
+
+        if self.encoding == 'utf-8':
+            data = self._carry + block
+            if not final:
+                data, self._carry = split_incomplete_utf8(data)
+            try:
+                # Fast path: valid UTF-8 passes through untouched
+                data.decode('utf-8')
+                return data
+            except UnicodeDecodeError:
+                _fallback_counter.count = 0
+                encoded = data.decode('utf-8', errors='import_fallback').encode('utf-8')
+                self.stats['bytes_transcoded'] += _fallback_counter.count
+        else:
+            if self._decoder is None:
+                self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+            data = block
+            encoded = self._decoder.decode(block, final=final).encode('utf-8')
+
+        replaced = encoded.count(_REPLACEMENT_UTF8) - data.count(_REPLACEMENT_UTF8)
+        if replaced > 0:
+            self.stats['bytes_replaced'] += replaced
+        return encoded
+
+    def _fill(self):
+        """Read, transcode and clean the next block into the pending buffer."""
+        block = self._raw.read(self._block_size)
+        final = not block
+        self.stats['bytes_read'] += len(block)
+        data = self._transcode(block, final)
+        cleaned = data.translate(None, CONTROL_BYTES)
+        self.stats['control_chars_removed'] += len(data) - len(cleaned)
+        self._pending = cleaned
+        self._offset = 0
+        self._eof = final
+
+    def readinto(self, buffer) -> int:
+        while self._offset >= len(self._pending) and not self._eof:
+            self._fill()
+        n = min(len(buffer), len(self._pending) - self._offset)
+        buffer[:n] = self._pending[self._offset:self._offset + n]
+        self._offset += n
+        return n
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+    @property
+    def changed(self) -> int:
+        """Number of bytes transcoded, replaced or removed so far."""
+        return (
+            self.stats['bytes_transcoded']
+            + self.stats['bytes_replaced']
+            + self.stats['control_chars_removed']
+        )
+
+
+def sanitized(raw: IO[bytes], encoding: Optional[str] = None) -> io.BufferedReader:
+    """Wrap a binary stream in a buffered :class:`SanitizingReader`."""
+    return io.BufferedReader(SanitizingReader(raw, encoding), buffer_size=BLOCK_SIZE)
+
+
+def sanitize_stats(reader: io.BufferedReader) -> Dict[str, int]:
+    """Return the counters of a stream created with :func:`sanitized`."""
+    return dict(reader.raw.stats, encoding=reader.raw.encoding)
@@ -0,0 +1,204 @@
+"""Normalized search keys written alongside each imported batch.
+
+A column map can declare which DB columns feed which kind of search key::
+
+    search_keys:
+      registration: vehicle_registration
+      phone: customer_phone
+      name: [customer_first_name, customer_last_name]
+      document_number: document_number
+
+Every imported row gets one ``search_keys`` row per normalized key, pointing
+back at the row's table and ID. The keys for a batch are replaced in the
+batch's own transaction, so they always match the imported data and the web
+app can look rows up with an index probe instead of an ``ILIKE`` scan.
+Rows tombstoned by snapshot sync have no keys::
+
+    SELECT source_id FROM search_keys
+    WHERE kind = 'registration' AND key = 'AB12CDE' AND source_table = 'documents';
+"""
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_KEYS_TABLE = 'search_keys'
+
+# Rows per INSERT statement when writing keys
+PAGE_SIZE = 1000
+
+_NON_ALNUM = re.compile(r'[^0-9A-Za-z]')
+_NON_DIGIT = re.compile(r'\D')
+_WORD = re.compile(r'\w+')
+
+
+def registration_keys(value: Any) -> List[str]:
+    """``'ab12 cde'`` -> ``['AB12CDE']``."""
+    key = _NON_ALNUM.sub('', str(value)).upper()
+    return [key] if key else []
+
+
+def phone_keys(value: Any) -> List[str]:
+    """Digits only, with a UK ``+44``, ``0044`` or ``+44 (0)`` prefix rewritten to ``0``."""
+    digits = _NON_DIGIT.sub('', str(value))
+    if digits.startswith('00'):
+        digits = digits[2:]
+    if digits.startswith('440') and len(digits) == 13:
+        # +44 (0)7700 900123
+        digits = digits[2:]
+    elif digits.startswith('44') and len(digits) == 12:
+        digits = '0' + digits[2:]
+    return [digits] if len(digits) >= 6 else []
+
+
+def name_keys(value: Any) -> List[str]:
+    """Lowercase word tokens of two or more characters."""
+    return [token for token in _WORD.findall(str(value).lower()) if len(token) >= 2]
+
+
+def document_number_keys(value: Any) -> List[str]:
+    """Document number in upper case without spaces."""
+    key = ''.join(str(value).split()).upper()
+    return [key] if key else []
+
+
+NORMALIZERS: Dict[str, Callable[[Any], List[str]]] = {
+    'registration': registration_keys,
+    'phone': phone_keys,
+    'name': name_keys,
+    'document_number': document_number_keys,
+}
+
+
+class SearchKeyStage:
+    """Batch stage that keeps ``search_keys`` in step with imported rows."""
+
+    def __init__(self, config: Dict[str, Any], source_table: str, id_field: str = 'id',
+                 tombstone_column: Optional[str] = None):
+        self.source_table = source_table
+        self.id_field = id_field
+        self.tombstone_column = tombstone_column
+        self.fields: Dict[str, List[str]] = {}
+        for kind, fields in config.items():
+            if kind not in NORMALIZERS:
+                raise ValueError(f"Unknown search key kind: {kind} (expected one of {', '.join(NORMALIZERS)})")
+            self.fields[kind] = [fields] if isinstance(fields, str) else list(fields)
+
+    @property
+    def source_fields(self) -> List[str]:
+        fields = [self.id_field]
+        for kind_fields in self.fields.values():
+            fields += kind_fields
+        return list(dict.fromkeys(fields))
+
+    def prepare(self, cursor):
+        """Create the search keys table and its indexes if they do not exist yet."""
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SEARCH_KEYS_TABLE} (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            source_table TEXT NOT NULL,
+            source_id TEXT NOT NULL,
+            PRIMARY KEY (kind, key, source_table, source_id)
+        );
+        CREATE INDEX IF NOT EXISTS {SEARCH_KEYS_TABLE}_prefix_idx
+            ON {SEARCH_KEYS_TABLE} (kind, key text_pattern_ops);
+        CREATE INDEX IF NOT EXISTS {SEARCH_KEYS_TABLE}_source_idx
+            ON {SEARCH_KEYS_TABLE} (source_table, source_id);
+        """)
+
+    def keys_for(self, records: Iterable[Dict[str, Any]]) -> Set[Tuple[str, str, str, str]]:
+        """Return the distinct ``(kind, key, source_table, source_id)`` rows for some records."""
+        rows = set()
+        for record in records:
+            source_id = record.get(self.id_field)
+            if source_id is None:
+                continue
+            source_id = str(source_id)
+            for kind, fields in self.fields.items():
+                normalize = NORMALIZERS[kind]
+                for field in fields:
+                    value = record.get(field)
+                    if value is not None:
+                        for key in normalize(value):
+                            rows.add((kind, key, self.source_table, source_id))
+        return rows
+
+    def _insert(self, cursor, rows: Set[Tuple[str, str, str, str]]):
+        from psycopg2.extras import execute_values
+
+        if rows:
+            execute_values(
+                cursor,
+                f"INSERT INTO {SEARCH_KEYS_TABLE} (kind, key, source_table, source_id) VALUES %s "
+                f"ON CONFLICT DO NOTHING",
+                list(rows),
+                page_size=PAGE_SIZE
+            )
+
+    def apply(self, cursor, batch: List[Dict[str, Any]]):
+        """Replace the search keys of the batch's rows.
+
+        Must run in the same transaction as the batch upsert.
+        """
+        # The last version of a row wins, as in the upsert
+        latest = {str(record[self.id_field]): record for record in batch if record.get(self.id_field) is not None}
+        if not latest:
+            return
+        self._delete(cursor, list(latest))
+        if self.tombstone_column:
+            # The upsert leaves tombstones alone, so tombstoned rows stay without keys
+            cursor.execute(
+                f"SELECT {self.id_field} FROM {self.source_table} "
+                f"WHERE {self.id_field} = ANY(%s) AND {self.tombstone_column} IS NOT NULL",
+                ([record[self.id_field] for record in latest.values()],)
+            )
+            for (source_id,) in cursor.fetchall():
+                latest.pop(str(source_id), None)
+        self._insert(cursor, self.keys_for(latest.values()))
+
+    def _delete(self, cursor, ids: List[str]):
+        cursor.execute(
+            f"DELETE FROM {SEARCH_KEYS_TABLE} WHERE source_table = %s AND source_id = ANY(%s)",
+            (self.source_table, ids)
+        )
+
+    def tombstone(self, cursor, rows: List[Dict[str, Any]]):
+        """Remove the keys of rows tombstoned by snapshot sync."""
+        ids = [str(row[self.id_field]) for row in rows if row.get(self.id_field) is not None]
+        if ids:
+            self._delete(cursor, ids)
+
+    def restore(self, cursor, rows: List[Dict[str, Any]]):
+        """Add back the keys of rows whose tombstone was cleared."""
+        self._insert(cursor, self.keys_for(rows))
+
+    def rebuild(self, db, batch_size: int = 5000) -> int:
+        """Recompute the keys of every row in the source table. Returns the number of rows."""
+        with db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                self.prepare(cursor)
+                if self.tombstone_column:
+                    from .snapshot import ensure_tombstone_column
+                    ensure_tombstone_column(cursor, self.source_table, self.tombstone_column)
+
+        fields = self.source_fields
+        total = 0
+        batch: List[Dict[str, Any]] = []
+        with db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {SEARCH_KEYS_TABLE} WHERE source_table = %s", (self.source_table,))
+                query = f"SELECT {', '.join(fields)} FROM {self.source_table}"
+                if self.tombstone_column:
+                    query += f" WHERE {self.tombstone_column} IS NULL"
+                for row in db.stream_query(query, batch_size=batch_size):
+                    batch.append(dict(zip(fields, row)))
+                    if len(batch) >= batch_size:
+                        self._insert(cursor, self.keys_for(batch))
+                        total += len(batch)
+                        batch = []
+                self._insert(cursor, self.keys_for(batch))
+                total += len(batch)
+        logger.info(f"Rebuilt search keys for {total} {self.source_table} rows")
+        return total
@@ -0,0 +1,54 @@
+"""Aggregated reasons for skipped records.
+
+Logging every skipped record is slow on dirty files and buries the cause in
+thousands of identical lines. Instead, the importer counts skips per reason
+and keeps the first few rows of each reason as examples. The counts and
+samples are added to the import stats and logged once at the end.
+"""
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Example rows kept per reason unless overridden with SKIP_SAMPLES
+DEFAULT_SAMPLES = 5
+
+
+class SkipCounter:
+    """Counts skipped records per reason and samples a few of each."""
+
+    def __init__(self, samples_per_reason: int = DEFAULT_SAMPLES):
+        self.samples_per_reason = samples_per_reason
+        self.reset()
+
+    def reset(self):
+        self.counts: Dict[str, int] = {}
+        self.samples: Dict[str, List[Dict[str, Any]]] = {}
+
+    def add(self, reason: str, row_number: int, record: Dict[str, Any]):
+        """Count one skipped record, keeping it as a sample if there are fewer than the limit."""
+        count = self.counts.get(reason, 0)
+        self.counts[reason] = count + 1
+        if count < self.samples_per_reason:
+            self.samples.setdefault(reason, []).append({'row': row_number, 'record': record})
+
+    def add_count(self, reason: str, count: int):
+        """Count ``count`` records skipped for ``reason`` after processing, without samples."""
+        if count:
+            self.counts[reason] = self.counts.get(reason, 0) + count
+
+    def stats(self) -> Dict[str, Any]:
+        """Stats to merge into the import stats: ``skip_reasons`` and ``skip_samples``."""
+        return {
+            'skip_reasons': dict(sorted(self.counts.items(), key=lambda item: -item[1])),
+            'skip_samples': {reason: list(samples) for reason, samples in self.samples.items()},
+        }
+
+    def log_summary(self, table: str):
+        """Log one line per reason with the row numbers of its samples."""
+        for reason, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+            rows = ', '.join(str(sample['row']) for sample in self.samples.get(reason, []))
+            logger.warning(f"{table}: skipped {count} records - {reason} (e.g. rows {rows})")
+            if logger.isEnabledFor(logging.DEBUG):
+                for sample in self.samples.get(reason, []):
+                    logger.debug(f"  row {sample['row']}: {sample['record']}")
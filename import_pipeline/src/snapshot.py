@@ -0,0 +1,201 @@
+"""Snapshot sync: find rows that were deleted at the source.
+
+The garage software exports full snapshots, so a row that is in the table
+but not in the latest export was deleted there. With snapshot sync on
+(``run_imports.py --snapshot-sync``) and a ``snapshot_sync`` section in the
+column map::
+
+    snapshot_sync:
+      action: tombstone        # or report
+      column: deleted_at       # set on vanished rows (tombstone only)
+      max_fraction: 0.1        # refuse to tombstone more than this share of the rows
+      window:                  # optional: only compare rows in this date range
+        column: issue_date
+        days: 730              # or from: / to: ISO dates
+
+every source ID seen in the CSV (including rows skipped by validation) is
+spooled to a temporary file. At the end of the run the IDs are copied into a
+temporary table and compared with the target table in one anti-join. The
+vanished IDs are written to a CSV report in ``REPORT_DIR`` and, with
+``tombstone``, marked by setting ``column`` (rows that reappear in a later
+snapshot have it cleared again). Nothing is ever deleted. Batch stages with
+``tombstone(cursor, rows)`` and ``restore(cursor, rows)`` methods are told
+about the rows in the same transaction, so derived data such as search keys
+stops (or starts again) including them.
+"""
+import csv
+import logging
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ('tombstone', 'report')
+
+
+def ensure_tombstone_column(cursor, table: str, column: str):
+    """Add the tombstone column to ``table`` if it does not have it yet.
+
+    Checked first, because even a no-op ``ADD COLUMN IF NOT EXISTS`` takes an
+    ACCESS EXCLUSIVE lock on the table.
+    """
+    cursor.execute(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = 'public' AND table_name = %s AND column_name = %s",
+        (table, column)
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} TIMESTAMPTZ")
+
+
+class SnapshotSyncStage:
+    """Chunk stage that collects source IDs and tombstones or reports vanished rows."""
+
+    def __init__(self, config: Dict[str, Any], field_mappings: Dict[str, str], table: str, id_field: str = 'id'):
+        self.table = table
+        self.id_field = id_field
+        self.action = config.get('action', 'report')
+        if self.action not in ACTIONS:
+            raise ValueError(f"snapshot_sync action must be one of {', '.join(ACTIONS)}")
+        self.column = config.get('column', 'deleted_at')
+        self.max_fraction = float(config.get('max_fraction', 0.1))
+        self.window = config.get('window')
+        if self.window and not self.window.get('column'):
+            raise ValueError("snapshot_sync window needs a column")
+        self.id_column = {db_field: csv_field for csv_field, db_field in field_mappings.items()}.get(id_field)
+        if self.id_column is None:
+            raise ValueError(f"snapshot_sync needs a mapping for the ID field {id_field}")
+        self.report_dir = os.getenv('REPORT_DIR', 'reports')
+        self._spool = None
+        self.ids_seen = 0
+
+    def apply(self, chunk: pd.DataFrame, records: List[Dict[str, Any]]):
+        """Spool the chunk's non-empty source IDs, whether or not the rows were imported."""
+        if self.id_column not in chunk.columns:
+            return
+        if self._spool is None:
+            self._spool = tempfile.TemporaryFile(mode='w+', newline='', dir=os.getenv('STAGING_DIR'))
+        ids = chunk[self.id_column].dropna().astype(str).str.strip()
+        ids = ids[ids != '']
+        csv.writer(self._spool).writerows((value,) for value in ids)
+        self.ids_seen += len(ids)
+
+    def _window_sql(self) -> Tuple[str, list]:
+        """SQL condition (with its parameters) limiting the comparison to the window."""
+        if not self.window:
+            return 'TRUE', []
+        column = self.window['column']
+        lower = self.window.get('from')
+        upper = self.window.get('to')
+        if self.window.get('days') is not None:
+            lower = (date.today() - timedelta(days=int(self.window['days']))).isoformat()
+        conditions, params = [], []
+        if lower:
+            conditions.append(f"t.{column} >= %s")
+            params.append(str(lower))
+        if upper:
+            conditions.append(f"t.{column} < %s")
+            params.append(str(upper))
+        return ' AND '.join(conditions) or 'TRUE', params
+
+    def _write_report(self, cursor) -> str:
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(
+            self.report_dir,
+            f"snapshot_{self.table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        )
+        with open(path, 'w', newline='') as f:
+            cursor.copy_expert("COPY (SELECT id FROM snapshot_vanished ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER true)", f)
+        return path
+
+    def finish(self, importer) -> Dict[str, int]:
+        """Compare the collected IDs with the table and act on the vanished rows."""
+        stats = {'snapshot_ids': self.ids_seen, 'snapshot_vanished': 0, 'snapshot_tombstoned': 0, 'snapshot_restored': 0}
+        if self._spool is None or not self.ids_seen:
+            logger.warning(f"Snapshot sync: no source IDs read; not comparing {self.table}")
+            return stats
+
+        window, params = self._window_sql()
+        tombstone = self.action == 'tombstone'
+        active = f"t.{self.column} IS NULL" if tombstone else 'TRUE'
+        try:
+            self._spool.seek(0)
+            with importer.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("CREATE TEMP TABLE snapshot_ids (id TEXT) ON COMMIT DROP")
+                    cursor.copy_expert("COPY snapshot_ids (id) FROM STDIN WITH (FORMAT csv)", self._spool)
+                    cursor.execute("ANALYZE snapshot_ids")
+                    if tombstone:
+                        ensure_tombstone_column(cursor, self.table, self.column)
+
+                    cursor.execute(f"SELECT COUNT(*) FROM {self.table} t WHERE {active} AND {window}", params)
+                    compared = cursor.fetchone()[0]
+                    # One set-based anti-join over the whole window
+                    cursor.execute(f"""
+                    CREATE TEMP TABLE snapshot_vanished ON COMMIT DROP AS
+                    SELECT t.{self.id_field}::text AS id
+                    FROM {self.table} t
+                    WHERE {active} AND {window}
+                      AND NOT EXISTS (SELECT 1 FROM snapshot_ids s WHERE s.id = t.{self.id_field}::text)
+                    """, params)
+                    stats['snapshot_vanished'] = cursor.rowcount
+                    logger.info(
+                        f"Snapshot sync: {stats['snapshot_vanished']} of {compared} {self.table} rows "
+                        f"are not in the snapshot of {self.ids_seen} IDs"
+                    )
+
+                    if stats['snapshot_vanished']:
+                        path = self._write_report(cursor)
+                        logger.warning(f"Snapshot sync: vanished {self.table} IDs written to {path}")
+
+                    if not tombstone:
+                        return stats
+                    if stats['snapshot_vanished'] > self.max_fraction * compared:
+                        logger.error(
+                            f"Snapshot sync: {stats['snapshot_vanished']} vanished rows exceed "
+                            f"max_fraction {self.max_fraction} of {compared}; is the export complete? "
+                            f"Not tombstoning."
+                        )
+                        return stats
+
+                    # Derived data (search keys, summaries) follows the rows in the same transaction
+                    stages = [stage for stage in importer.batch_stages if hasattr(stage, 'tombstone')]
+                    fields = list(dict.fromkeys(field for stage in stages for field in stage.source_fields))
+                    returning = f"RETURNING {', '.join(f't.{field}' for field in fields)}" if fields else ''
+
+                    cursor.execute(f"""
+                    UPDATE {self.table} t SET {self.column} = now()
+                    WHERE t.{self.column} IS NULL
+                      AND t.{self.id_field}::text IN (SELECT id FROM snapshot_vanished)
+                    {returning}
+                    """)
+                    stats['snapshot_tombstoned'] = cursor.rowcount
+                    if fields:
+                        rows = [dict(zip(fields, row)) for row in cursor.fetchall()]
+                        for stage in stages:
+                            stage.tombstone(cursor, rows)
+
+                    cursor.execute(f"""
+                    UPDATE {self.table} t SET {self.column} = NULL
+                    WHERE t.{self.column} IS NOT NULL
+                      AND t.{self.id_field}::text IN (SELECT id FROM snapshot_ids)
+                    {returning}
+                    """)
+                    stats['snapshot_restored'] = cursor.rowcount
+                    if fields:
+                        rows = [dict(zip(fields, row)) for row in cursor.fetchall()]
+                        for stage in stages:
+                            stage.restore(cursor, rows)
+                    logger.info(
+                        f"Snapshot sync: tombstoned {stats['snapshot_tombstoned']} and restored "
+                        f"{stats['snapshot_restored']} {self.table} rows"
+                    )
+            return stats
+        finally:
+            self._spool.close()
+            self._spool = None
+            self.ids_seen = 0
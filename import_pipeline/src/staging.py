@@ -0,0 +1,296 @@
+"""Local staging engine for set-based transforms and checks before loading.
+
+With a ``staging`` section in the column map, processed chunks are loaded
+into a local embedded database first instead of straight into Postgres::
+
+    staging:
+      engine: sqlite              # or duckdb (requires the duckdb package)
+      path: staging.db            # default: a temporary file removed afterwards
+      references:                 # Postgres rows copied in for the staged keys
+        documents:
+          key: id
+          match: document_id
+          columns: [total_gross]
+      checks:
+        orphan_line_items:
+          orphans: documents      # staged rows whose match value has no reference row
+          action: warn            # or drop
+        zero_quantity:
+          sql: SELECT _seq FROM staged WHERE CAST(quantity AS REAL) = 0
+          action: warn
+      transforms:
+        - UPDATE staged SET notes = NULL WHERE notes = ''
+
+Once the whole file is staged, the engine copies in the referenced Postgres
+rows (only those matching staged keys, looked up in batches), keeps the last
+row per ID, runs the checks and transforms as local set-based SQL, and hands
+the surviving rows back for bulk loading. Staged rows live in ``staged`` with
+a ``_seq`` column holding their order in the file; reference rows live in
+``ref_<table>``. Rows flagged by a check are written to a CSV report in
+``REPORT_DIR`` (default ``reports``).
+"""
+import csv
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional
+
+from .parsers import parse_value
+
+logger = logging.getLogger(__name__)
+
+# Number of reference keys looked up in Postgres per query
+LOOKUP_BATCH_SIZE = 5000
+
+CHECK_ACTIONS = ('drop', 'warn')
+
+
+class SQLiteEngine:
+    """Staging on SQLite (standard library)."""
+
+    name = 'sqlite'
+    # Decimals and dates are kept as text so their values round-trip exactly
+    TYPES = {'integer': 'INTEGER', 'boolean': 'INTEGER'}
+    DEFAULT_TYPE = 'TEXT'
+
+    def connect(self, path: str):
+        import sqlite3
+        sqlite3.register_adapter(Decimal, str)
+        conn = sqlite3.connect(path, isolation_level=None)
+        # The staging database is disposable, so skip durability work
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        return conn
+
+
+class DuckDBEngine:
+    """Staging on DuckDB (optional ``duckdb`` package)."""
+
+    name = 'duckdb'
+    TYPES = {'integer': 'BIGINT', 'boolean': 'BOOLEAN', 'decimal': 'DECIMAL(18,4)', 'date': 'DATE'}
+    DEFAULT_TYPE = 'VARCHAR'
+
+    def connect(self, path: str):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("Staging engine 'duckdb' requires the duckdb package (pip install duckdb)") from e
+        return duckdb.connect(path)
+
+
+ENGINES = {
+    'sqlite': SQLiteEngine,
+    'duckdb': DuckDBEngine,
+}
+
+
+class StagingArea:
+    """Stages processed records locally, checks them and yields the clean rows."""
+
+    def __init__(self, config: Dict[str, Any], table: str, id_field: str = 'id',
+                 type_casting: Optional[Dict[str, str]] = None):
+        engine = config.get('engine', 'sqlite')
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown staging engine: {engine} (expected one of {', '.join(ENGINES)})")
+        self.engine = ENGINES[engine]()
+        self.table = table
+        self.id_field = id_field
+        self.type_casting = type_casting or {}
+        self.path = config.get('path')
+        self.references = config.get('references') or {}
+        self.checks = config.get('checks') or {}
+        self.transforms = config.get('transforms') or []
+        self.report_dir = os.getenv('REPORT_DIR', 'reports')
+
+        for name, check in self.checks.items():
+            if check.get('action', 'warn') not in CHECK_ACTIONS:
+                raise ValueError(f"Staging check {name}: action must be one of {', '.join(CHECK_ACTIONS)}")
+            if 'orphans' in check and check['orphans'] not in self.references:
+                raise ValueError(f"Staging check {name}: unknown reference {check['orphans']}")
+            if 'orphans' not in check and 'sql' not in check:
+                raise ValueError(f"Staging check {name} needs 'orphans' or 'sql'")
+
+        self._conn = None
+        self._temp_dir: Optional[str] = None
+        self.columns: List[str] = []
+        self._seq = 0
+        # Rows dropped per check by the last run()
+        self.dropped: Dict[str, int] = {}
+
+    def begin(self):
+        """Open the staging database with an empty ``staged`` table."""
+        self.close()
+        path = self.path
+        if not path:
+            self._temp_dir = tempfile.mkdtemp(prefix='staging_', dir=os.getenv('STAGING_DIR'))
+            path = os.path.join(self._temp_dir, f"{self.table}.db")
+        self._conn = self.engine.connect(path)
+        self._conn.execute('DROP TABLE IF EXISTS staged')
+        for reference in self.references:
+            self._conn.execute(f"DROP TABLE IF EXISTS ref_{reference}")
+        self.columns = []
+        self._seq = 0
+        self.dropped = {}
+
+    def _column_type(self, column: str) -> str:
+        return self.engine.TYPES.get(self.type_casting.get(column), self.engine.DEFAULT_TYPE)
+
+    def _add_columns(self, records: List[Dict[str, Any]]):
+        """Create the staged table, or add columns not seen in earlier chunks."""
+        new = [c for c in dict.fromkeys(key for record in records for key in record) if c not in self.columns]
+        if not new:
+            return
+        if not self.columns:
+            definitions = ', '.join(f"{c} {self._column_type(c)}" for c in new)
+            self._conn.execute(f"CREATE TABLE staged (_seq BIGINT, {definitions})")
+        else:
+            for column in new:
+                self._conn.execute(f"ALTER TABLE staged ADD COLUMN {column} {self._column_type(column)}")
+        self.columns += new
+
+    def load(self, records: List[Dict[str, Any]]):
+        """Append processed records to the staged table."""
+        if not records:
+            return
+        self._add_columns(records)
+        rows = []
+        for record in records:
+            self._seq += 1
+            rows.append([self._seq] + [record.get(column) for column in self.columns])
+        placeholders = ', '.join(['?'] * (len(self.columns) + 1))
+        self._conn.execute('BEGIN')
+        self._conn.executemany(f"INSERT INTO staged (_seq, {', '.join(self.columns)}) VALUES ({placeholders})", rows)
+        self._conn.execute('COMMIT')
+
+    def _scalar(self, sql: str) -> Any:
+        return self._conn.execute(sql).fetchone()[0]
+
+    def _fetch_references(self, db):
+        """Copy the Postgres rows referenced by staged values into ``ref_<table>``."""
+        for table, spec in self.references.items():
+            key = spec.get('key', 'id')
+            match = spec['match']
+            columns = [key] + list(spec.get('columns') or [])
+            local = f"ref_{table}"
+            self._conn.execute(f"CREATE TABLE {local} ({', '.join(f'{c} {self.engine.DEFAULT_TYPE}' for c in columns)})")
+            if match not in self.columns:
+                continue
+
+            keys = [row[0] for row in self._conn.execute(
+                f"SELECT DISTINCT {match} FROM staged WHERE {match} IS NOT NULL"
+            ).fetchall()]
+            placeholders = ', '.join(['?'] * len(columns))
+            fetched = 0
+            with db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                        cursor.execute(
+                            f"SELECT {', '.join(columns)} FROM {table} WHERE {key} = ANY(%s)",
+                            (keys[start:start + LOOKUP_BATCH_SIZE],)
+                        )
+                        rows = [[None if v is None else str(v) for v in row] for row in cursor.fetchall()]
+                        if rows:
+                            self._conn.execute('BEGIN')
+                            self._conn.executemany(f"INSERT INTO {local} VALUES ({placeholders})", rows)
+                            self._conn.execute('COMMIT')
+                        fetched += len(rows)
+            logger.info(f"Staging: copied {fetched} of {len(keys)} referenced {table} rows")
+
+    def _check_sql(self, check: Dict[str, Any]) -> str:
+        """SQL selecting the ``_seq`` of every staged row a check flags."""
+        if 'sql' in check:
+            return check['sql']
+        reference = check['orphans']
+        spec = self.references[reference]
+        match = spec['match']
+        return (
+            f"SELECT s._seq FROM staged s WHERE s.{match} IS NOT NULL AND NOT EXISTS "
+            f"(SELECT 1 FROM ref_{reference} r WHERE r.{spec.get('key', 'id')} = CAST(s.{match} AS {self.engine.DEFAULT_TYPE}))"
+        )
+
+    def _write_report(self, name: str, flagged: str) -> str:
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(
+            self.report_dir,
+            f"staging_{self.table}_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        )
+        result = self._conn.execute(
+            f"SELECT {', '.join(self.columns)} FROM staged WHERE _seq IN ({flagged}) ORDER BY _seq"
+        )
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            while True:
+                rows = result.fetchmany(1000)
+                if not rows:
+                    break
+                writer.writerows(rows)
+        return path
+
+    def run(self, db) -> Dict[str, int]:
+        """Run reference lookups, de-duplication, checks and transforms.
+
+        Returns:
+            Stats: ``staged_rows``, ``staging_duplicates`` and
+            ``staging_dropped`` plus one ``staging_<check>`` count per check.
+        """
+        stats = {'staged_rows': self._seq, 'staging_duplicates': 0, 'staging_dropped': 0}
+        if not self.columns:
+            return stats
+
+        self._fetch_references(db)
+
+        if self.id_field in self.columns:
+            before = self._scalar('SELECT COUNT(*) FROM staged')
+            self._conn.execute(
+                f"DELETE FROM staged WHERE _seq NOT IN "
+                f"(SELECT MAX(_seq) FROM staged GROUP BY {self.id_field})"
+            )
+            stats['staging_duplicates'] = before - self._scalar('SELECT COUNT(*) FROM staged')
+
+        for name, check in self.checks.items():
+            flagged = self._check_sql(check)
+            count = self._scalar(f"SELECT COUNT(*) FROM ({flagged}) flagged")
+            stats[f"staging_{name}"] = count
+            if not count:
+                continue
+            path = self._write_report(name, flagged)
+            action = check.get('action', 'warn')
+            if action == 'drop':
+                self._conn.execute(f"DELETE FROM staged WHERE _seq IN ({flagged})")
+                stats['staging_dropped'] += count
+                self.dropped[name] = count
+            logger.warning(f"Staging check {name}: {count} rows flagged ({action}); report written to {path}")
+
+        for sql in self.transforms:
+            self._conn.execute(sql)
+
+        return stats
+
+    def rows(self, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the staged rows in file order, in batches, with their Python types restored."""
+        if not self.columns:
+            return
+        typed = [(column, self.type_casting[column]) for column in self.columns if column in self.type_casting]
+        result = self._conn.execute(f"SELECT {', '.join(self.columns)} FROM staged ORDER BY _seq")
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            batch = [dict(zip(self.columns, row)) for row in rows]
+            for record in batch:
+                for column, type_name in typed:
+                    record[column] = parse_value(record[column], type_name)
+            yield batch
+
+    def close(self):
+        """Close the staging database and remove it if it was temporary."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
@@ -0,0 +1,245 @@
+"""Incrementally maintained summary tables.
+
+A column map can declare summary tables under ``summaries``. Each summary
+groups imported rows by one or more keys and keeps running measures::
+
+    summaries:
+      summary_revenue_by_month:
+        group_by:
+          month: month(issue_date)
+        measures:
+          document_count: count()
+          total_gross: sum(total_gross)
+
+Group keys are DB columns, optionally bucketed with ``month(...)`` or
+``year(...)``; measures are ``count()`` or ``sum(<column>)``.
+
+For every batch the stage reads the current version of the batch's rows
+(locking them), subtracts their old contribution, adds the new one and
+applies the net delta to the summary tables, all in the batch's own
+transaction. Re-importing unchanged rows therefore leaves the summaries
+untouched, and a failed batch rolls back its summary changes with it. A row
+that appears more than once in a batch counts once, with its last version.
+
+Rows tombstoned by snapshot sync are not counted: the batch delta skips
+them, snapshot sync subtracts (or adds back) rows as it tombstones (or
+restores) them, and a rebuild leaves them out.
+"""
+import logging
+import re
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CALL = re.compile(r'^\s*(\w+)\s*\(\s*(\w*)\s*\)\s*$')
+
+BUCKETS = {
+    'month': ('YYYY-MM', 7),
+    'year': ('YYYY', 4),
+}
+
+MEASURE_FUNCTIONS = ('count', 'sum')
+
+
+def _bucket(value: Any, bucket: Optional[str]) -> str:
+    """Normalize a group key value to text, applying a date bucket if given."""
+    if value is None:
+        return ''
+    if bucket is None:
+        return str(value)
+    if hasattr(value, 'strftime'):
+        value = value.strftime('%Y-%m-%d')
+    return str(value)[:BUCKETS[bucket][1]]
+
+
+def _number(value: Any) -> Decimal:
+    if value is None:
+        return Decimal(0)
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+class Summary:
+    """One summary table definition."""
+
+    def __init__(self, table: str, config: Dict[str, Any]):
+        self.table = table
+        self.keys: List[Tuple[str, str, Optional[str]]] = []
+        self.measures: List[Tuple[str, str, Optional[str]]] = []
+
+        for name, spec in (config.get('group_by') or {}).items():
+            match = _CALL.match(str(spec))
+            if match:
+                bucket, field = match.groups()
+                if bucket not in BUCKETS:
+                    raise ValueError(f"Summary {table}: unknown bucket {bucket}() for {name}")
+            else:
+                bucket, field = None, str(spec).strip()
+            self.keys.append((name, field, bucket))
+
+        for name, spec in (config.get('measures') or {}).items():
+            match = _CALL.match(str(spec))
+            if not match or match.group(1) not in MEASURE_FUNCTIONS:
+                raise ValueError(f"Summary {table}: measure {name} must be count() or sum(<field>)")
+            function, field = match.groups()
+            if function == 'sum' and not field:
+                raise ValueError(f"Summary {table}: sum() for {name} needs a field")
+            self.measures.append((name, function, field or None))
+
+        if not self.keys or not self.measures:
+            raise ValueError(f"Summary {table} needs at least one group_by key and one measure")
+
+    @property
+    def source_fields(self) -> List[str]:
+        """Source table columns this summary reads."""
+        fields = [field for _, field, _ in self.keys]
+        fields += [field for _, _, field in self.measures if field]
+        return list(dict.fromkeys(fields))
+
+    def create_sql(self) -> str:
+        columns = [f"{name} TEXT NOT NULL" for name, _, _ in self.keys]
+        for name, function, _ in self.measures:
+            pg_type = 'BIGINT' if function == 'count' else 'DECIMAL(14,2)'
+            columns.append(f"{name} {pg_type} NOT NULL DEFAULT 0")
+        key_names = ', '.join(name for name, _, _ in self.keys)
+        return f"""
+        CREATE TABLE IF NOT EXISTS {self.table} (
+            {', '.join(columns)},
+            PRIMARY KEY ({key_names})
+        );
+        """
+
+    def upsert_sql(self) -> str:
+        columns = [name for name, _, _ in self.keys] + [name for name, _, _ in self.measures]
+        key_names = ', '.join(name for name, _, _ in self.keys)
+        return f"""
+        INSERT INTO {self.table} ({', '.join(columns)})
+        VALUES ({', '.join(['%s'] * len(columns))})
+        ON CONFLICT ({key_names}) DO UPDATE SET
+            {', '.join(f"{name} = {self.table}.{name} + EXCLUDED.{name}" for name, _, _ in self.measures)}
+        """
+
+    def rebuild_sql(self, source_table: str, tombstone_column: Optional[str] = None) -> str:
+        """SQL that recomputes the whole summary from the source table's live rows."""
+        key_exprs = []
+        for name, field, bucket in self.keys:
+            if bucket:
+                key_exprs.append(f"COALESCE(to_char({field}, '{BUCKETS[bucket][0]}'), '')")
+            else:
+                key_exprs.append(f"COALESCE({field}::text, '')")
+        measure_exprs = [
+            'COUNT(*)' if function == 'count' else f"COALESCE(SUM({field}), 0)"
+            for _, function, field in self.measures
+        ]
+        columns = [name for name, _, _ in self.keys] + [name for name, _, _ in self.measures]
+        return f"""
+        INSERT INTO {self.table} ({', '.join(columns)})
+        SELECT {', '.join(key_exprs + measure_exprs)}
+        FROM {source_table}
+        {f"WHERE {tombstone_column} IS NULL" if tombstone_column else ''}
+        GROUP BY {', '.join(str(i + 1) for i in range(len(key_exprs)))}
+        """
+
+    def accumulate(self, totals: Dict[tuple, List[Decimal]], row: Dict[str, Any], sign: int):
+        """Add (sign=1) or remove (sign=-1) one row's contribution."""
+        key = tuple(_bucket(row.get(field), bucket) for _, field, bucket in self.keys)
+        values = totals.setdefault(key, [Decimal(0)] * len(self.measures))
+        for i, (_, function, field) in enumerate(self.measures):
+            values[i] += sign * (1 if function == 'count' else _number(row.get(field)))
+
+
+class SummaryStage:
+    """Batch stage that keeps summary tables in step with imported rows."""
+
+    def __init__(self, config: Dict[str, Dict[str, Any]], source_table: str, id_field: str = 'id',
+                 tombstone_column: Optional[str] = None):
+        self.source_table = source_table
+        self.id_field = id_field
+        self.tombstone_column = tombstone_column
+        self.summaries = [Summary(table, spec or {}) for table, spec in config.items()]
+
+    @property
+    def source_fields(self) -> List[str]:
+        fields = [self.id_field]
+        for summary in self.summaries:
+            fields += summary.source_fields
+        return list(dict.fromkeys(fields))
+
+    def prepare(self, cursor):
+        """Create the summary tables if they do not exist yet."""
+        for summary in self.summaries:
+            cursor.execute(summary.create_sql())
+
+    def _fetch_existing(self, cursor, ids: List[Any]) -> List[Dict[str, Any]]:
+        """Read and lock the current version of the batch's rows."""
+        fields = self.source_fields
+        if self.tombstone_column:
+            fields = fields + [self.tombstone_column]
+        cursor.execute(
+            f"SELECT {', '.join(fields)} FROM {self.source_table} "
+            f"WHERE {self.id_field} = ANY(%s) FOR UPDATE",
+            (ids,)
+        )
+        return [dict(zip(fields, row)) for row in cursor.fetchall()]
+
+    def _apply_delta(self, cursor, removed: Iterable[Dict[str, Any]], added: Iterable[Dict[str, Any]]):
+        """Subtract the ``removed`` rows from, and add the ``added`` rows to, every summary table."""
+        removed, added = list(removed), list(added)
+        for summary in self.summaries:
+            totals: Dict[tuple, List[Decimal]] = {}
+            for row in removed:
+                summary.accumulate(totals, row, -1)
+            for row in added:
+                summary.accumulate(totals, row, 1)
+
+            deltas = [
+                key + tuple(
+                    int(value) if function == 'count' else value
+                    for value, (_, function, _) in zip(values, summary.measures)
+                )
+                for key, values in totals.items()
+                if any(values)
+            ]
+            if deltas:
+                cursor.executemany(summary.upsert_sql(), deltas)
+
+    def apply(self, cursor, batch: List[Dict[str, Any]]):
+        """Apply the batch's net change to every summary table.
+
+        Must run in the same transaction as, and before, the batch upsert.
+        """
+        # The upsert leaves the last version of a repeated ID, so only that one counts
+        latest = {record.get(self.id_field): record for record in batch}
+        ids = [id_ for id_ in latest if id_ is not None]
+        existing = self._fetch_existing(cursor, ids) if ids else []
+
+        # The upsert leaves tombstones alone, so a tombstoned row stays uncounted
+        tombstoned = set()
+        if self.tombstone_column:
+            tombstoned = {str(row[self.id_field]) for row in existing if row[self.tombstone_column] is not None}
+        self._apply_delta(
+            cursor,
+            (row for row in existing if str(row[self.id_field]) not in tombstoned),
+            (record for id_, record in latest.items() if str(id_) not in tombstoned)
+        )
+
+    def tombstone(self, cursor, rows: List[Dict[str, Any]]):
+        """Subtract rows tombstoned by snapshot sync."""
+        self._apply_delta(cursor, rows, [])
+
+    def restore(self, cursor, rows: List[Dict[str, Any]]):
+        """Add back rows whose tombstone was cleared."""
+        self._apply_delta(cursor, [], rows)
+
+    def rebuild(self, cursor):
+        """Recompute every summary table from scratch."""
+        self.prepare(cursor)
+        if self.tombstone_column:
+            from .snapshot import ensure_tombstone_column
+            ensure_tombstone_column(cursor, self.source_table, self.tombstone_column)
+        for summary in self.summaries:
+            logger.info(f"Rebuilding {summary.table} from {self.source_table}")
+            cursor.execute(f"TRUNCATE {summary.table}")
+            cursor.execute(summary.rebuild_sql(self.source_table, self.tombstone_column))
@@ -0,0 +1,329 @@
+"""Range-checksum verification of a source file against the database.
+
+The source file is processed exactly as an import would process it (mapping,
+type casting, defaults, computed fields; nothing is written), and every row
+is reduced to a 60-bit hash of a canonical text form of its columns. The
+same hash is computed inside Postgres with ``md5()``, so the two sides can be
+compared with aggregates instead of shipping rows to the client:
+
+1. Rows are grouped into ranges by the first hex digits of ``md5(id)``, which
+   spreads any kind of ID (numeric or not) evenly. Each range is summarised
+   as ``(row count, sum of row hashes)``, an order-independent checksum.
+2. Only ranges whose checksums differ are split into 16 sub-ranges and
+   compared again, one query per level.
+3. Once a mismatching range holds few enough rows, its per-row hashes are
+   fetched and compared, giving the missing, extra and changed IDs.
+
+A correct import of a million rows is confirmed with a single aggregate
+query over the table.
+
+The comparison can be limited to a range of a date or numeric column. The
+range is applied to the source rows and to the table alike, so rows outside
+it are neither expected nor reported.
+"""
+import csv
+import hashlib
+import logging
+import os
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .parsers import parse_date
+
+logger = logging.getLogger(__name__)
+
+# Hex digits of md5(id) defining the first level of ranges (16 ** 2 = 256 ranges)
+ROOT_DEPTH = 2
+
+# Deepest range prefix before comparing rows regardless of range size
+MAX_DEPTH = 6
+
+# Mismatching ranges with at most this many source rows are compared row by row
+ROW_COMPARE_LIMIT = 2000
+
+# Separator between column values and marker for NULL in the canonical row text
+SEPARATOR = '\x1f'
+NULL = '\\N'
+
+NUMERIC_TYPES = ('decimal', 'integer')
+
+# Column types a comparison range can be given for (ordered the same in Python and SQL)
+RANGE_TYPES = NUMERIC_TYPES + ('date',)
+
+
+def canonical(value: Any, type_name: Optional[str]) -> str:
+    """Canonical text of a processed value, matching :func:`sql_canonical`."""
+    if value is None:
+        return NULL
+    if type_name in NUMERIC_TYPES:
+        number = Decimal(str(value))
+        if number == 0:
+            return '0'
+        return format(number.normalize(), 'f')
+    if type_name == 'boolean' or isinstance(value, bool):
+        return 'true' if value else 'false'
+    if type_name == 'date' and hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+def sql_canonical(column: str, type_name: Optional[str]) -> str:
+    """SQL expression giving the canonical text of a column, matching :func:`canonical`."""
+    if type_name in NUMERIC_TYPES:
+        expression = f"trim_scale({column}::numeric)::text"
+    elif type_name == 'date':
+        expression = f"to_char({column}::date, 'YYYY-MM-DD')"
+    else:
+        expression = f"{column}::text"
+    return f"coalesce({expression}, '{NULL}')"
+
+
+def row_hash(text: str) -> int:
+    """60-bit hash of a canonical row (the first 15 hex digits of its md5)."""
+    return int(hashlib.md5(text.encode('utf-8')).hexdigest()[:15], 16)
+
+
+def id_range(source_id: str, depth: int) -> str:
+    return hashlib.md5(source_id.encode('utf-8')).hexdigest()[:depth]
+
+
+class RangeVerifier:
+    """Compares the rows an importer would write with the rows in its table."""
+
+    def __init__(self, importer, columns: Optional[List[str]] = None, range_column: Optional[str] = None,
+                 lower: Optional[str] = None, upper: Optional[str] = None):
+        """Initialize the verifier.
+
+        Args:
+            importer: Importer whose file and config are verified.
+            columns: DB columns to compare (default: every processed column in the table).
+            range_column: Date or numeric DB column to limit the comparison by.
+            lower: Inclusive lower bound of ``range_column``.
+            upper: Exclusive upper bound of ``range_column``.
+        """
+        self.importer = importer
+        self.table = importer.TABLE_NAME
+        self.id_field = importer.config.get('id_field', 'id')
+        self.type_casting = importer.config.get('type_casting') or {}
+        self.columns = columns
+        self.range_column = range_column
+        self.bounds = self._parse_bounds(lower, upper)
+        self.report_dir = os.getenv('REPORT_DIR', 'reports')
+        self.source: Dict[str, int] = {}
+        self.queries = 0
+
+    def _table_columns(self) -> List[str]:
+        return self.importer.db.get_table_columns(self.table)
+
+    def _parse_bounds(self, lower: Optional[str], upper: Optional[str]) -> Tuple[Any, Any]:
+        """Validate the range options and return the bounds as comparable values."""
+        if self.range_column is None:
+            if lower is not None or upper is not None:
+                raise ValueError("A range bound needs a range column")
+            return None, None
+        type_name = self.type_casting.get(self.range_column)
+        if type_name not in RANGE_TYPES:
+            raise ValueError(
+                f"Range column {self.range_column} must be typed as one of {', '.join(RANGE_TYPES)} in type_casting"
+            )
+        if lower is None and upper is None:
+            raise ValueError(f"Range on {self.range_column} needs a lower or upper bound")
+        bounds = []
+        for bound in (lower, upper):
+            if bound is None:
+                bounds.append(None)
+                continue
+            try:
+                value = parse_date(bound) if type_name == 'date' else Decimal(str(bound).strip())
+            except InvalidOperation:
+                value = None
+            if value is None:
+                raise ValueError(f"Invalid {type_name} bound for {self.range_column}: {bound}")
+            bounds.append(value)
+        return tuple(bounds)
+
+    def in_range(self, record: Dict[str, Any]) -> bool:
+        """Whether a processed record falls inside the comparison range (rows with no value do not)."""
+        if self.range_column is None:
+            return True
+        value = record.get(self.range_column)
+        if value is None:
+            return False
+        type_name = self.type_casting[self.range_column]
+        # ISO dates compare correctly as text
+        value = canonical(value, type_name) if type_name == 'date' else Decimal(str(value))
+        lower, upper = self.bounds
+        return (lower is None or value >= lower) and (upper is None or value < upper)
+
+    def _range_sql(self) -> List[str]:
+        """SQL conditions matching :meth:`in_range`. The bounds are validated values, not user SQL."""
+        cast = 'date' if self.type_casting[self.range_column] == 'date' else 'numeric'
+        lower, upper = self.bounds
+        conditions = []
+        if lower is not None:
+            conditions.append(f"{self.range_column} >= '{lower}'::{cast}")
+        if upper is not None:
+            conditions.append(f"{self.range_column} < '{upper}'::{cast}")
+        return conditions
+
+    def _filter(self, table_columns: List[str]) -> str:
+        conditions = []
+        if self.range_column is not None:
+            conditions += self._range_sql()
+        # Rows tombstoned by snapshot sync are no longer expected in the file
+        deleted = (self.importer.config.get('snapshot_sync') or {}).get('column', 'deleted_at')
+        if deleted in table_columns:
+            conditions.append(f"{deleted} IS NULL")
+        return ' AND '.join(conditions) or 'TRUE'
+
+    def load_source(self) -> int:
+        """Process the source file and hash its rows. Returns the number of distinct IDs."""
+        importer = self.importer
+        # Verification must not run reconciliation, enrichment or snapshot sync
+        importer.chunk_stages = []
+        importer._reset_stats()
+
+        table_columns = set(self._table_columns())
+        self.source = {}
+        for _, records in importer.processed_chunks(importer.file_path):
+            if not records:
+                continue
+            if self.columns is None:
+                self.columns = sorted(
+                    column for column in records[0]
+                    if column in table_columns and column != self.id_field
+                )
+            for record in records:
+                source_id = record.get(self.id_field)
+                if source_id is None:
+                    continue
+                if not self.in_range(record):
+                    # A later version of the ID may have moved out of the range
+                    self.source.pop(str(source_id), None)
+                    continue
+                text = SEPARATOR.join(
+                    canonical(record.get(column), self.type_casting.get(column)) for column in self.columns
+                )
+                # The last occurrence of an ID wins, as with the upsert
+                self.source[str(source_id)] = row_hash(text)
+        importer.finish()
+        logger.info(
+            f"Hashed {len(self.source)} source rows over {len(self.columns or [])} columns "
+            f"({importer.stats['skipped']} skipped as the import would)"
+        )
+        return len(self.source)
+
+    def _hash_sql(self) -> str:
+        row = ', '.join(sql_canonical(column, self.type_casting.get(column)) for column in self.columns)
+        return f"('x' || substr(md5(concat_ws(E'\\x1f', {row})), 1, 15))::bit(60)::bigint"
+
+    def _source_ranges(self, depth: int, within: Optional[Iterable[str]] = None) -> Dict[str, Tuple[int, int]]:
+        wanted = set(within) if within is not None else None
+        ranges: Dict[str, Tuple[int, int]] = {}
+        for source_id, value in self.source.items():
+            key = id_range(source_id, depth)
+            if wanted is not None and key[:-1] not in wanted:
+                continue
+            count, total = ranges.get(key, (0, 0))
+            ranges[key] = (count + 1, total + value)
+        return ranges
+
+    def _db_ranges(self, cursor, depth: int, condition: str,
+                   within: Optional[List[str]] = None) -> Dict[str, Tuple[int, int]]:
+        sql = f"""
+        SELECT left(md5({self.id_field}::text), %s) AS range, COUNT(*), SUM({self._hash_sql()})
+        FROM {self.table}
+        WHERE {condition}
+        """
+        params: list = [depth]
+        if within is not None:
+            sql += f" AND left(md5({self.id_field}::text), %s) = ANY(%s)"
+            params += [depth - 1, within]
+        sql += " GROUP BY 1"
+        cursor.execute(sql, params)
+        self.queries += 1
+        return {key: (count, int(total)) for key, count, total in cursor.fetchall()}
+
+    def _db_rows(self, cursor, condition: str, ranges: List[str], depth: int) -> Dict[str, int]:
+        cursor.execute(f"""
+        SELECT {self.id_field}::text, {self._hash_sql()}
+        FROM {self.table}
+        WHERE {condition} AND left(md5({self.id_field}::text), %s) = ANY(%s)
+        """, (depth, ranges))
+        self.queries += 1
+        return dict(cursor.fetchall())
+
+    def compare(self) -> Dict[str, Any]:
+        """Compare the hashed source rows with the table.
+
+        Returns:
+            Stats: ``source_rows``, ``db_rows``, ``ranges``, ``mismatched_ranges``,
+            ``queries`` and the ``missing``, ``extra`` and ``changed`` ID lists.
+        """
+        if not self.columns:
+            raise ValueError(f"No columns of {self.table} to compare; load the source first")
+        result = {'source_rows': len(self.source), 'db_rows': 0, 'ranges': 0, 'mismatched_ranges': 0,
+                  'queries': 0, 'missing': [], 'extra': [], 'changed': []}
+
+        with self.importer.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                condition = self._filter(self._table_columns())
+                depth = ROOT_DEPTH
+                source = self._source_ranges(depth)
+                database = self._db_ranges(cursor, depth, condition)
+                result['ranges'] = len(set(source) | set(database))
+                result['db_rows'] = sum(count for count, _ in database.values())
+
+                row_ranges: List[str] = []
+                while True:
+                    mismatched = sorted(key for key in set(source) | set(database) if source.get(key) != database.get(key))
+                    if depth == ROOT_DEPTH:
+                        result['mismatched_ranges'] = len(mismatched)
+                    if not mismatched:
+                        break
+                    small = [key for key in mismatched if source.get(key, (0, 0))[0] <= ROW_COMPARE_LIMIT]
+                    large = [key for key in mismatched if key not in small]
+                    if depth >= MAX_DEPTH:
+                        small, large = mismatched, []
+                    row_ranges += small
+                    if not large:
+                        break
+                    logger.info(f"{len(large)} large ranges differ at depth {depth}; splitting them")
+                    depth += 1
+                    source = self._source_ranges(depth, large)
+                    database = self._db_ranges(cursor, depth, condition, large)
+
+                # Compare the rows of the remaining ranges, grouped by prefix length
+                by_depth: Dict[int, List[str]] = {}
+                for key in row_ranges:
+                    by_depth.setdefault(len(key), []).append(key)
+                for key_depth, keys in by_depth.items():
+                    wanted = set(keys)
+                    db_rows = self._db_rows(cursor, condition, keys, key_depth)
+                    source_rows = {
+                        source_id: value for source_id, value in self.source.items()
+                        if id_range(source_id, key_depth) in wanted
+                    }
+                    result['missing'] += sorted(set(source_rows) - set(db_rows))
+                    result['extra'] += sorted(set(db_rows) - set(source_rows))
+                    result['changed'] += sorted(
+                        source_id for source_id in set(source_rows) & set(db_rows)
+                        if source_rows[source_id] != db_rows[source_id]
+                    )
+
+        result['queries'] = self.queries
+        return result
+
+    def write_report(self, result: Dict[str, Any]) -> Optional[str]:
+        """Write the differing IDs to a CSV report. Returns its path, or None if there are none."""
+        rows = [(problem, source_id) for problem in ('missing', 'extra', 'changed') for source_id in result[problem]]
+        if not rows:
+            return None
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(self.report_dir, f"verify_{self.table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['problem', 'id'])
+            writer.writerows(rows)
+        return path
@@ -0,0 +1,331 @@
+"""Watch-folder import service with incremental tailing.
+
+The garage software drops exports into a folder throughout the day. The
+watcher polls that folder, routes each CSV file to an importer by file name
+and imports only the bytes appended since the last time it looked. Per-file
+offsets are persisted to a JSON state file so restarts resume where they left
+off. Importers (with their compiled configs) and the database connection are
+created once and kept warm for the lifetime of the service.
+
+A range that keeps failing is retried with exponential backoff and, after
+``max_attempts`` failures, copied to the quarantine directory (with the
+header, so it can be fixed and imported by hand) and skipped.
+"""
+import fnmatch
+import io
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, Optional, Tuple, Type
+
+from .db import get_db
+from .importers.base_importer import BaseImporter
+
+logger = logging.getLogger(__name__)
+
+# Size of the blocks scanned when looking for the last complete record
+SCAN_BLOCK_SIZE = 1 << 20
+
+STATE_FILE_NAME = '.import_offsets.json'
+QUARANTINE_DIR_NAME = '.quarantine'
+
+# Failed ranges are retried after RETRY_BACKOFF seconds, doubling up to MAX_RETRY_BACKOFF
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 30.0
+MAX_RETRY_BACKOFF = 3600.0
+# Seconds a file must be unchanged before a final record without a newline is imported
+DEFAULT_IDLE_FLUSH = 60.0
+
+
+class FileSegment(io.RawIOBase):
+    """Readable view of a CSV header followed by ``path[start:end]``.
+
+    Lets pandas parse just the appended part of a file as if it were a
+    complete CSV, without reading it into memory first.
+    """
+
+    def __init__(self, path: str, header: bytes, start: int, end: int):
+        self._prefix = header
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        if self._remaining <= 0:
+            return 0
+        data = self._file.read(min(len(buffer), self._remaining))
+        n = len(data)
+        buffer[:n] = data
+        self._remaining -= n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def read_header(path: str) -> Optional[bytes]:
+    """Return the first line of a file including its newline, or None if incomplete."""
+    with open(path, 'rb') as f:
+        header = f.readline()
+    return header if header.endswith(b'\n') else None
+
+
+def find_complete_end(path: str, start: int, end: int) -> int:
+    """Return the offset just after the last complete CSV record in ``[start, end)``.
+
+    A record is complete when it ends in a newline outside a quoted field, so
+    a record that is still being written (or a multi-line quoted value that
+    is cut off) is left for the next poll.
+    """
+    last = start
+    in_quotes = False
+    pos = start
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while pos < end:
+            block = f.read(min(SCAN_BLOCK_SIZE, end - pos))
+            if not block:
+                break
+            if not in_quotes and b'"' not in block:
+                # Fast path: no quoting, so the last newline ends a record
+                newline = block.rfind(b'\n')
+                if newline >= 0:
+                    last = pos + newline + 1
+            else:
+                index = 0
+                while True:
+                    newline = block.find(b'\n', index)
+                    if newline < 0:
+                        in_quotes ^= bool(block.count(b'"', index) & 1)
+                        break
+                    in_quotes ^= bool(block.count(b'"', index, newline) & 1)
+                    if not in_quotes:
+                        last = pos + newline + 1
+                    index = newline + 1
+            pos += len(block)
+    return last
+
+
+class FolderWatcher:
+    """Polls a directory and incrementally imports new and appended CSV files."""
+
+    def __init__(
+        self,
+        directory: str,
+        routes: Dict[str, Type[BaseImporter]],
+        state_path: Optional[str] = None,
+        interval: float = 5.0,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        idle_flush: Optional[float] = DEFAULT_IDLE_FLUSH,
+        quarantine_dir: Optional[str] = None
+    ):
+        """Initialize the watcher.
+
+        Args:
+            directory: Directory to watch.
+            routes: Mapping of file name glob (case-insensitive) to importer class.
+            state_path: JSON file storing per-file offsets (default: ``<directory>/.import_offsets.json``).
+            interval: Seconds between polls.
+            max_attempts: Failed attempts at a range before it is quarantined and skipped.
+            idle_flush: Seconds after the last write before a final record without a
+                trailing newline is imported (None or 0 to always wait for the newline).
+            quarantine_dir: Where skipped ranges are saved (default: ``<directory>/.quarantine``).
+        """
+        self.directory = directory
+        self.routes = {pattern.lower(): importer for pattern, importer in routes.items()}
+        self.state_path = state_path or os.path.join(directory, STATE_FILE_NAME)
+        self.interval = interval
+        self.max_attempts = max(1, max_attempts)
+        self.idle_flush = idle_flush
+        self.quarantine_dir = quarantine_dir or os.path.join(directory, QUARANTINE_DIR_NAME)
+        # path -> {'start', 'attempts', 'retry_at'} for ranges that failed to import
+        self.failures: Dict[str, Dict[str, Any]] = {}
+        self.state: Dict[str, Dict[str, Any]] = self._load_state()
+        self.importers: Dict[Type[BaseImporter], BaseImporter] = {}
+        self._running = False
+
+        # Keep one connection open across batches and files
+        get_db().persistent = True
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r') as f:
+            return json.load(f)
+
+    def _save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def _importer_for(self, file_name: str) -> Optional[BaseImporter]:
+        """Return the warm importer for a file name, creating it on first use."""
+        for pattern, importer_class in self.routes.items():
+            if fnmatch.fnmatch(file_name.lower(), pattern):
+                if importer_class not in self.importers:
+                    importer = importer_class(self.directory)
+                    importer.prepare()
+                    self.importers[importer_class] = importer
+                return self.importers[importer_class]
+        return None
+
+    def _pending_range(self, path: str, stat: os.stat_result) -> Optional[Tuple[bytes, int, int]]:
+        """Return ``(header, start, end)`` for the unimported part of a file, if any."""
+        entry = self.state.get(path)
+        header = read_header(path)
+        if header is None:
+            return None
+
+        replaced = (
+            entry is None
+            or entry.get('inode') != stat.st_ino
+            or stat.st_size < entry.get('offset', 0)
+            or entry.get('header_size') != len(header)
+        )
+        start = len(header) if replaced else entry['offset']
+        if replaced and entry is not None:
+            logger.info(f"{path} was replaced or truncated; importing it from the start")
+
+        if stat.st_size <= start:
+            return None
+        end = find_complete_end(path, start, stat.st_size)
+        if end < stat.st_size and self.idle_flush and time.time() - stat.st_mtime >= self.idle_flush:
+            # The writer has finished without a trailing newline
+            end = stat.st_size
+        if end <= start:
+            return None
+        return header, start, end
+
+    def _advance(self, path: str, stat: os.stat_result, header: bytes, end: int):
+        """Record that ``path`` has been imported up to ``end``."""
+        self.state[path] = {
+            'offset': end,
+            'inode': stat.st_ino,
+            'header_size': len(header),
+            'updated_at': time.time(),
+        }
+        self._save_state()
+
+    def _quarantine(self, path: str, header: bytes, start: int, end: int) -> str:
+        """Copy the header and ``path[start:end]`` to the quarantine directory."""
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        name, ext = os.path.splitext(os.path.basename(path))
+        target = os.path.join(self.quarantine_dir, f"{name}.{start}-{end}{ext}")
+        with io.BufferedReader(FileSegment(path, header, start, end)) as source, open(target, 'wb') as f:
+            shutil.copyfileobj(source, f)
+        return target
+
+    def _record_failure(self, path: str, header: bytes, start: int, end: int, reason: str) -> bool:
+        """Count a failed attempt at a range and schedule the retry.
+
+        Returns True if the range has now failed ``max_attempts`` times and
+        was quarantined, in which case the caller skips it.
+        """
+        failure = self.failures.get(path)
+        if failure is None or failure['start'] != start:
+            failure = self.failures[path] = {'start': start, 'attempts': 0}
+        failure['attempts'] += 1
+
+        if failure['attempts'] >= self.max_attempts:
+            del self.failures[path]
+            target = self._quarantine(path, header, start, end)
+            logger.error(
+                f"{path}: bytes {start}-{end} failed {self.max_attempts} times ({reason}); "
+                f"skipping them, saved to {target}"
+            )
+            return True
+
+        delay = min(RETRY_BACKOFF * 2 ** (failure['attempts'] - 1), MAX_RETRY_BACKOFF)
+        failure['retry_at'] = time.time() + delay
+        logger.error(
+            f"{path}: {reason}; retrying from offset {start} in {delay:.0f}s "
+            f"(attempt {failure['attempts']} of {self.max_attempts})"
+        )
+        return False
+
+    def process_file(self, path: str) -> Optional[Dict[str, int]]:
+        """Import the new part of one file and advance its offset on success.
+
+        A failed range is retried with backoff and skipped after
+        ``max_attempts`` failures.
+        """
+        importer = self._importer_for(os.path.basename(path))
+        if importer is None:
+            return None
+
+        stat = os.stat(path)
+        pending = self._pending_range(path, stat)
+        if pending is None:
+            return None
+        header, start, end = pending
+
+        failure = self.failures.get(path)
+        if failure is not None and failure['start'] == start and time.time() < failure['retry_at']:
+            return None
+
+        logger.info(f"Importing {end - start} new bytes of {path} with {importer.__class__.__name__}")
+        importer.file_path = path
+        importer._reset_stats()
+        try:
+            with importer.table_lock(), io.BufferedReader(FileSegment(path, header, start, end)) as source:
+                importer.import_csv(source, progress=False)
+                stats = importer.finish()
+        except Exception as e:
+            if self._record_failure(path, header, start, end, str(e)):
+                self._advance(path, stat, header, end)
+            raise
+
+        if stats['errors']:
+            # Upserts are idempotent, so the same range can be retried
+            if self._record_failure(path, header, start, end, f"{stats['errors']} records failed"):
+                self._advance(path, stat, header, end)
+        else:
+            self.failures.pop(path, None)
+            self._advance(path, stat, header, end)
+
+        logger.info(
+            f"{os.path.basename(path)}: {stats['imported']} imported, "
+            f"{stats['skipped']} skipped, {stats['errors']} errors"
+        )
+        return stats
+
+    def poll(self):
+        """Scan the directory once and import anything new."""
+        with os.scandir(self.directory) as entries:
+            paths = sorted(
+                entry.path for entry in entries
+                if entry.is_file() and entry.name != os.path.basename(self.state_path)
+            )
+        for path in paths:
+            try:
+                self.process_file(path)
+            except Exception as e:
+                logger.error(f"Error importing {path}: {e}", exc_info=True)
+
+    def run(self):
+        """Poll until ``stop()`` is called."""
+        logger.info(f"Watching {self.directory} every {self.interval}s for {', '.join(self.routes)}")
+        self._running = True
+        try:
+            while self._running:
+                self.poll()
+                time.sleep(self.interval)
+        finally:
+            get_db().close()
+
+    def stop(self, *args):
+        """Stop after the current poll. Usable as a signal handler."""
+        logger.info("Stopping folder watcher")
+        self._running = False
@@ -0,0 +1,5 @@
+"""Shared pytest setup: make the ``src`` package importable from the project root."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
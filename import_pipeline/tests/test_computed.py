@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+import pytest
+
+from src.computed import ComputedFieldError, apply_computed_fields, compile_computed_fields
+
+
+def compute(config, records, known_fields=None):
+    return apply_computed_fields(records, compile_computed_fields(config, known_fields))
+
+
+def test_arithmetic_and_conditional():
+    records = compute(
+        {
+            'balance_due': 'total_amount - paid_amount',
+            'payment_status': "'paid' if balance_due <= 0 else 'unpaid'",
+        },
+        [
+            {'total_amount': Decimal('10.00'), 'paid_amount': Decimal('10.00')},
+            {'total_amount': Decimal('12.50'), 'paid_amount': Decimal('2.50')},
+        ]
+    )
+    assert [r['balance_due'] for r in records] == [Decimal('0.00'), Decimal('10.00')]
+    assert [r['payment_status'] for r in records] == ['paid', 'unpaid']
+
+
+def test_nulls_propagate_like_sql():
+    records = compute(
+        {
+            'sum': 'a + b',
+            'ratio': 'a / b',
+            'bigger': 'a > b',
+            'missing': 'b is None',
+        },
+        [
+            {'a': Decimal('1'), 'b': None},
+            {'a': Decimal('1'), 'b': Decimal('0')},
+        ]
+    )
+    assert records[0]['sum'] is None
+    assert records[0]['ratio'] is None
+    # Comparisons against null are false
+    assert records[0]['bigger'] is False
+    assert records[0]['missing'] is True
+    # Division by zero yields null
+    assert records[1]['ratio'] is None
+    assert records[1]['missing'] is False
+
+
+def test_concat_skips_nulls_and_coalesce():
+    records = compute(
+        {
+            'customer_name': "concat(first, last, sep=' ')",
+            'total': 'coalesce(total, quantity * unit_price)',
+        },
+        [
+            {'first': 'Ann', 'last': 'Lee', 'total': None, 'quantity': Decimal('2'), 'unit_price': Decimal('1.25')},
+            {'first': None, 'last': 'Lee', 'total': Decimal('9'), 'quantity': None, 'unit_price': None},
+        ]
+    )
+    assert [r['customer_name'] for r in records] == ['Ann Lee', 'Lee']
+    assert [r['total'] for r in records] == [Decimal('2.50'), Decimal('9')]
+
+
+def test_later_fields_can_use_earlier_ones():
+    fields = compile_computed_fields({'a2': 'a * 2', 'a4': 'a2 * 2'}, known_fields=['a'])
+    records = apply_computed_fields([{'a': 3}], fields)
+    assert records[0]['a4'] == 12
+
+
+def test_unknown_field_is_rejected():
+    with pytest.raises(ComputedFieldError) as error:
+        compile_computed_fields({'total': 'quantity * price'}, known_fields=['quantity'])
+    assert error.value.field == 'total'
+    assert 'price' in error.value.message
+
+
+@pytest.mark.parametrize('expression', [
+    'a ** 2',
+    '__import__("os")',
+    'a.b',
+    'a +',
+])
+def test_unsupported_syntax_is_rejected(expression):
+    with pytest.raises(ValueError):
+        compile_computed_fields({'x': expression})
@@ -0,0 +1,180 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from src import enrichment
+from src.enrichment import DvlaSource, Enricher, EnrichmentError, ResponseCache, TokenBucket, normalize_registration
+
+
+class StubSource:
+    name = 'stub'
+
+    def request(self, registration, client, timeout):
+        return 'GET', f"http://stub/{registration}", {}, None
+
+
+class StubClient:
+    """HTTP client returning queued ``(status, body, headers)`` responses per URL."""
+
+    def __init__(self, responses=None, default=(200, b'{"ok": true}', {})):
+        self.responses = {url: list(queue) for url, queue in (responses or {}).items()}
+        self.default = default
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, method, url, headers, body, timeout):
+        with self._lock:
+            self.calls.append(url)
+            queue = self.responses.get(url)
+            return queue.pop(0) if queue else self.default
+
+
+def enricher(client, **kwargs):
+    kwargs.setdefault('backoff', 0)
+    return Enricher([StubSource()], client=client, **kwargs)
+
+
+def test_normalize_registration():
+    assert normalize_registration(' ab12 cde ') == 'AB12CDE'
+    assert normalize_registration('  ') is None
+    assert normalize_registration(None) is None
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2, burst=3, clock=lambda: now[0], sleep=sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert sleeps == []
+
+    bucket.acquire()
+    assert sleeps == [pytest.approx(0.5)]
+
+    now[0] += 10
+    for _ in range(3):
+        bucket.acquire()
+    # Tokens never build up beyond the burst size
+    assert len(sleeps) == 1
+    bucket.acquire()
+    assert len(sleeps) == 2
+
+
+def test_duplicate_lookups_share_one_request():
+    release = threading.Event()
+    calls = []
+
+    def client(method, url, headers, body, timeout):
+        release.wait(5)
+        calls.append(url)
+        return 200, b'{"make": "FORD"}', {}
+
+    e = enricher(client)
+    try:
+        first = e.submit(['AB12 CDE', 'ab12cde'])
+        second = e.submit(['AB12CDE'])
+        assert first[('stub', 'AB12CDE')] is second[('stub', 'AB12CDE')]
+        release.set()
+        assert e.collect(second) == {'AB12CDE': {'stub': {'make': 'FORD'}}}
+    finally:
+        e.close()
+    assert calls == ['http://stub/AB12CDE']
+    assert e.stats['coalesced'] == 1
+    assert e.stats['requests'] == 1
+
+
+def test_cache_is_reused_until_the_ttl_expires(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(enrichment.time, 'time', lambda: now[0])
+    client = StubClient(responses={'http://stub/GONE1': [(404, b'', {})]})
+
+    e = enricher(client, cache=ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=60))
+    try:
+        assert e.lookup(['AB1', 'GONE1']) == {'AB1': {'stub': {'ok': True}}}
+        # Found and not-found responses are both served from the cache
+        assert e.lookup(['AB1', 'GONE1']) == {'AB1': {'stub': {'ok': True}}}
+        assert len(client.calls) == 2
+        assert e.stats['cache_hits'] == 2
+        assert e.stats['not_found'] == 1
+
+        now[0] += 61
+        e.lookup(['AB1'])
+        assert client.calls.count('http://stub/AB1') == 2
+    finally:
+        e.close()
+
+
+def test_retries_rate_limits_and_server_errors(monkeypatch):
+    delays = []
+    monkeypatch.setattr(enrichment.time, 'sleep', delays.append)
+    client = StubClient(responses={'http://stub/AB1': [
+        (429, b'', {'Retry-After': '7'}),
+        (503, b'', {}),
+        (200, b'{"make": "VW"}', {}),
+    ]})
+
+    e = enricher(client, backoff=1.0)
+    try:
+        assert e.lookup(['AB1']) == {'AB1': {'stub': {'make': 'VW'}}}
+    finally:
+        e.close()
+    assert len(client.calls) == 3
+    # Retry-After wins over the backoff; then the doubled backoff of the second attempt
+    assert delays == [7, 2.0]
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(enrichment.time, 'sleep', lambda seconds: None)
+    client = StubClient(default=(500, b'', {}))
+
+    e = enricher(client, max_retries=2)
+    try:
+        futures = e.submit(['AB1'])
+        with pytest.raises(EnrichmentError):
+            futures[('stub', 'AB1')].result()
+        assert e.collect(e.submit(['AB2'])) == {}
+    finally:
+        e.close()
+    assert client.calls.count('http://stub/AB1') == 3
+    assert e.stats['errors'] == 1
+
+
+def test_dvla_lookup_against_a_local_server():
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            registration = request['registrationNumber']
+            if self.headers.get('x-api-key') != 'key':
+                status, body = 403, b''
+            elif registration == 'NOPE':
+                status, body = 404, b'{"message": "not found"}'
+            else:
+                status, body = 200, json.dumps({'registrationNumber': registration, 'make': 'FORD'}).encode()
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    e = Enricher([DvlaSource('key', f"http://127.0.0.1:{server.server_port}/vehicles")], backoff=0)
+    try:
+        assert e.lookup(['ab12 cde', 'NOPE']) == {
+            'AB12CDE': {'dvla': {'registrationNumber': 'AB12CDE', 'make': 'FORD'}}
+        }
+        assert e.stats['not_found'] == 1
+    finally:
+        e.close()
+        server.shutdown()
+        server.server_close()
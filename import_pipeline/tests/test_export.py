@@ -0,0 +1,26 @@
+from src.export import export_query, tombstone_column
+
+
+class FakeDb:
+    def __init__(self, columns):
+        self.columns = columns
+
+    def get_table_columns(self, table):
+        return self.columns
+
+
+def test_tombstone_column_comes_from_the_column_map(monkeypatch):
+    assert tombstone_column('documents') == 'deleted_at'
+    monkeypatch.setattr(
+        'src.importers.document_importer.DocumentImporter.load_config',
+        classmethod(lambda cls: {'snapshot_sync': {'action': 'tombstone', 'column': 'removed_at'}})
+    )
+    assert tombstone_column('documents') == 'removed_at'
+    assert tombstone_column('customers') == 'deleted_at'
+
+
+def test_export_query_leaves_out_tombstoned_rows():
+    db = FakeDb(['id', 'issue_date', 'deleted_at'])
+    assert export_query('documents', db) == 'SELECT * FROM documents WHERE deleted_at IS NULL ORDER BY issue_date, id'
+    assert export_query('documents', db, include_deleted=True) == 'SELECT * FROM documents ORDER BY issue_date, id'
+    assert export_query('customers', FakeDb(['id'])) == 'SELECT * FROM customers ORDER BY id'
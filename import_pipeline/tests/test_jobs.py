@@ -0,0 +1,103 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.jobs import JobQueue, JobService, make_server
+
+
+class StubImporter:
+    TABLE_NAME = 'documents'
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'))
+
+
+def test_claim_runs_one_job_per_table(queue):
+    first = queue.submit('documents', 'documents', '/data/a.csv')
+    second = queue.submit('documents', 'documents', '/data/b.csv')
+    other = queue.submit('line_items', 'line_items', '/data/c.csv')
+
+    assert queue.claim('host:1')['id'] == first['id']
+    # documents is busy, so the line_items job is next even though it is newer
+    assert queue.claim('host:1')['id'] == other['id']
+    assert queue.claim('host:1') is None
+
+    queue.finish(first['id'], 'succeeded', stats={'total': 1})
+    claimed = queue.claim('host:1')
+    assert claimed['id'] == second['id']
+    assert claimed['status'] == 'running'
+    assert claimed['worker'] == 'host:1'
+
+
+def test_cancel_only_queued_jobs(queue):
+    running = queue.submit('documents', 'documents', '/data/a.csv')
+    queued = queue.submit('line_items', 'line_items', '/data/b.csv')
+    queue.claim('host:1')
+
+    assert queue.cancel(queued['id']) is True
+    assert queue.get(queued['id'])['status'] == 'cancelled'
+    assert queue.cancel(queued['id']) is False
+    assert queue.cancel(running['id']) is False
+    assert queue.get(running['id'])['status'] == 'running'
+    # A cancelled job is never claimed
+    assert queue.claim('host:1') is None
+
+
+def test_list_and_metrics(queue):
+    for name in ('a', 'b', 'c'):
+        queue.submit('documents', 'documents', f"/data/{name}.csv")
+    assert [job['file_path'] for job in queue.list(limit=2)] == ['/data/c.csv', '/data/b.csv']
+    assert queue.list(status='running') == []
+    assert queue.metrics()['jobs']['queued'] == 3
+
+
+def test_submit_checks_the_import_dir(tmp_path, queue):
+    allowed = tmp_path / 'imports'
+    allowed.mkdir()
+    (allowed / 'a.csv').write_text('id\n1\n')
+    (tmp_path / 'outside.csv').write_text('id\n1\n')
+    service = JobService(queue, {'documents': StubImporter}, import_dir=str(allowed))
+
+    assert service.submit('documents', str(allowed / 'a.csv'))['table_name'] == 'documents'
+    for import_type, path in [
+        ('documents', str(tmp_path / 'outside.csv')),
+        ('documents', str(allowed / '..' / 'outside.csv')),
+        ('documents', str(allowed / 'missing.csv')),
+        ('invoices', str(allowed / 'a.csv')),
+    ]:
+        with pytest.raises(ValueError):
+            service.submit(import_type, path)
+
+
+def test_refuses_open_bind_without_token_or_import_dir(tmp_path, queue):
+    service = JobService(queue, {'documents': StubImporter})
+    with pytest.raises(ValueError):
+        make_server(service, '0.0.0.0', 0)
+
+    for server in (
+        make_server(service, '127.0.0.1', 0),
+        make_server(service, '0.0.0.0', 0, token='secret'),
+        make_server(JobService(queue, {'documents': StubImporter}, import_dir=str(tmp_path)), '0.0.0.0', 0),
+    ):
+        server.server_close()
+
+
+def test_invalid_limit_is_a_bad_request(queue):
+    queue.submit('documents', 'documents', '/data/a.csv')
+    server = make_server(JobService(queue, {'documents': StubImporter}), '127.0.0.1', 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/jobs"
+    try:
+        with urllib.request.urlopen(f"{url}?limit=1") as response:
+            assert len(json.loads(response.read())['jobs']) == 1
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{url}?limit=ten")
+        assert error.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,29 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from src.money import parse_money_column, pence_to_pounds
+
+
+def test_parses_numbers_and_formatted_amounts():
+    pence, valid = parse_money_column(['12.34', '£1,234.50', 7, Decimal('0.10'), '-3.2'])
+    assert pence.tolist() == [1234, 123450, 700, 10, -320]
+    assert valid.all()
+
+
+def test_invalid_and_missing_cells():
+    pence, valid = parse_money_column(pd.Series(['abc', None, '', '5']))
+    assert valid.tolist() == [False, False, False, True]
+    assert pence.tolist() == [0, 0, 0, 500]
+
+
+def test_rounds_half_away_from_zero():
+    # 0.285 * 100 is 28.4999... in binary floating point
+    pence, _ = parse_money_column(['0.285', '-0.285', '0.005', '1.004'])
+    assert pence.tolist() == [29, -29, 1, 100]
+    assert pence.dtype == np.int64
+
+
+def test_pence_to_pounds():
+    assert pence_to_pounds([1234, -5, 0, 100]).tolist() == ['12.34', '-0.05', '0.00', '1.00']
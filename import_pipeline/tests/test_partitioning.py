@@ -0,0 +1,55 @@
+from datetime import date, datetime
+
+import pytest
+
+from src.partitioning import RangePartitioning
+
+
+def test_yearly_keys():
+    partitioning = RangePartitioning('documents', {'column': 'issue_date', 'interval': 'year'})
+    assert partitioning.key_for(date(2024, 3, 5)) == '2024'
+    assert partitioning.key_for(datetime(2019, 12, 31, 23, 59)) == '2019'
+    assert partitioning.key_for('2021-07-01') == '2021'
+    assert partitioning.key_for(None) is None
+    assert partitioning.key_for('not a date') is None
+    assert partitioning.partition_name('2024') == 'documents_p2024'
+    assert partitioning.partition_name(None) == 'documents_default'
+    assert partitioning.bounds('2024') == ('2024-01-01', '2025-01-01')
+
+
+def test_monthly_keys():
+    partitioning = RangePartitioning('documents', {'column': 'issue_date', 'interval': 'month'})
+    assert partitioning.key_for(date(2024, 3, 5)) == '2024-03'
+    assert partitioning.key_for('2024') is None
+    assert partitioning.partition_name('2024-03') == 'documents_p2024_03'
+    assert partitioning.bounds('2024-12') == ('2024-12-01', '2025-01-01')
+
+
+def test_initial_keys():
+    yearly = RangePartitioning('documents', {'column': 'issue_date', 'from': 2022})
+    assert yearly.initial_keys(until=date(2024, 6, 1)) == ['2022', '2023', '2024']
+    monthly = RangePartitioning('documents', {'column': 'issue_date', 'interval': 'month', 'from': '2023-11'})
+    assert monthly.initial_keys(until=date(2024, 2, 1)) == ['2023-11', '2023-12', '2024-01', '2024-02']
+    assert RangePartitioning('documents', {'column': 'issue_date'}).initial_keys() == []
+
+
+def test_route_groups_by_partition():
+    partitioning = RangePartitioning('documents', {'column': 'issue_date'})
+    batch = [
+        {'id': 1, 'issue_date': date(2023, 1, 1)},
+        {'id': 2, 'issue_date': None},
+        {'id': 3, 'issue_date': date(2023, 6, 1)},
+        {'id': 4, 'issue_date': date(2024, 1, 1)},
+    ]
+    groups = partitioning.route(batch)
+    assert {key: [r['id'] for r in rows] for key, rows in groups.items()} == {
+        '2023': [1, 3],
+        None: [2],
+        '2024': [4],
+    }
+
+
+@pytest.mark.parametrize('config', [{}, {'column': 'issue_date', 'interval': 'week'}])
+def test_invalid_config(config):
+    with pytest.raises(ValueError):
+        RangePartitioning('documents', config)
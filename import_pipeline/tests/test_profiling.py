@@ -0,0 +1,89 @@
+import os
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from src.profiling import StageProfiler, collapsed_stacks, format_func
+
+
+def func(name):
+    return ('/app/src/module.py', 1, name)
+
+
+def stats(entries):
+    """Build pstats-like data from ``name -> (self, cumulative, {caller: edge cumulative})``."""
+    raw = {}
+    for name, (self_time, cum_time, callers) in entries.items():
+        raw[func(name)] = (1, 1, self_time, cum_time, {
+            func(caller): (1, 1, edge, edge) for caller, edge in callers.items()
+        })
+    return SimpleNamespace(stats=raw)
+
+
+def test_format_func():
+    assert format_func(('/app/src/parsers.py', 12, 'parse_date')) == 'parsers.py:12(parse_date)'
+    assert format_func(('~', 0, "<built-in method builtins.len>")) == '<built-in method builtins.len>'
+
+
+def test_collapsed_stacks_apportion_self_time():
+    graph = stats({
+        'main': (1.0, 10.0, {}),
+        'a': (2.0, 5.0, {'main': 5.0}),
+        'b': (1.0, 4.0, {'main': 4.0}),
+        'c': (6.0, 6.0, {'a': 3.0, 'b': 3.0}),
+    })
+    lines = dict(collapsed_stacks(graph, prefix='load'))
+    assert lines == {
+        'load;module.py:1(main)': 1_000_000,
+        'load;module.py:1(main);module.py:1(a)': 2_000_000,
+        'load;module.py:1(main);module.py:1(b)': 1_000_000,
+        # Time reaching c from both callers is merged under one of them
+        'load;module.py:1(main);module.py:1(a);module.py:1(c)': 6_000_000,
+    }
+
+
+def test_collapsed_stacks_skip_recursion():
+    graph = stats({
+        'main': (1.0, 4.0, {}),
+        'walk': (3.0, 3.0, {'main': 3.0, 'walk': 2.0}),
+    })
+    lines = dict(collapsed_stacks(graph))
+    assert lines == {
+        'module.py:1(main)': 1_000_000,
+        'module.py:1(main);module.py:1(walk)': 3_000_000,
+    }
+
+
+def test_collapsed_stacks_stay_fast_with_high_fan_in():
+    # Every function calls every later one: the number of distinct paths is 2^(n-2)
+    n = 40
+    entries = {'f0': (1.0, float(n), {})}
+    for i in range(1, n):
+        callers = {f"f{j}": 1.0 / i for j in range(i)}
+        entries[f"f{i}"] = (1.0, float(n - i), callers)
+    started = time.perf_counter()
+    lines = collapsed_stacks(stats(entries))
+    assert time.perf_counter() - started < 5
+    assert lines
+
+
+def test_stage_profiler_traces_memory_only_on_request(tmp_path):
+    profiler = StageProfiler(output_dir=str(tmp_path), memory=False)
+    with profiler.stage('process'):
+        sum(range(1000))
+    assert not tracemalloc.is_tracing()
+    assert profiler.allocations == {}
+    assert profiler.wall_times['process'] > 0
+
+    profiler = StageProfiler(output_dir=str(tmp_path), memory=True)
+    try:
+        with profiler.stage('load'):
+            kept = [bytearray(1024) for _ in range(100)]
+        assert tracemalloc.is_tracing()
+    finally:
+        profiler.stop()
+    assert not tracemalloc.is_tracing()
+    assert kept and profiler.allocations['load']
+
+    written = profiler.dump()
+    assert sorted(os.path.basename(path) for path in written) == ['load.collapsed', 'load.pstats']
@@ -0,0 +1,88 @@
+import importlib.util
+import io
+
+import pandas as pd
+import pytest
+
+from src.reader import convert_columns, header_columns, native_casts, read_chunks, reader_settings
+
+ENGINES = [
+    'c',
+    pytest.param('pyarrow', marks=pytest.mark.skipif(
+        importlib.util.find_spec('pyarrow') is None, reason='pyarrow is not installed'
+    )),
+]
+
+CONFIG = {
+    'field_mappings': {'_ID': 'id', 'docDate': 'issue_date', 'Qty': 'quantity', 'Total': 'total'},
+    'type_casting': {'issue_date': 'date', 'quantity': 'integer', 'total': 'decimal'},
+}
+
+CSV = (
+    b'_ID,docDate,Unused,Qty,Total\n'
+    b'007,14/03/2024,x,2,1.50\n'
+    b'008,not a date,y,2.9,NULL\n'
+    b'009,,z,n/a,3\n'
+)
+
+
+def stream(data=CSV):
+    return io.BufferedReader(io.BytesIO(data))
+
+
+def test_reader_settings(monkeypatch):
+    monkeypatch.delenv('CSV_ENGINE', raising=False)
+    assert reader_settings(CONFIG) == {'engine': 'c', 'columns': ['_ID', 'docDate', 'Qty', 'Total']}
+    assert reader_settings(dict(CONFIG, reader={'prune_columns': False}))['columns'] is None
+    monkeypatch.setenv('CSV_ENGINE', 'pyarrow')
+    assert reader_settings(CONFIG)['engine'] == 'pyarrow'
+    monkeypatch.setenv('CSV_ENGINE', 'fast')
+    with pytest.raises(ValueError):
+        reader_settings(CONFIG)
+
+
+def test_native_casts_only_cover_vectorized_types():
+    assert native_casts(CONFIG) == {'docDate': 'date', 'Qty': 'integer'}
+
+
+def test_header_columns_does_not_consume_the_stream():
+    s = stream()
+    assert header_columns(s) == ['_ID', 'docDate', 'Unused', 'Qty', 'Total']
+    assert s.read().startswith(b'_ID,')
+    assert header_columns(stream(b'_ID,doc')) is None
+
+
+def test_convert_columns_leaves_unparseable_cells_as_text():
+    chunk = pd.DataFrame({
+        'docDate': ['14/03/2024', 'not a date', None],
+        'Qty': ['2', '2.9', 'n/a'],
+        'Other': ['a', 'b', 'c'],
+    }, dtype=object)
+    converted = convert_columns(chunk, {'docDate': 'date', 'Qty': 'integer', 'Missing': 'date'})
+    assert converted['docDate'].tolist() == ['2024-03-14', 'not a date', None]
+    assert converted['Qty'].tolist() == [2, 2, 'n/a']
+    assert converted['Other'].tolist() == ['a', 'b', 'c']
+
+
+def read(engine, columns, chunk_size=2):
+    chunks = list(read_chunks(stream(), chunk_size, engine=engine, columns=columns))
+    return chunks, pd.concat(chunks)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_read_chunks_prunes_columns_and_reads_text(engine):
+    chunks, frame = read(engine, ['_ID', 'docDate', 'Qty', 'Total', 'NotInFile'])
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert frame.index.tolist() == [0, 1, 2]
+    assert list(frame.columns) == ['_ID', 'docDate', 'Qty', 'Total']
+    # Text only, so leading zeros survive
+    assert frame['_ID'].tolist() == ['007', '008', '009']
+    assert frame['Total'].tolist()[:1] == ['1.50']
+    assert frame['Total'].isna().tolist() == [False, True, False]
+    assert frame['docDate'].isna().tolist() == [False, False, True]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_read_chunks_without_pruning(engine):
+    _, frame = read(engine, None)
+    assert list(frame.columns) == ['_ID', 'docDate', 'Unused', 'Qty', 'Total']
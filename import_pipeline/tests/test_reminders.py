@@ -0,0 +1,60 @@
+from datetime import date
+
+import pytest
+
+from src.importers.document_importer import DocumentImporter
+from src.reminders import MotReminderStage, due_reminders, due_weeks, week_start
+
+
+@pytest.mark.parametrize('day, monday', [
+    (date(2026, 10, 19), date(2026, 10, 19)),  # Monday
+    (date(2026, 10, 25), date(2026, 10, 19)),  # Sunday
+    (date(2026, 10, 26), date(2026, 10, 26)),
+    (date(2027, 1, 1), date(2026, 12, 28)),    # across the year end
+    (date(2024, 3, 1), date(2024, 2, 26)),     # across a leap day
+])
+def test_week_start(day, monday):
+    assert week_start(day) == monday
+
+
+def test_due_weeks_reads_from_the_current_week_to_the_target_week():
+    # Wednesday; 28 days ahead is Wednesday 2026-11-18
+    assert due_weeks(28, today=date(2026, 10, 21)) == (date(2026, 10, 19), date(2026, 11, 16))
+
+
+def test_due_weeks_with_since_reaches_back():
+    first, last = due_weeks(28, today=date(2026, 10, 21), since=date(2026, 10, 8))
+    assert (first, last) == (date(2026, 10, 5), date(2026, 11, 16))
+
+
+def test_due_weeks_never_starts_after_the_target():
+    assert due_weeks(0, today=date(2026, 10, 21), since=date(2026, 12, 1)) == (date(2026, 10, 19), date(2026, 10, 19))
+
+
+class FakeDb:
+    def __init__(self):
+        self.queries = []
+
+    def execute_query(self, query, params=None, fetch=True):
+        self.queries.append((' '.join(query.split()), params))
+        return []
+
+
+def test_due_reminders_reads_the_week_range():
+    db = FakeDb()
+    due_reminders(db, lead_days=28, today=date(2026, 10, 21))
+    query, params = db.queries[0]
+    assert 'due_week BETWEEN %s AND %s AND reminded_at IS NULL' in query
+    assert params == (date(2026, 10, 19), date(2026, 11, 16))
+
+    due_reminders(db, lead_days=28, today=date(2026, 10, 21), include_reminded=True)
+    assert 'reminded_at IS NULL' not in db.queries[1][0]
+
+
+@pytest.mark.parametrize('enabled', ['true', 'false'])
+def test_reminder_stage_needs_enrichment(monkeypatch, enabled):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://localhost/test')
+    monkeypatch.setenv('ENRICHMENT_ENABLED', enabled)
+    importer = DocumentImporter('Documents.csv')
+    has_stage = any(isinstance(stage, MotReminderStage) for stage in importer.chunk_stages)
+    assert has_stage == (enabled == 'true')
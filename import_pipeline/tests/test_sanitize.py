@@ -0,0 +1,55 @@
+import io
+
+from src.sanitize import SanitizingReader, detect_encoding, sanitize_stats, sanitized, split_incomplete_utf8
+
+
+def read_all(data: bytes, **kwargs):
+    stream = sanitized(io.BytesIO(data), **kwargs)
+    return stream.read(), sanitize_stats(stream)
+
+
+def test_clean_utf8_passes_through():
+    data = 'id,name\n1,Café £5\n'.encode('utf-8')
+    text, stats = read_all(data)
+    assert text == data
+    assert stats['encoding'] == 'utf-8'
+    assert stats['bytes_transcoded'] == stats['bytes_replaced'] == stats['control_chars_removed'] == 0
+
+
+def test_windows_1252_is_transcoded():
+    text, stats = read_all(b'id,price\n1,\xa35\n')
+    assert text == 'id,price\n1,£5\n'.encode('utf-8')
+    assert stats['encoding'] == 'cp1252'
+
+
+def test_stray_bytes_in_utf8_use_the_fallback():
+    data = 'id,name\n1,Café\n2,'.encode('utf-8') + b'\xa3' + b'9\n'
+    text, stats = read_all(data)
+    assert text.decode('utf-8') == 'id,name\n1,Café\n2,£9\n'
+    assert stats['encoding'] == 'utf-8'
+    assert stats['bytes_transcoded'] == 1
+
+
+def test_control_characters_are_removed():
+    text, stats = read_all(b'id,notes\n1,a\x00b\x07\tc\r\n')
+    assert text == b'id,notes\n1,ab\tc\r\n'
+    assert stats['control_chars_removed'] == 2
+
+
+def test_multibyte_characters_split_across_blocks():
+    data = ('x' * 3 + '€' * 10).encode('utf-8')
+    reader = SanitizingReader(io.BytesIO(data), block_size=4)
+    assert reader.read() == data
+    assert reader.changed == 0
+
+
+def test_split_incomplete_utf8():
+    euro = '€'.encode('utf-8')
+    assert split_incomplete_utf8(b'ab' + euro[:2]) == (b'ab', euro[:2])
+    assert split_incomplete_utf8(b'ab' + euro) == (b'ab' + euro, b'')
+    assert split_incomplete_utf8(b'abc') == (b'abc', b'')
+
+
+def test_detect_encoding_from_bom():
+    assert detect_encoding(b'\xef\xbb\xbfid\n') == 'utf-8-sig'
+    assert detect_encoding(b'\xff\xfei\x00d\x00') == 'utf-16'
@@ -0,0 +1,49 @@
+import pytest
+
+from src.search_keys import document_number_keys, name_keys, phone_keys, registration_keys
+
+
+@pytest.mark.parametrize('value, keys', [
+    ('AB12CDE', ['AB12CDE']),
+    ('ab12 cde', ['AB12CDE']),
+    ('  Ab12  Cde ', ['AB12CDE']),
+    ('AB12-CDE', ['AB12CDE']),
+    ('A1', ['A1']),
+    (' - ', []),
+    ('', []),
+])
+def test_registration_keys(value, keys):
+    assert registration_keys(value) == keys
+
+
+@pytest.mark.parametrize('value, keys', [
+    ('07700 900123', ['07700900123']),
+    ('+44 7700 900123', ['07700900123']),
+    ('+44 (0)7700 900123', ['07700900123']),
+    ('0044 7700 900123', ['07700900123']),
+    ('00 44 (0) 7700-900123', ['07700900123']),
+    ('01632 960 001', ['01632960001']),
+    # Not a UK number with a country code: left as dialled
+    ('+1 415 555 0100', ['14155550100']),
+    ('123', []),
+    ('n/a', []),
+])
+def test_phone_keys(value, keys):
+    assert phone_keys(value) == keys
+
+
+@pytest.mark.parametrize('value, keys', [
+    ('John Smith', ['john', 'smith']),
+    ("O'Brien-Jones", ['brien', 'jones']),
+    ('Smith, J.', ['smith']),
+    ('  MARY   ann ', ['mary', 'ann']),
+    ('Müller & Co.', ['müller', 'co']),
+    ('.', []),
+])
+def test_name_keys(value, keys):
+    assert name_keys(value) == keys
+
+
+def test_document_number_keys():
+    assert document_number_keys(' inv 0042 ') == ['INV0042']
+    assert document_number_keys('   ') == []
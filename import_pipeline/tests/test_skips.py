@@ -0,0 +1,30 @@
+from src.skips import SkipCounter
+
+
+def test_counts_and_samples_per_reason():
+    skips = SkipCounter(samples_per_reason=2)
+    for row in range(5):
+        skips.add('missing id', row, {'row': row})
+    skips.add('bad date', 9, {'date': 'x'})
+
+    stats = skips.stats()
+    assert stats['skip_reasons'] == {'missing id': 5, 'bad date': 1}
+    # Most frequent reason first
+    assert list(stats['skip_reasons']) == ['missing id', 'bad date']
+    assert [sample['row'] for sample in stats['skip_samples']['missing id']] == [0, 1]
+    assert stats['skip_samples']['bad date'] == [{'row': 9, 'record': {'date': 'x'}}]
+
+
+def test_add_count_has_no_samples():
+    skips = SkipCounter()
+    skips.add_count('staging: orphans', 3)
+    skips.add_count('staging: orphans', 0)
+    skips.add_count('staging: orphans', 2)
+    assert skips.stats() == {'skip_reasons': {'staging: orphans': 5}, 'skip_samples': {}}
+
+
+def test_reset():
+    skips = SkipCounter()
+    skips.add('missing id', 1, {})
+    skips.reset()
+    assert skips.stats() == {'skip_reasons': {}, 'skip_samples': {}}
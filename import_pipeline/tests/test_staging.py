@@ -0,0 +1,130 @@
+import csv
+import os
+from decimal import Decimal
+
+import pytest
+
+from src.staging import StagingArea
+
+
+class FakeCursor:
+    """Answers ``SELECT ... WHERE key = ANY(%s)`` from an in-memory reference table."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params):
+        keys = set(params[0])
+        self.result = [row for row in self.rows if row[0] in keys]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def cursor(self):
+        return FakeCursor(self.rows)
+
+
+class FakeDb:
+    """Reference lookups for staging, serving ``documents`` rows ``(id, total_gross)``."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_connection(self):
+        return FakeConnection(self.rows)
+
+
+def staging(tmp_path, monkeypatch, action):
+    monkeypatch.setenv('REPORT_DIR', str(tmp_path / 'reports'))
+    monkeypatch.setenv('STAGING_DIR', str(tmp_path))
+    area = StagingArea(
+        {
+            'references': {'documents': {'key': 'id', 'match': 'document_id', 'columns': ['total_gross']}},
+            'checks': {'orphan_line_items': {'orphans': 'documents', 'action': action}},
+        },
+        'line_items',
+        type_casting={'quantity': 'decimal'}
+    )
+    area.begin()
+    area.load([
+        {'id': '1', 'document_id': 'D1', 'quantity': Decimal('1')},
+        {'id': '2', 'document_id': 'D9', 'quantity': Decimal('2')},
+    ])
+    area.load([
+        {'id': '1', 'document_id': 'D1', 'quantity': Decimal('3')},
+        {'id': '3', 'document_id': None, 'quantity': Decimal('4')},
+    ])
+    return area
+
+
+def staged(area):
+    return [record for batch in area.rows(10) for record in batch]
+
+
+def test_drop_orphans_and_keep_the_last_row_per_id(tmp_path, monkeypatch):
+    area = staging(tmp_path, monkeypatch, 'drop')
+    try:
+        stats = area.run(FakeDb([('D1', '10.00')]))
+        assert stats == {
+            'staged_rows': 4,
+            'staging_duplicates': 1,
+            'staging_dropped': 1,
+            'staging_orphan_line_items': 1,
+        }
+        assert area.dropped == {'orphan_line_items': 1}
+        records = staged(area)
+        assert [(r['id'], r['quantity']) for r in records] == [('1', Decimal('3')), ('3', Decimal('4'))]
+    finally:
+        area.close()
+
+
+def test_warn_keeps_flagged_rows_and_writes_a_report(tmp_path, monkeypatch):
+    area = staging(tmp_path, monkeypatch, 'warn')
+    try:
+        stats = area.run(FakeDb([('D1', '10.00')]))
+        assert stats['staging_orphan_line_items'] == 1
+        assert stats['staging_dropped'] == 0
+        assert area.dropped == {}
+        assert sorted(r['id'] for r in staged(area)) == ['1', '2', '3']
+    finally:
+        area.close()
+
+    reports = os.listdir(tmp_path / 'reports')
+    assert len(reports) == 1 and reports[0].startswith('staging_line_items_orphan_line_items_')
+    with open(tmp_path / 'reports' / reports[0], newline='') as f:
+        assert list(csv.reader(f)) == [['id', 'document_id', 'quantity'], ['2', 'D9', '2']]
+
+
+def test_temporary_database_is_removed(tmp_path, monkeypatch):
+    area = staging(tmp_path, monkeypatch, 'warn')
+    area.close()
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('staging_')]
+
+
+@pytest.mark.parametrize('config', [
+    {'engine': 'oracle'},
+    {'checks': {'c': {'sql': 'SELECT 1', 'action': 'delete'}}},
+    {'checks': {'c': {'orphans': 'documents'}}},
+    {'checks': {'c': {'action': 'warn'}}},
+])
+def test_invalid_config(config):
+    with pytest.raises(ValueError):
+        StagingArea(config, 'line_items')
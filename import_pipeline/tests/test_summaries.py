@@ -0,0 +1,112 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from src.importers.document_importer import DocumentImporter
+from src.summaries import Summary, SummaryStage
+
+
+class FakeCursor:
+    """Records executed SQL and answers queries from a list of result rows."""
+
+    def __init__(self, rows=None):
+        self.rows = list(rows or [])
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((' '.join(sql.split()), params))
+
+    def executemany(self, sql, params_list):
+        self.executed.append((' '.join(sql.split()), list(params_list)))
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.fixture
+def importer(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://localhost/test')
+    return DocumentImporter('Documents.csv')
+
+
+def test_summary_source_columns_are_added_to_existing_tables(importer):
+    assert 'balance_due' in importer._added_columns()
+    cursor = FakeCursor([('id',), ('issue_date',), ('total_gross',)])
+    importer._ensure_columns(cursor, ['issue_date', 'balance_due'])
+    assert cursor.executed[1:] == [
+        ('ALTER TABLE documents ADD COLUMN IF NOT EXISTS balance_due DECIMAL(10,2)', None)
+    ]
+
+
+def test_no_columns_are_added_before_the_table_exists(importer):
+    cursor = FakeCursor([])
+    importer._ensure_columns(cursor, ['balance_due'])
+    assert len(cursor.executed) == 1
+
+SUMMARIES = {
+    'summary_by_month': {
+        'group_by': {'month': 'month(issue_date)'},
+        'measures': {'document_count': 'count()', 'total_gross': 'sum(total_gross)'},
+    },
+}
+
+
+def upserts(cursor):
+    return [params for sql, params in cursor.executed if sql.startswith('INSERT INTO summary_by_month')]
+
+
+def test_accumulate_adds_and_subtracts():
+    summary = Summary('summary_by_month', SUMMARIES['summary_by_month'])
+    totals = {}
+    summary.accumulate(totals, {'issue_date': date(2024, 3, 5), 'total_gross': Decimal('10.00')}, 1)
+    summary.accumulate(totals, {'issue_date': '2024-03-20', 'total_gross': '2.50'}, 1)
+    summary.accumulate(totals, {'issue_date': date(2024, 3, 1), 'total_gross': Decimal('4.00')}, -1)
+    summary.accumulate(totals, {'issue_date': None, 'total_gross': None}, 1)
+    assert totals == {
+        ('2024-03',): [Decimal(1), Decimal('8.50')],
+        ('',): [Decimal(1), Decimal(0)],
+    }
+
+
+def test_batch_applies_the_net_delta():
+    stage = SummaryStage(SUMMARIES, 'documents')
+    # The stored version of document 1 was in February with a different total
+    cursor = FakeCursor([
+        ('1', date(2024, 2, 10), Decimal('5.00')),
+    ])
+    stage.apply(cursor, [
+        {'id': '1', 'issue_date': date(2024, 3, 1), 'total_gross': Decimal('6.00')},
+        {'id': '2', 'issue_date': date(2024, 3, 2), 'total_gross': Decimal('1.00')},
+    ])
+    assert sorted(upserts(cursor)[0]) == [
+        ('2024-02', -1, Decimal('-5.00')),
+        ('2024-03', 2, Decimal('7.00')),
+    ]
+
+
+def test_unchanged_rows_write_nothing():
+    stage = SummaryStage(SUMMARIES, 'documents')
+    cursor = FakeCursor([('1', date(2024, 3, 1), Decimal('6.00'))])
+    stage.apply(cursor, [{'id': '1', 'issue_date': date(2024, 3, 1), 'total_gross': Decimal('6.00')}])
+    assert upserts(cursor) == []
+
+
+def test_repeated_ids_count_once_with_their_last_version():
+    stage = SummaryStage(SUMMARIES, 'documents')
+    cursor = FakeCursor([])
+    stage.apply(cursor, [
+        {'id': '1', 'issue_date': date(2024, 1, 1), 'total_gross': Decimal('1.00')},
+        {'id': '1', 'issue_date': date(2024, 3, 1), 'total_gross': Decimal('3.00')},
+    ])
+    assert upserts(cursor)[0] == [('2024-03', 1, Decimal('3.00'))]
+
+
+def test_tombstoned_rows_are_not_counted():
+    stage = SummaryStage(SUMMARIES, 'documents', tombstone_column='deleted_at')
+    cursor = FakeCursor([('1', date(2024, 3, 1), Decimal('6.00'), date(2024, 4, 1))])
+    stage.apply(cursor, [{'id': '1', 'issue_date': date(2024, 3, 1), 'total_gross': Decimal('9.00')}])
+    assert upserts(cursor) == []
+
+    stage.tombstone(cursor, [{'issue_date': date(2024, 3, 1), 'total_gross': Decimal('6.00')}])
+    assert upserts(cursor)[-1] == [('2024-03', -1, Decimal('-6.00'))]
@@ -0,0 +1,78 @@
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from src.verify import NULL, RangeVerifier, canonical, id_range, row_hash, sql_canonical
+
+
+@pytest.mark.parametrize('value, type_name, expected', [
+    # Postgres: trim_scale(1.50)::text = '1.5', trim_scale(0.00)::text = '0'
+    (Decimal('1.50'), 'decimal', '1.5'),
+    (Decimal('0.00'), 'decimal', '0'),
+    (Decimal('-0'), 'decimal', '0'),
+    (Decimal('100'), 'decimal', '100'),
+    # Decimal('1E+2') normalizes to exponent form, but numeric::text never uses it
+    (Decimal('1E+2'), 'decimal', '100'),
+    (7, 'integer', '7'),
+    (2.5, 'decimal', '2.5'),
+    # to_char(date, 'YYYY-MM-DD')
+    (date(2024, 3, 5), 'date', '2024-03-05'),
+    # boolean::text
+    (True, 'boolean', 'true'),
+    (False, None, 'false'),
+    ('ABC 123', None, 'ABC 123'),
+    (None, 'decimal', NULL),
+    (None, None, NULL),
+])
+def test_canonical_matches_postgres_text(value, type_name, expected):
+    assert canonical(value, type_name) == expected
+
+
+def test_sql_canonical_expressions():
+    assert sql_canonical('total', 'decimal') == f"coalesce(trim_scale(total::numeric)::text, '{NULL}')"
+    assert sql_canonical('qty', 'integer') == f"coalesce(trim_scale(qty::numeric)::text, '{NULL}')"
+    assert sql_canonical('issued', 'date') == f"coalesce(to_char(issued::date, 'YYYY-MM-DD'), '{NULL}')"
+    assert sql_canonical('name', None) == f"coalesce(name::text, '{NULL}')"
+
+
+def test_hashes():
+    assert row_hash('a') == int('0cc175b9c0f1b6a831c399e269772661'[:15], 16)
+    assert row_hash('a') < 2 ** 60
+    assert id_range('1', 2) == 'c4'
+
+
+def verifier(**kwargs):
+    importer = SimpleNamespace(
+        TABLE_NAME='documents',
+        config={'type_casting': {'issue_date': 'date', 'total': 'decimal', 'name': 'string'}},
+    )
+    return RangeVerifier(importer, **kwargs)
+
+
+def test_date_range():
+    v = verifier(range_column='issue_date', lower='2024-01-01', upper='2024-02-01')
+    assert v.in_range({'issue_date': date(2024, 1, 1)})
+    assert not v.in_range({'issue_date': date(2024, 2, 1)})
+    assert not v.in_range({'issue_date': None})
+    assert v._range_sql() == ["issue_date >= '2024-01-01'::date", "issue_date < '2024-02-01'::date"]
+
+
+def test_numeric_range():
+    v = verifier(range_column='total', lower='10')
+    assert v.in_range({'total': Decimal('10.00')})
+    assert not v.in_range({'total': Decimal('9.99')})
+    assert v._range_sql() == ["total >= '10'::numeric"]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'lower': '1'},
+    {'range_column': 'name', 'lower': 'a'},
+    {'range_column': 'total'},
+    {'range_column': 'total', 'lower': 'ten'},
+    {'range_column': 'issue_date', 'upper': 'soon'},
+])
+def test_invalid_ranges(kwargs):
+    with pytest.raises(ValueError):
+        verifier(**kwargs)
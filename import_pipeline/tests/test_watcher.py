@@ -0,0 +1,72 @@
+import os
+import time
+
+import pytest
+
+from src.watcher import FolderWatcher, find_complete_end, read_header
+
+
+def write(path, data: bytes):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_read_header(tmp_path):
+    assert read_header(write(tmp_path / 'a.csv', b'id,name\n1,a\n')) == b'id,name\n'
+    assert read_header(write(tmp_path / 'b.csv', b'id,na')) is None
+
+
+def test_find_complete_end_stops_at_the_last_newline(tmp_path):
+    data = b'id,name\n1,a\n2,b\n3,partial'
+    path = write(tmp_path / 'a.csv', data)
+    assert find_complete_end(path, 8, len(data)) == data.index(b'3,partial')
+    assert find_complete_end(path, 8, 12) == 12
+
+
+def test_find_complete_end_ignores_newlines_in_quotes(tmp_path):
+    data = b'id,notes\n1,"line one\nline two"\n2,"still\nopen'
+    path = write(tmp_path / 'a.csv', data)
+    assert find_complete_end(path, 9, len(data)) == data.index(b'2,"still')
+
+
+def test_find_complete_end_without_complete_record(tmp_path):
+    data = b'id,name\n1,a'
+    path = write(tmp_path / 'a.csv', data)
+    assert find_complete_end(path, 8, len(data)) == 8
+
+
+@pytest.fixture
+def watcher(tmp_path, monkeypatch):
+    # The watcher switches the shared connection to persistent mode; nothing connects here
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://localhost/test')
+    return FolderWatcher(str(tmp_path), {}, idle_flush=30)
+
+
+def test_pending_range_follows_offsets(tmp_path, watcher):
+    path = write(tmp_path / 'a.csv', b'id,name\n1,a\n2,b')
+    header, start, end = watcher._pending_range(path, os.stat(path))
+    assert (header, start, end) == (b'id,name\n', 8, 12)
+
+    watcher._advance(path, os.stat(path), header, end)
+    assert watcher._pending_range(path, os.stat(path)) is None
+
+    with open(path, 'ab') as f:
+        f.write(b'\n3,c\n')
+    assert watcher._pending_range(path, os.stat(path)) == (b'id,name\n', 12, 20)
+
+
+def test_pending_range_restarts_truncated_files(tmp_path, watcher):
+    path = write(tmp_path / 'a.csv', b'id,name\n1,a\n2,b\n')
+    header, _, end = watcher._pending_range(path, os.stat(path))
+    watcher._advance(path, os.stat(path), header, end)
+
+    write(path, b'id,name\n9,z\n')
+    assert watcher._pending_range(path, os.stat(path)) == (b'id,name\n', 8, 12)
+
+
+def test_pending_range_flushes_final_record_when_idle(tmp_path, watcher):
+    path = write(tmp_path / 'a.csv', b'id,name\n1,a\n2,b')
+    idle = time.time() - 60
+    os.utime(path, (idle, idle))
+    assert watcher._pending_range(path, os.stat(path)) == (b'id,name\n', 8, 15)